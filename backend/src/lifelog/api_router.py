@@ -7,7 +7,13 @@ from lifelog.notifications.views import NotificationViewSet, PushSubscriptionVie
 from lifelog.party.views import PartyMemberViewSet, PartyPositionViewSet, PartySessionViewSet
 from lifelog.places.views import FavoritePlaceViewSet, PlaceViewSet, TagViewSet
 from lifelog.posts.views import PostViewSet
-from lifelog.trips.views import TripTemplateGenerationJobViewSet, TripTemplateViewSet, TripViewSet
+from lifelog.trips.views import (
+    TripRecommendationJobViewSet,
+    TripSessionViewSet,
+    TripTemplateGenerationJobViewSet,
+    TripTemplateViewSet,
+    TripViewSet,
+)
 from lifelog.users.views import UserPreferredTagViewSet, UserViewSet
 
 router = DefaultRouter()
@@ -20,6 +26,8 @@ router.register("posts", PostViewSet, basename="post")
 router.register("trips", TripViewSet, basename="trip")
 router.register("trip-templates", TripTemplateViewSet, basename="trip-template")
 router.register("trip-template-ai-jobs", TripTemplateGenerationJobViewSet, basename="trip-template-ai-job")
+router.register("trip-recommendation-jobs", TripRecommendationJobViewSet, basename="trip-recommendation-job")
+router.register("trip-sessions", TripSessionViewSet, basename="trip-session")
 router.register("missions", MissionViewSet, basename="mission")
 router.register("mission-assignments", MissionAssignmentViewSet, basename="mission-assignment")
 router.register("feedback", FeedbackViewSet, basename="feedback")
@@ -0,0 +1,12 @@
+import pytest
+
+from lifelog.trips.index import _place_index
+
+
+@pytest.fixture(autouse=True)
+def fresh_place_index():
+    """Every test starts from an index built from its own database state."""
+
+    _place_index.clear()
+    yield
+    _place_index.clear()
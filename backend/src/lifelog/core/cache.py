@@ -0,0 +1,26 @@
+﻿from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+
+@contextmanager
+def cache_lock(key: str, timeout: int = 5, attempts: int = 50, wait: float = 0.01) -> Iterator[bool]:
+    """Hold ``key`` as a lock (``cache.add``) around a read-modify-write of shared cache entries.
+
+    Yields ``False`` when the lock stays taken after ``attempts`` tries; callers then must
+    not write what it guards.
+    """
+
+    for _attempt in range(attempts):
+        if cache.add(key, 1, timeout=timeout):
+            try:
+                yield True
+            finally:
+                cache.delete(key)
+            return
+        time.sleep(wait)
+    yield False
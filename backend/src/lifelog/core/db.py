@@ -0,0 +1,29 @@
+﻿from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class QueryCounter:
+    """``connection.execute_wrapper`` hook that counts statements; works with DEBUG off."""
+
+    count: int = 0
+    statements: list[str] = field(default_factory=list)
+    keep_sql: bool = False
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if self.keep_sql:
+            self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(using: str = DEFAULT_DB_ALIAS, keep_sql: bool = False) -> Iterator[QueryCounter]:
+    counter = QueryCounter(keep_sql=keep_sql)
+    with connections[using].execute_wrapper(counter):
+        yield counter
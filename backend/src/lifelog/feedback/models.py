@@ -22,6 +22,7 @@ class Feedback(UUIDModel, TimeStampedModel):
     class Meta:
         ordering = ["-created_at"]
         unique_together = ("trip", "user", "trip_node")
+        indexes = [models.Index(fields=["created_at", "id"])]
 
     def __str__(self) -> str:  # pragma: no cover
         return f"Feedback {self.trip_id}:{self.rating}"
@@ -0,0 +1,54 @@
+﻿from __future__ import annotations
+
+import re
+
+MAX_COST = 2_147_483_647
+
+BUDGET_LEVEL_LABELS = {
+    "cheap": 1,
+    "low": 1,
+    "budget": 1,
+    "moderate": 2,
+    "medium": 2,
+    "standard": 2,
+    "high": 3,
+    "premium": 3,
+    "expensive": 3,
+}
+
+
+def parse_cost_band(cost_band: str | None) -> tuple[int, int] | None:
+    if not cost_band:
+        return None
+    numbers = [min(int(value), MAX_COST) for value in re.findall(r"\d+", cost_band)]
+    if not numbers:
+        return None
+    return min(numbers), max(numbers)
+
+
+def budget_level_from_amount(amount: int) -> int:
+    if amount <= 15000:
+        return 1
+    if amount <= 30000:
+        return 2
+    return 3
+
+
+def budget_level_from_label(label: str | None) -> int | None:
+    if not label:
+        return None
+    return BUDGET_LEVEL_LABELS.get(label.strip().lower())
+
+
+def normalize_cost_band(cost_band: str | None) -> tuple[int | None, int | None, int | None]:
+    """Return ``(cost_min, cost_max, budget_level)`` derived from the free-text band.
+
+    Numeric bands set both bounds and a level from the upper bound; label bands
+    ("cheap", "premium", ...) only set the level.
+    """
+
+    parsed = parse_cost_band(cost_band)
+    if parsed:
+        low, high = parsed
+        return low, high, budget_level_from_amount(high)
+    return None, None, budget_level_from_label(cost_band)
@@ -0,0 +1,131 @@
+﻿from __future__ import annotations
+
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .geo import haversine_m, point_from_location
+
+# Hourly congestion per place: 7 days x 24 hours, Monday 00시 first, stored as uint8 (0 = empty, 255 = packed).
+HOURS_PER_WEEK = 7 * 24
+PROFILE_MAX = 255
+DEFAULT_WINDOW_DAYS = 56
+DEFAULT_SATURATION = 6.0
+# Activity newer than this may still sit in uncommitted transactions; refreshes stop short of it.
+DEFAULT_SAFETY_LAG_SEC = 300
+POSITION_RADIUS_M = 100
+WAIT_STEP_MIN = 10
+MAX_WAIT_WEIGHT = 3.0
+
+
+def bucket_of(moment: datetime) -> int:
+    local = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+    return local.weekday() * 24 + local.hour
+
+
+def visit_buckets(start: datetime, minutes: int) -> list[int]:
+    """Hour buckets touched by ``[start, start + minutes)``; ``start`` is local time."""
+
+    first = start.weekday() * 24 + start.hour
+    hours = max(1, math.ceil((start.minute + max(minutes, 1)) / 60))
+    return [(first + offset) % HOURS_PER_WEEK for offset in range(min(hours, HOURS_PER_WEEK))]
+
+
+def profile_from_counts(counts: np.ndarray, window_days: int, saturation: float) -> bytes:
+    """Scale weighted visits per week in each hour to 0~255; ``saturation`` visits/week is fully packed."""
+
+    weeks = max(window_days / 7, 1)
+    level = np.clip(counts / weeks / max(saturation, 1e-9), 0, 1)
+    return np.rint(level * PROFILE_MAX).astype(np.uint8).tobytes()
+
+
+def stack_profiles(profiles: list[bytes | None]) -> np.ndarray:
+    """``(n, HOURS_PER_WEEK)`` uint8 array; places without a profile count as empty."""
+
+    empty = bytes(HOURS_PER_WEEK)
+    return np.frombuffer(b"".join(bytes(profile) if profile else empty for profile in profiles), dtype=np.uint8).reshape(
+        len(profiles), HOURS_PER_WEEK
+    )
+
+
+def congestion_levels(profiles: np.ndarray, buckets: list[int]) -> np.ndarray:
+    """Mean congestion (0~1) of each row of ``profiles`` over the visit's hour ``buckets``."""
+
+    return profiles[:, buckets].sum(axis=1, dtype=np.int64) / len(buckets) / PROFILE_MAX
+
+
+def collect_activity(start: datetime, end: datetime) -> dict[str, np.ndarray]:
+    """Weighted visits per place and hour bucket for activity recorded in ``(start, end]``.
+
+    Sources: trip feedback (at the node's ETA; waits reported in ``metadata.wait_min`` weigh
+    more), posts tagged with a place, and party positions within 100m of a stop of the
+    session's trip (one visit per member, stop and hour).
+    """
+
+    from lifelog.feedback.models import Feedback
+    from lifelog.party.models import PartyPosition
+    from lifelog.posts.models import Post
+    from lifelog.trips.models import TripNode
+
+    counts: dict[str, np.ndarray] = defaultdict(lambda: np.zeros(HOURS_PER_WEEK, dtype=np.float32))
+
+    feedback = Feedback.objects.filter(created_at__gt=start, created_at__lte=end, trip_node__isnull=False).values_list(
+        "trip_node__place_id", "trip_node__eta", "created_at", "metadata"
+    )
+    for place_id, eta, created_at, metadata in feedback:
+        if place_id is None:
+            continue
+        try:
+            wait = float((metadata or {}).get("wait_min") or 0)
+        except (TypeError, ValueError):
+            wait = 0.0
+        counts[str(place_id)][bucket_of(eta or created_at)] += 1 + min(max(wait, 0) / WAIT_STEP_MIN, MAX_WAIT_WEIGHT)
+
+    posts = Post.objects.filter(created_at__gt=start, created_at__lte=end, place__isnull=False).values_list(
+        "place_id", "created_at"
+    )
+    for place_id, created_at in posts:
+        counts[str(place_id)][bucket_of(created_at)] += 1
+
+    positions = list(
+        PartyPosition.objects.filter(recorded_at__gt=start, recorded_at__lte=end).values_list(
+            "session__trip_id", "user_id", "loc", "recorded_at"
+        )
+    )
+    stops: dict = defaultdict(list)
+    trip_ids = {trip_id for trip_id, *_rest in positions}
+    for trip_id, place_id, lat, lng in TripNode.objects.filter(
+        trip_id__in=trip_ids, place__latitude__isnull=False
+    ).values_list("trip_id", "place_id", "place__latitude", "place__longitude"):
+        stops[trip_id].append((str(place_id), lat, lng))
+    seen: set[tuple] = set()
+    for trip_id, user_id, loc, recorded_at in positions:
+        point = point_from_location(loc)
+        if point is None or not stops.get(trip_id):
+            continue
+        distance, place_id = min((haversine_m(*point, lat, lng), place_id) for place_id, lat, lng in stops[trip_id])
+        bucket = bucket_of(recorded_at)
+        key = (user_id, place_id, recorded_at.date(), bucket)
+        if distance <= POSITION_RADIUS_M and key not in seen:
+            seen.add(key)
+            counts[place_id][bucket] += 1
+
+    return dict(counts)
+
+
+def window_deltas(processed_until: datetime | None, now: datetime, window: timedelta) -> dict[str, np.ndarray]:
+    """Changes to each place's in-window counts since ``processed_until``.
+
+    Activity recorded after the watermark is added and activity that slid out of the
+    window since then is subtracted, so a refresh only reads what changed.
+    """
+
+    if processed_until is None:
+        return collect_activity(now - window, now)
+    deltas = collect_activity(processed_until, now)
+    for place_id, expired in collect_activity(processed_until - window, now - window).items():
+        deltas[place_id] = deltas.get(place_id, np.zeros(HOURS_PER_WEEK, dtype=np.float32)) - expired
+    return deltas
@@ -0,0 +1,150 @@
+﻿from __future__ import annotations
+
+import math
+from collections.abc import Iterable
+from typing import Any
+
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6_371_000
+METERS_PER_DEGREE = 111_320
+
+
+def point_from_location(location: Any) -> tuple[float, float] | None:
+    """Return ``(lat, lng)`` from a GeoJSON Point (``{"type": "Point", "coordinates": [lng, lat]}``)."""
+
+    if not isinstance(location, dict):
+        return None
+    coordinates = location.get("coordinates")
+    try:
+        if isinstance(coordinates, (list, tuple)) and len(coordinates) >= 2:
+            lng, lat = float(coordinates[0]), float(coordinates[1])
+        elif "lat" in location and "lng" in location:
+            lat, lng = float(location["lat"]), float(location["lng"])
+        else:
+            return None
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def parse_lat_lng(value: str) -> tuple[float, float]:
+    """Parse a ``"lat,lng"`` query parameter; raise ``ValueError`` when malformed."""
+
+    parts = [part.strip() for part in (value or "").split(",")]
+    if len(parts) != 2:
+        raise ValueError("expected lat,lng")
+    lat, lng = float(parts[0]), float(parts[1])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("coordinates out of range")
+    return lat, lng
+
+
+def encode_geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars: list[str] = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size_deg(precision: int) -> tuple[float, float]:
+    """Height and width in degrees of a geohash cell at ``precision``."""
+
+    total_bits = precision * 5
+    lat_bits = total_bits // 2
+    lng_bits = total_bits - lat_bits
+    return 180 / (1 << lat_bits), 360 / (1 << lng_bits)
+
+
+def _bounding_box(lat: float, lng: float, radius_m: float) -> tuple[float, float, float, float]:
+    dlat = radius_m / METERS_PER_DEGREE
+    dlng = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return max(lat - dlat, -90.0), min(lat + dlat, 90.0), max(lng - dlng, -180.0), min(lng + dlng, 180.0)
+
+
+def cells_covering(lat: float, lng: float, radius_m: float, precision: int) -> list[str]:
+    """Every geohash cell at ``precision`` that intersects the circle's bounding box."""
+
+    south, north, west, east = _bounding_box(lat, lng, radius_m)
+    height, width = cell_size_deg(precision)
+    cells: list[str] = []
+    seen: set[str] = set()
+    cell_lat = math.floor(south / height) * height
+    while cell_lat <= north:
+        cell_lng = math.floor(west / width) * width
+        while cell_lng <= east:
+            cell = encode_geohash(min(cell_lat + height / 2, 90.0), min(cell_lng + width / 2, 180.0), precision)
+            if cell not in seen:
+                seen.add(cell)
+                cells.append(cell)
+            cell_lng += width
+        cell_lat += height
+    return cells
+
+
+def covering_prefixes(lat: float, lng: float, radius_m: float, max_cells: int = 24) -> list[str]:
+    """Smallest geohash prefixes covering the circle with at most ``max_cells`` cells."""
+
+    best = cells_covering(lat, lng, radius_m, 1)
+    for precision in range(2, GEOHASH_PRECISION + 1):
+        cells = cells_covering(lat, lng, radius_m, precision)
+        if len(cells) > max_cells:
+            break
+        best = cells
+    return best
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def nearest(
+    candidates: Iterable[tuple[Any, float | None, float | None]],
+    lat: float,
+    lng: float,
+    radius_m: float | None = None,
+    k: int | None = None,
+) -> list[tuple[Any, float]]:
+    """Exact distance pass over ``(key, lat, lng)`` candidates already narrowed by cell lookup."""
+
+    measured = [
+        (key, haversine_m(lat, lng, place_lat, place_lng))
+        for key, place_lat, place_lng in candidates
+        if place_lat is not None and place_lng is not None
+    ]
+    if radius_m is not None:
+        measured = [item for item in measured if item[1] <= radius_m]
+    measured.sort(key=lambda item: item[1])
+    return measured[:k] if k is not None else measured
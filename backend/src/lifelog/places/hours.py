@@ -0,0 +1,205 @@
+﻿from __future__ import annotations
+
+import math
+import re
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+# Weekly opening hours as a bitmap: 7 days x 96 fifteen-minute slots, Monday 00:00 first,
+# most significant bit first within each byte (``np.packbits`` order).
+SLOT_MIN = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MIN
+DAY_BYTES = SLOTS_PER_DAY // 8
+WEEK_BYTES = DAY_BYTES * 7
+ALWAYS_OPEN = b"\xff" * WEEK_BYTES
+
+DAY_KEYS = {
+    "mon": 0,
+    "tue": 1,
+    "wed": 2,
+    "thu": 3,
+    "fri": 4,
+    "sat": 5,
+    "sun": 6,
+    "월": 0,
+    "화": 1,
+    "수": 2,
+    "목": 3,
+    "금": 4,
+    "토": 5,
+    "일": 6,
+}
+DAILY_KEYS = {"daily", "매일"}
+HOLIDAY_KEYS = {"holidays", "휴무일"}
+CLOSED_VALUES = {"closed", "휴무", "휴무일", ""}
+ALL_DAY_VALUES = {"24h", "24시간"}
+RANGE_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*[-~]\s*(\d{1,2}):(\d{2})\s*$")
+
+
+class HoursError(ValueError):
+    """Raised when ``Place.hours`` cannot be read as opening hours."""
+
+
+def _minutes(hour: str, minute: str) -> int:
+    value = int(hour) * 60 + int(minute)
+    if int(minute) >= 60 or value > 24 * 60:
+        raise HoursError(f"invalid time {hour}:{minute}")
+    return value
+
+
+def _ranges(value: Any) -> list[tuple[int, int]]:
+    """``(open_min, close_min)`` pairs of one day; ``close`` may pass 24:00 for overnight hours."""
+
+    if value is None:
+        return []
+    items = value if isinstance(value, (list, tuple)) else [value]
+    ranges: list[tuple[int, int]] = []
+    for item in items:
+        if not isinstance(item, str):
+            raise HoursError(f"expected a time range, got {item!r}")
+        text = item.strip().lower()
+        if text in CLOSED_VALUES:
+            continue
+        if text in ALL_DAY_VALUES:
+            ranges.append((0, 24 * 60))
+            continue
+        match = RANGE_RE.match(text)
+        if not match:
+            raise HoursError(f"invalid time range {item!r}")
+        opens, closes = _minutes(*match.groups()[:2]), _minutes(*match.groups()[2:])
+        if closes <= opens:
+            closes += 24 * 60
+        ranges.append((opens, closes))
+    return ranges
+
+
+def _fill(slots: np.ndarray, offset: int, ranges: list[tuple[int, int]]) -> None:
+    # Partial slots count as closed: open rounds up, close rounds down.
+    for opens, closes in ranges:
+        first = offset + math.ceil(opens / SLOT_MIN)
+        last = offset + closes // SLOT_MIN
+        if last > first:
+            positions = np.arange(first, last) % len(slots)
+            slots[positions] = True
+
+
+def parse_hours(hours: Any, today: date | None = None) -> tuple[bytes | None, dict[str, str]]:
+    """Return ``(weekly_bitmap, overrides)`` for a ``Place.hours`` document.
+
+    ``hours`` maps day keys (``mon``..``sun`` / ``월``..``일`` / ``daily``) to ``"09:00-18:00"``,
+    a list of ranges, ``"closed"`` or ``"24h"``; ``holidays`` maps ISO dates to the same values.
+    Overrides come back as hex day bitmaps keyed by date, dropping dates before ``today``.
+    An empty document means unknown hours and gives ``(None, {})``.
+    """
+
+    if not hours:
+        return None, {}
+    if not isinstance(hours, dict):
+        raise HoursError("hours must be an object")
+
+    daily = None
+    days: dict[int, Any] = {}
+    holidays: dict[str, Any] = {}
+    for key, value in hours.items():
+        name = str(key).strip().lower()
+        if name in DAILY_KEYS:
+            daily = value
+        elif name in DAY_KEYS:
+            days[DAY_KEYS[name]] = value
+        elif name in HOLIDAY_KEYS:
+            if not isinstance(value, dict):
+                raise HoursError("holidays must map dates to hours")
+            holidays = value
+        else:
+            raise HoursError(f"unknown key {key!r}")
+
+    week = np.zeros(SLOTS_PER_DAY * 7, dtype=bool)
+    for weekday in range(7):
+        _fill(week, weekday * SLOTS_PER_DAY, _ranges(days.get(weekday, daily)))
+
+    overrides: dict[str, str] = {}
+    for key, value in holidays.items():
+        try:
+            day = date.fromisoformat(str(key))
+        except ValueError as exc:
+            raise HoursError(f"invalid holiday date {key!r}") from exc
+        slots = np.zeros(SLOTS_PER_DAY * 2, dtype=bool)
+        _fill(slots, 0, _ranges(value))
+        if today is None or day >= today:
+            overrides[day.isoformat()] = np.packbits(slots[:SLOTS_PER_DAY]).tobytes().hex()
+
+    return np.packbits(week).tobytes(), overrides
+
+
+def normalize_hours(hours: Any, today: date | None = None) -> tuple[bytes | None, dict[str, str]]:
+    """Like :func:`parse_hours`, but unreadable documents count as unknown hours."""
+
+    try:
+        return parse_hours(hours, today)
+    except HoursError:
+        return None, {}
+
+
+def stack_bitmaps(bitmaps: list[bytes | None]) -> np.ndarray:
+    """``(n, WEEK_BYTES)`` array; places without hours are treated as always open."""
+
+    return np.frombuffer(b"".join(bytes(bitmap) if bitmap else ALWAYS_OPEN for bitmap in bitmaps), dtype=np.uint8).reshape(
+        len(bitmaps), WEEK_BYTES
+    )
+
+
+def open_slots(
+    bitmaps: np.ndarray,
+    overrides: dict[int, dict[str, str]],
+    start: datetime,
+    minutes: int,
+) -> np.ndarray:
+    """``(n, slots)`` open flags of each place for the slots covering ``[start, start + minutes)``.
+
+    ``start`` is local time. ``overrides`` maps row positions to their holiday bitmaps.
+    """
+
+    first = (start.hour * 60 + start.minute) // SLOT_MIN
+    count = max(1, math.ceil((start.hour * 60 + start.minute + minutes) / SLOT_MIN) - first)
+    days = (first + count - 1) // SLOTS_PER_DAY + 1
+
+    blocks = []
+    for offset in range(days):
+        day = start.date() + timedelta(days=offset)
+        weekday = day.weekday()
+        block = bitmaps[:, weekday * DAY_BYTES : (weekday + 1) * DAY_BYTES].copy()
+        key = day.isoformat()
+        for position, days_override in overrides.items():
+            override = days_override.get(key)
+            if override:
+                block[position] = np.frombuffer(bytes.fromhex(override), dtype=np.uint8)
+        blocks.append(block)
+
+    slots = np.unpackbits(np.concatenate(blocks, axis=1), axis=1).astype(bool)
+    return slots[:, first : first + count]
+
+
+def longest_open_run(slots: np.ndarray) -> np.ndarray:
+    """Length (in slots) of the longest stretch of consecutive open slots per row."""
+
+    if not slots.size:
+        return np.zeros(len(slots), dtype=np.int64)
+    positions = np.arange(slots.shape[1])
+    last_closed = np.maximum.accumulate(np.where(slots, -1, positions), axis=1)
+    return (positions - last_closed).max(axis=1)
+
+
+def fits_visit(
+    bitmaps: np.ndarray,
+    overrides: dict[int, dict[str, str]],
+    stay_min: np.ndarray,
+    start: datetime,
+    window_min: int,
+) -> np.ndarray:
+    """Whether each place stays open for its whole visit somewhere inside the trip window."""
+
+    stays = np.clip(np.maximum(stay_min, SLOT_MIN), None, max(window_min, SLOT_MIN))
+    needed = np.ceil(stays / SLOT_MIN).astype(np.int64)
+    return longest_open_run(open_slots(bitmaps, overrides, start, max(window_min, SLOT_MIN))) >= needed
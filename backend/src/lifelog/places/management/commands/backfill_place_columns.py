@@ -0,0 +1,39 @@
+﻿from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from lifelog.places.models import DERIVED_FIELDS, Place
+from lifelog.trips.index import mark_places_changed
+
+BACKFILL_FIELDS = [field for fields in DERIVED_FIELDS.values() for field in fields]
+
+
+class Command(BaseCommand):
+    help = "cost_band, location 값으로 장소의 예산(cost_min / cost_max / budget_level)과 좌표(latitude / longitude / geohash) 컬럼을 일괄 채웁니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="한 번에 갱신할 장소 수")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        scanned = 0
+        updated = 0
+        last_pk = None
+
+        while True:
+            qs = Place.objects.order_by("pk").only("pk", *DERIVED_FIELDS, *BACKFILL_FIELDS)
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+            batch = list(qs[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            scanned += len(batch)
+
+            changed = [place for place in batch if place.sync_derived_fields()]
+            if changed:
+                Place.objects.bulk_update(changed, BACKFILL_FIELDS)
+                mark_places_changed(place.pk for place in changed)
+                updated += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(f"장소 {scanned}곳 확인, {updated}곳의 파생 컬럼을 갱신했습니다."))
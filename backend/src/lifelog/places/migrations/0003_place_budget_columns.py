@@ -0,0 +1,36 @@
+# Generated by Django 4.2.15 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0002_favoriteplace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='budget_level',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='cost_max',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='cost_min',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['is_active', 'cost_min', 'cost_max'], name='places_plac_is_acti_ec1259_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['is_active', 'budget_level'], name='places_plac_is_acti_25bf71_idx'),
+        ),
+    ]
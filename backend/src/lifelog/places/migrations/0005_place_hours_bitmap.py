@@ -0,0 +1,23 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0004_place_geo_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='hours_bitmap',
+            field=models.BinaryField(blank=True, help_text='주간 영업시간 비트맵(15분 × 7일)', null=True),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='hours_overrides',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='날짜별 영업시간 비트맵(hex)'),
+        ),
+    ]
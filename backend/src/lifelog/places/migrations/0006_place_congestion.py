@@ -0,0 +1,35 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0005_place_hours_bitmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CongestionWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processed_until', models.DateTimeField()),
+                ('window_days', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlaceCongestion',
+            fields=[
+                ('place', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='congestion', serialize=False, to='places.place')),
+                ('counts', models.BinaryField(help_text='float32[168]')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='congestion_profile',
+            field=models.BinaryField(blank=True, help_text='요일·시간대별 혼잡도(7 × 24, 0~255)', null=True),
+        ),
+    ]
@@ -1,10 +1,24 @@
 ﻿from __future__ import annotations
 
+from typing import Any
+
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 
-from lifelog.core.models import SoftDeleteModel, TimeStampedModel, UUIDModel
+from lifelog.core.models import SoftDeleteModel, SoftDeleteQuerySet, TimeStampedModel, UUIDModel
+
+from .budget import budget_level_from_amount, normalize_cost_band
+from .geo import covering_prefixes, encode_geohash, nearest, point_from_location
+from .hours import normalize_hours
+
+DERIVED_FIELDS = {
+    "cost_band": ("cost_min", "cost_max", "budget_level"),
+    "location": ("latitude", "longitude", "geohash"),
+    "hours": ("hours_bitmap", "hours_overrides"),
+}
 
 
 class Tag(UUIDModel, TimeStampedModel):
@@ -28,6 +42,55 @@ class Tag(UUIDModel, TimeStampedModel):
         return f"{self.name} ({self.type})"
 
 
+class PlaceQuerySet(SoftDeleteQuerySet):
+    def within_budget(self, budget_min: int = 0, budget_max: int = 0):
+        """Places whose normalized cost overlaps the requested budget.
+
+        Places with numeric bounds are compared by range, label-only places by
+        budget level, and places without any cost information always match.
+        """
+
+        if budget_min <= 0 and budget_max <= 0:
+            return self
+
+        numeric = Q(cost_min__isnull=False)
+        if budget_min > 0:
+            numeric &= Q(cost_max__gte=budget_min)
+        if budget_max > 0:
+            numeric &= Q(cost_min__lte=budget_max)
+
+        min_level = budget_level_from_amount(budget_min) if budget_min > 0 else 1
+        max_level = budget_level_from_amount(budget_max) if budget_max > 0 else 3
+        labelled = Q(cost_min__isnull=True, budget_level__gte=min_level, budget_level__lte=max_level)
+        unknown = Q(cost_min__isnull=True, budget_level__isnull=True)
+        return self.filter(numeric | labelled | unknown)
+
+    def within_cells(self, lat: float, lng: float, radius_m: float):
+        """Places whose geohash falls in the cells covering the circle (index prefix scan)."""
+
+        query = Q()
+        for prefix in covering_prefixes(lat, lng, radius_m):
+            query |= Q(geohash__startswith=prefix)
+        return self.filter(query)
+
+    def distances_within(self, lat: float, lng: float, radius_m: float) -> list[tuple[Any, float]]:
+        """``(id, distance_m)`` of places within ``radius_m``, nearest first."""
+
+        rows = self.within_cells(lat, lng, radius_m).values_list("id", "latitude", "longitude")
+        return nearest(rows, lat, lng, radius_m=radius_m)
+
+    def k_nearest(self, lat: float, lng: float, k: int, max_radius_m: float = 50_000) -> list[tuple[Any, float]]:
+        """``(id, distance_m)`` of the ``k`` closest places, widening the searched cells as needed."""
+
+        radius = 500.0
+        while True:
+            rows = self.within_cells(lat, lng, radius).values_list("id", "latitude", "longitude")
+            found = nearest(rows, lat, lng, radius_m=radius, k=k)
+            if len(found) >= k or radius >= max_radius_m:
+                return found
+            radius = min(radius * 4, max_radius_m)
+
+
 class Place(UUIDModel, TimeStampedModel, SoftDeleteModel):
     name = models.CharField(max_length=150)
     slug = models.SlugField(max_length=160, unique=True, blank=True)
@@ -37,27 +100,90 @@ class Place(UUIDModel, TimeStampedModel, SoftDeleteModel):
     address = models.CharField(max_length=255, blank=True)
     district = models.CharField(max_length=120, blank=True)
     location = models.JSONField(default=dict, blank=True, help_text="GeoJSON Point representation")
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     cost_band = models.CharField(max_length=30, blank=True)
+    cost_min = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    cost_max = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    budget_level = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
     stay_min = models.PositiveIntegerField(default=60)
     hours = models.JSONField(default=dict, blank=True)
+    hours_bitmap = models.BinaryField(null=True, blank=True, editable=False, help_text="주간 영업시간 비트맵(15분 × 7일)")
+    hours_overrides = models.JSONField(default=dict, blank=True, editable=False, help_text="날짜별 영업시간 비트맵(hex)")
     mood_scores = models.JSONField(default=dict, blank=True)
     congestion_score = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    congestion_profile = models.BinaryField(
+        null=True, blank=True, editable=False, help_text="요일·시간대별 혼잡도(7 × 24, 0~255)"
+    )
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
 
     tags = models.ManyToManyField(Tag, through="PlaceTag", related_name="places")
 
+    objects = PlaceQuerySet.as_manager()
+
     class Meta:
         ordering = ["name"]
         indexes = [
             models.Index(fields=["category"]),
             models.Index(fields=["district"]),
+            models.Index(fields=["is_active", "cost_min", "cost_max"]),
+            models.Index(fields=["is_active", "budget_level"]),
         ]
 
-    def save(self, *args, **kwargs):  # pragma: no cover - simple helper
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        place = super().from_db(db, field_names, values)
+        # District as loaded, so a move can also invalidate what was built for the old one.
+        place._loaded_district = place.__dict__.get("district")
+        return place
+
+    def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.sync_derived_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            derived = {field for source, fields in DERIVED_FIELDS.items() if source in update_fields for field in fields}
+            if derived:
+                kwargs["update_fields"] = {*update_fields, *derived}
         super().save(*args, **kwargs)
 
+    def sync_derived_fields(self) -> bool:
+        budget_changed = self.sync_budget_fields()
+        geo_changed = self._geo_changed = self.sync_geo_fields()
+        hours_changed = self.sync_hours_fields()
+        return budget_changed or geo_changed or hours_changed
+
+    def sync_budget_fields(self) -> bool:
+        """Refresh the normalized budget columns from ``cost_band``; return whether they changed."""
+
+        normalized = normalize_cost_band(self.cost_band)
+        changed = normalized != (self.cost_min, self.cost_max, self.budget_level)
+        self.cost_min, self.cost_max, self.budget_level = normalized
+        return changed
+
+    def sync_geo_fields(self) -> bool:
+        """Refresh ``latitude`` / ``longitude`` / ``geohash`` from the GeoJSON ``location``."""
+
+        point = point_from_location(self.location)
+        if point:
+            normalized = (point[0], point[1], encode_geohash(*point))
+        else:
+            normalized = (None, None, "")
+        changed = normalized != (self.latitude, self.longitude, self.geohash)
+        self.latitude, self.longitude, self.geohash = normalized
+        return changed
+
+    def sync_hours_fields(self) -> bool:
+        """Refresh the opening-hours bitmap from ``hours``; past holiday overrides are dropped."""
+
+        bitmap, overrides = normalize_hours(self.hours, timezone.localdate())
+        current = bytes(self.hours_bitmap) if self.hours_bitmap is not None else None
+        changed = (bitmap, overrides) != (current, self.hours_overrides)
+        self.hours_bitmap, self.hours_overrides = bitmap, overrides
+        return changed
+
     def __str__(self) -> str:  # pragma: no cover
         return self.name
 
@@ -70,6 +196,26 @@ class PlaceTag(models.Model):
     class Meta:
         unique_together = ("place", "tag")
 
+
+class PlaceCongestion(models.Model):
+    """Weighted visits per hour bucket inside the rolling window; source of ``Place.congestion_profile``."""
+
+    place = models.OneToOneField(Place, on_delete=models.CASCADE, primary_key=True, related_name="congestion")
+    counts = models.BinaryField(help_text="float32[168]")
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class CongestionWatermark(models.Model):
+    """Single row: activity recorded up to ``processed_until`` is already in ``PlaceCongestion``."""
+
+    processed_until = models.DateTimeField()
+    window_days = models.PositiveIntegerField()
+
+    @classmethod
+    def current(cls) -> CongestionWatermark | None:
+        return cls.objects.filter(pk=1).first()
+
+
 class FavoritePlace(TimeStampedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="favorite_places")
     place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name="favorited_by")
@@ -2,6 +2,7 @@
 
 from rest_framework import serializers
 
+from .hours import HoursError, parse_hours
 from .models import FavoritePlace, Place, Tag
 
 
@@ -13,6 +14,7 @@ class TagSerializer(serializers.ModelSerializer):
 
 class PlaceSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
+    distance_m = serializers.SerializerMethodField()
 
     class Meta:
         model = Place
@@ -27,16 +29,24 @@ class PlaceSerializer(serializers.ModelSerializer):
             "district",
             "location",
             "cost_band",
+            "cost_min",
+            "cost_max",
+            "budget_level",
             "stay_min",
             "hours",
             "mood_scores",
             "congestion_score",
             "rating",
             "tags",
+            "distance_m",
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("slug", "rating")
+        read_only_fields = ("slug", "rating", "cost_min", "cost_max", "budget_level")
+
+    def get_distance_m(self, obj) -> float | None:
+        distance = getattr(obj, "distance_m", None)
+        return round(distance, 1) if distance is not None else None
 
 
 class PlaceWriteSerializer(serializers.ModelSerializer):
@@ -64,6 +74,13 @@ class PlaceWriteSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("slug", "rating")
 
+    def validate_hours(self, value):
+        try:
+            parse_hours(value)
+        except HoursError as exc:
+            raise serializers.ValidationError(f"영업시간 형식이 올바르지 않습니다: {exc}") from exc
+        return value
+
     def create(self, validated_data):
         tag_ids = validated_data.pop("tag_ids", [])
         place = super().create(validated_data)
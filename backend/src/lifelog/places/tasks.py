@@ -1,10 +1,29 @@
 ﻿from __future__ import annotations
 
+import logging
+from datetime import timedelta
 from typing import Any
 
+import numpy as np
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
-from .models import Place
+from lifelog.trips.index import mark_places_changed
+
+from .congestion import (
+    DEFAULT_SAFETY_LAG_SEC,
+    DEFAULT_SATURATION,
+    DEFAULT_WINDOW_DAYS,
+    HOURS_PER_WEEK,
+    profile_from_counts,
+    window_deltas,
+)
+from .hours import HoursError, parse_hours
+from .models import CongestionWatermark, Place, PlaceCongestion
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task(name="places.refresh_metadata")
@@ -20,3 +39,89 @@ def refresh_place_metadata(place_id: str, metadata: dict[str, Any] | None = None
     except Place.DoesNotExist:
         return {"place_id": place_id, "updated": False, "error": "not_found"}
 
+
+
+@shared_task(name="places.revalidate_opening_hours")
+def revalidate_opening_hours(batch_size: int = 1000) -> dict[str, Any]:
+    """Rebuild every opening-hours bitmap; drops past holiday overrides and reports unreadable hours."""
+
+    scanned = updated = 0
+    invalid: list[str] = []
+    last_pk = None
+    while True:
+        qs = Place.objects.order_by("pk").only("pk", "hours", "hours_bitmap", "hours_overrides")
+        if last_pk is not None:
+            qs = qs.filter(pk__gt=last_pk)
+        batch = list(qs[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        scanned += len(batch)
+
+        for place in batch:
+            try:
+                parse_hours(place.hours)
+            except HoursError as exc:
+                invalid.append(str(place.pk))
+                logger.warning("Invalid opening hours on place %s: %s", place.pk, exc)
+
+        changed = [place for place in batch if place.sync_hours_fields()]
+        if changed:
+            Place.objects.bulk_update(changed, ["hours_bitmap", "hours_overrides"])
+            mark_places_changed(place.pk for place in changed)
+            updated += len(changed)
+
+    return {"scanned": scanned, "updated": updated, "invalid": invalid}
+
+
+@shared_task(name="places.refresh_congestion_profiles")
+def refresh_congestion_profiles(full: bool = False) -> dict[str, Any]:
+    """Fold activity since the last run into the hourly profiles; only touched places are rewritten.
+
+    Reads stop ``congestion_safety_lag_sec`` before now and the watermark only advances that
+    far, so rows whose transaction commits late are picked up by the next run.
+    """
+
+    engine = getattr(settings, "RECOMMENDATION_ENGINE", {})
+    window_days = engine.get("congestion_window_days", DEFAULT_WINDOW_DAYS)
+    saturation = engine.get("congestion_saturation", DEFAULT_SATURATION)
+    until = timezone.now() - timedelta(seconds=engine.get("congestion_safety_lag_sec", DEFAULT_SAFETY_LAG_SEC))
+
+    with transaction.atomic():
+        watermark = CongestionWatermark.objects.select_for_update().filter(pk=1).first()
+        if full or watermark is None or watermark.window_days != window_days:
+            PlaceCongestion.objects.all().delete()
+            cleared = list(Place.objects.filter(congestion_profile__isnull=False).values_list("pk", flat=True))
+            Place.objects.filter(pk__in=cleared).update(congestion_profile=None)
+            processed_until = None
+        else:
+            cleared = []
+            processed_until = watermark.processed_until
+            until = max(until, processed_until)
+
+        deltas = window_deltas(processed_until, until, timedelta(days=window_days))
+        existing = {str(pk): row for pk, row in PlaceCongestion.objects.in_bulk(list(deltas)).items()}
+        valid = {str(pk) for pk in Place.objects.filter(pk__in=list(deltas)).values_list("pk", flat=True)}
+        rows: list[PlaceCongestion] = []
+        places: list[Place] = []
+        for place_id, delta in deltas.items():
+            if place_id not in valid:
+                continue
+            row = existing.get(place_id) or PlaceCongestion(
+                place_id=place_id, counts=np.zeros(HOURS_PER_WEEK, dtype=np.float32).tobytes()
+            )
+            counts = np.maximum(np.frombuffer(bytes(row.counts), dtype=np.float32) + delta, 0).astype(np.float32)
+            row.counts = counts.tobytes()
+            rows.append(row)
+            places.append(Place(pk=row.place_id, congestion_profile=profile_from_counts(counts, window_days, saturation)))
+
+        PlaceCongestion.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["place"], update_fields=["counts", "updated_at"]
+        )
+        Place.objects.bulk_update(places, ["congestion_profile"])
+        CongestionWatermark.objects.update_or_create(
+            pk=1, defaults={"processed_until": until, "window_days": window_days}
+        )
+
+    mark_places_changed([*cleared, *(place.pk for place in places)])
+    return {"status": "full" if processed_until is None else "incremental", "places": len(places)}
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from lifelog.places.models import Place
+
+
+class PlaceBudgetColumnTests(TestCase):
+    def test_save_normalizes_cost_band(self):
+        numeric = Place.objects.create(name="Numeric", category="cafe", cost_band="8000~12000원")
+        labelled = Place.objects.create(name="Labelled", category="cafe", cost_band="Premium")
+        free = Place.objects.create(name="Free", category="park", cost_band="무료")
+
+        self.assertEqual((numeric.cost_min, numeric.cost_max, numeric.budget_level), (8000, 12000, 1))
+        self.assertEqual((labelled.cost_min, labelled.cost_max, labelled.budget_level), (None, None, 3))
+        self.assertEqual((free.cost_min, free.cost_max, free.budget_level), (None, None, None))
+
+        labelled.cost_band = "20000-40000"
+        labelled.save(update_fields=["cost_band"])
+        labelled.refresh_from_db()
+        self.assertEqual((labelled.cost_min, labelled.cost_max, labelled.budget_level), (20000, 40000, 3))
+
+    def test_within_budget_filters_in_sql(self):
+        cheap = Place.objects.create(name="Cheap", category="cafe", cost_band="5000-9000")
+        pricey = Place.objects.create(name="Pricey", category="cafe", cost_band="30000-50000")
+        budget_label = Place.objects.create(name="Budget", category="cafe", cost_band="budget")
+        premium_label = Place.objects.create(name="Premium", category="cafe", cost_band="premium")
+        unknown = Place.objects.create(name="Unknown", category="cafe")
+
+        matched = set(Place.objects.within_budget(budget_max=15000))
+
+        self.assertEqual(matched, {cheap, budget_label, unknown})
+        self.assertEqual(set(Place.objects.within_budget(budget_min=20000)), {pricey, premium_label, unknown})
+
+    def test_backfill_command_fills_missing_columns(self):
+        place = Place.objects.create(name="Legacy", category="cafe", cost_band="10000-15000")
+        Place.objects.filter(id=place.id).update(cost_min=None, cost_max=None, budget_level=None)
+
+        out = StringIO()
+        call_command("backfill_place_columns", batch_size=1, stdout=out)
+
+        place.refresh_from_db()
+        self.assertEqual((place.cost_min, place.cost_max, place.budget_level), (10000, 15000, 1))
+        self.assertIn("1곳", out.getvalue())
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from lifelog.feedback.models import Feedback
+from lifelog.party.models import PartyPosition, PartySession
+from lifelog.places.congestion import bucket_of
+from lifelog.places.models import Place, PlaceCongestion
+from lifelog.places.tasks import refresh_congestion_profiles
+from lifelog.posts.models import Post
+from lifelog.trips.models import Trip, TripNode
+from lifelog.trips.services import create_recommendation
+
+VISIT = timezone.localtime().replace(minute=20, second=0, microsecond=0) - timedelta(days=1)
+
+
+@override_settings(
+    RECOMMENDATION_ENGINE={"congestion_window_days": 7, "congestion_saturation": 2, "congestion_safety_lag_sec": 0}
+)
+class CongestionProfileTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="crowd@example.com", password="CrowdPass123!")
+        self.busy = Place.objects.create(
+            name="Busy Cafe",
+            category="cafe",
+            rating=4.8,
+            location={"type": "Point", "coordinates": [127.0, 37.26]},
+        )
+        self.quiet = Place.objects.create(name="Quiet Cafe", category="cafe", rating=4.6)
+        self.trip = Trip.objects.create(owner=self.user, context_hash="crowd")
+        self.node = TripNode.objects.create(trip=self.trip, place=self.busy, sequence=1, eta=VISIT)
+
+    def _profile(self, place):
+        place.refresh_from_db()
+        return np.frombuffer(bytes(place.congestion_profile), dtype=np.uint8)
+
+    def test_refresh_aggregates_sources_and_is_incremental(self):
+        Feedback.objects.create(trip=self.trip, trip_node=self.node, user=self.user, metadata={"wait_min": 10})
+        session = PartySession.objects.create(trip=self.trip, host_user=self.user, sharable_token="crowd")
+        for minute in (0, 5, 10):
+            position = PartyPosition.objects.create(
+                session=session, user=self.user, loc={"type": "Point", "coordinates": [127.0003, 37.2601]}
+            )
+            PartyPosition.objects.filter(pk=position.pk).update(recorded_at=VISIT + timedelta(minutes=minute))
+
+        result = refresh_congestion_profiles()
+
+        self.assertEqual(result, {"status": "full", "places": 1})
+        bucket = bucket_of(VISIT)
+        # Feedback (1 + wait bonus 1) and one deduplicated party visit = 3 visits/week against saturation 2.
+        self.assertEqual(self._profile(self.busy)[bucket], 255)
+        self.assertEqual(int(self._profile(self.busy).sum()), 255)
+
+        Post.objects.create(author=self.user, place=self.quiet)
+        result = refresh_congestion_profiles()
+        self.assertEqual(result, {"status": "incremental", "places": 1})
+        self.assertEqual(int(self._profile(self.quiet).max()), 128)
+
+    def test_activity_expires_when_it_leaves_the_window(self):
+        Post.objects.create(author=self.user, place=self.quiet)
+        refresh_congestion_profiles()
+        self.assertEqual(int(self._profile(self.quiet).max()), 128)
+
+        later = timezone.now() + timedelta(days=8)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            refresh_congestion_profiles()
+
+        self.assertEqual(int(self._profile(self.quiet).max()), 0)
+        counts = np.frombuffer(bytes(PlaceCongestion.objects.get(place=self.quiet).counts), dtype=np.float32)
+        self.assertEqual(float(counts.sum()), 0.0)
+
+    def test_late_committed_activity_is_not_skipped(self):
+        engine = {"congestion_window_days": 7, "congestion_saturation": 2, "congestion_safety_lag_sec": 60}
+        started = timezone.now()
+        with override_settings(RECOMMENDATION_ENGINE=engine):
+            refresh_congestion_profiles()
+            # Stamped before the run above, but committed only after it.
+            post = Post.objects.create(author=self.user, place=self.quiet)
+            Post.objects.filter(pk=post.pk).update(created_at=started - timedelta(seconds=10))
+            with mock.patch("django.utils.timezone.now", return_value=started + timedelta(seconds=120)):
+                result = refresh_congestion_profiles()
+
+        self.assertEqual(result, {"status": "incremental", "places": 1})
+        self.assertEqual(int(self._profile(self.quiet).max()), 128)
+
+    def test_crowded_hour_lowers_ranking_at_planned_time(self):
+        profile = np.zeros(168, dtype=np.uint8)
+        profile[[(bucket_of(VISIT) + hour) % 168 for hour in range(3)]] = 255
+        self.busy.congestion_profile = profile.tobytes()
+        self.busy.save()
+
+        def first_stop(start_at):
+            constraints = {"categories": ["cafe"], "limit": 1, "time_budget_min": 120, "start_at": start_at}
+            return create_recommendation(None, constraints).nodes.get().place
+
+        self.assertEqual(first_stop(VISIT), self.quiet)
+        self.assertEqual(first_stop(VISIT - timedelta(hours=6)), self.busy)
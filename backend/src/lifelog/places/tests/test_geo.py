@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from lifelog.places.geo import cells_covering, encode_geohash, haversine_m
+from lifelog.places.models import Place
+
+SUWON_STATION = (37.2663, 127.0001)
+
+
+def _point(lat: float, lng: float) -> dict:
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode_matches_reference_value(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def test_cells_cover_points_inside_radius(self):
+        lat, lng = SUWON_STATION
+        cells = set(cells_covering(lat, lng, 800, 6))
+        for dlat, dlng in [(0.006, 0), (-0.006, 0), (0, 0.008), (0, -0.008), (0.004, 0.005)]:
+            point = (lat + dlat, lng + dlng)
+            self.assertLessEqual(haversine_m(lat, lng, *point), 800)
+            self.assertIn(encode_geohash(*point, 6), cells)
+
+
+class PlaceNearAPITests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        lat, lng = SUWON_STATION
+        self.station_cafe = Place.objects.create(name="Station Cafe", category="cafe", location=_point(lat, lng + 0.001))
+        self.market = Place.objects.create(name="Market", category="food", location=_point(lat + 0.005, lng))
+        self.fortress = Place.objects.create(name="Fortress", category="culture", location=_point(lat + 0.02, lng + 0.01))
+        self.unknown = Place.objects.create(name="No Location", category="cafe")
+
+    def test_save_maintains_grid_columns(self):
+        self.assertAlmostEqual(self.market.latitude, SUWON_STATION[0] + 0.005)
+        self.assertEqual(self.market.geohash, encode_geohash(self.market.latitude, self.market.longitude))
+        self.assertEqual(self.unknown.geohash, "")
+
+        self.unknown.location = _point(*SUWON_STATION)
+        self.unknown.save(update_fields=["location"])
+        self.unknown.refresh_from_db()
+        self.assertEqual(self.unknown.geohash, encode_geohash(*SUWON_STATION))
+
+    def test_near_with_radius_orders_by_distance(self):
+        response = self.client.get("/api/v1/places/", {"near": "%s,%s" % SUWON_STATION, "radius": 1000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [item["name"] for item in response.data["results"]]
+        self.assertEqual(names, ["Station Cafe", "Market"])
+        self.assertLess(response.data["results"][0]["distance_m"], 100)
+
+    def test_k_nearest(self):
+        response = self.client.get("/api/v1/places/", {"near": "%s,%s" % SUWON_STATION, "k": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [item["name"] for item in response.data["results"]]
+        self.assertEqual(names, ["Station Cafe", "Market", "Fortress"])
+
+    def test_invalid_near_is_rejected(self):
+        response = self.client.get("/api/v1/places/", {"near": "north"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_finite_radius_is_rejected(self):
+        for radius in ("nan", "inf"):
+            with self.subTest(radius=radius):
+                response = self.client.get("/api/v1/places/", {"near": "%s,%s" % SUWON_STATION, "radius": radius})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_dense_radius_is_cut_to_the_nearest_places(self):
+        with mock.patch("lifelog.places.views.MAX_NEAR_RESULTS", 2):
+            response = self.client.get("/api/v1/places/", {"near": "%s,%s" % SUWON_STATION, "radius": 5000})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["name"] for item in response.data["results"]], ["Station Cafe", "Market"])
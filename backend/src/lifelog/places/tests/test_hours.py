@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from lifelog.places.hours import HoursError, fits_visit, open_slots, parse_hours, stack_bitmaps
+from lifelog.places.models import Place
+from lifelog.places.tasks import revalidate_opening_hours
+
+# 2026-10-19 is a Monday.
+MONDAY = datetime(2026, 10, 19)
+
+
+class OpeningHoursBitmapTests(SimpleTestCase):
+    def _open(self, hours, start, minutes=15, today=None):
+        bitmap, overrides = parse_hours(hours, today)
+        return open_slots(stack_bitmaps([bitmap]), {0: overrides} if overrides else {}, start, minutes)[0]
+
+    def test_day_ranges_and_daily_default(self):
+        hours = {"daily": "10:00-20:00", "mon": "closed", "토": ["09:00-12:00", "13:00-18:00"]}
+
+        self.assertFalse(self._open(hours, MONDAY.replace(hour=11)).any())
+        self.assertTrue(self._open(hours, MONDAY.replace(hour=10) + timedelta(days=1)).all())
+        self.assertFalse(self._open(hours, MONDAY.replace(hour=20) + timedelta(days=1)).any())
+        saturday_noon = MONDAY.replace(hour=12) + timedelta(days=5)
+        self.assertEqual(self._open(hours, saturday_noon, 60).tolist(), [False, False, False, False])
+
+    def test_overnight_range_wraps_into_next_day_and_week(self):
+        hours = {"sun": "18:00-02:00"}
+
+        self.assertTrue(self._open(hours, MONDAY.replace(hour=1, minute=30)).all())
+        self.assertFalse(self._open(hours, MONDAY.replace(hour=2)).any())
+
+    def test_holiday_override_replaces_the_day(self):
+        hours = {"daily": "09:00-18:00", "holidays": {"2026-10-20": "closed", "2026-10-01": "closed"}}
+
+        bitmap, overrides = parse_hours(hours, today=date(2026, 10, 19))
+        self.assertEqual(list(overrides), ["2026-10-20"])
+        self.assertFalse(self._open(hours, MONDAY.replace(hour=10) + timedelta(days=1)).any())
+        self.assertTrue(self._open(hours, MONDAY.replace(hour=10)).all())
+
+    def test_visit_must_fit_inside_an_open_stretch(self):
+        bitmaps = stack_bitmaps([parse_hours({"daily": "10:00-11:00"})[0], None])
+        stays = np.array([60, 240])
+
+        self.assertEqual(fits_visit(bitmaps, {}, stays, MONDAY.replace(hour=9), 180).tolist(), [True, True])
+        self.assertEqual(fits_visit(bitmaps, {}, stays, MONDAY.replace(hour=10, minute=30), 180).tolist(), [False, True])
+
+    def test_invalid_documents(self):
+        for hours in ({"mon": "9시부터"}, {"funday": "10:00-12:00"}, {"holidays": {"next week": "closed"}}, ["10:00-12:00"]):
+            with self.subTest(hours=hours), self.assertRaises(HoursError):
+                parse_hours(hours)
+        self.assertEqual(parse_hours({}), (None, {}))
+
+
+class PlaceOpeningHoursTests(TestCase):
+    def test_save_builds_bitmap_and_nightly_job_prunes_overrides(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        place = Place.objects.create(name="Cafe", category="cafe", hours={"daily": "24h", "holidays": {tomorrow.isoformat(): "closed"}})
+        broken = Place.objects.create(name="Broken", category="cafe", hours={"mon": "soon"})
+
+        place.refresh_from_db()
+        self.assertEqual(bytes(place.hours_bitmap), b"\xff" * 84)
+        self.assertEqual(list(place.hours_overrides), [tomorrow.isoformat()])
+        self.assertIsNone(broken.hours_bitmap)
+
+        Place.objects.filter(pk=place.pk).update(hours_overrides={"2000-01-01": "00" * 12})
+        result = revalidate_opening_hours()
+
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(result["invalid"], [str(broken.pk)])
+        place.refresh_from_db()
+        self.assertEqual(list(place.hours_overrides), [tomorrow.isoformat()])
+
+
+class PlaceHoursAPITests(APITestCase):
+    def test_staff_write_rejects_unreadable_hours(self):
+        get_user_model().objects.create_user(email="staff@example.com", password="StaffPass123!", is_staff=True)
+        token = self.client.post(
+            "/api/auth/token/", {"email": "staff@example.com", "password": "StaffPass123!"}, format="json"
+        ).data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = self.client.post(
+            "/api/v1/places/", {"name": "Cafe", "category": "cafe", "hours": {"mon": "soon"}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("hours", response.data)
+
+        response = self.client.post(
+            "/api/v1/places/", {"name": "Cafe", "category": "cafe", "hours": {"daily": "10:00-22:00"}}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -1,8 +1,12 @@
 ﻿from __future__ import annotations
 
-from django.db.models import Q
+import math
+
+from django.db.models import Case, FloatField, Q, Value, When
 from rest_framework import permissions, viewsets
+from rest_framework.exceptions import ValidationError
 
+from .geo import parse_lat_lng
 from .models import FavoritePlace, Place, Tag
 from .serializers import FavoritePlaceSerializer, PlaceSerializer, PlaceWriteSerializer, TagSerializer
 
@@ -22,6 +26,13 @@ class TagViewSet(viewsets.ModelViewSet):
     search_fields = ("name",)
 
 
+MAX_NEAR_RADIUS_M = 50_000
+MAX_NEAREST_K = 100
+# The distances are bound into the SQL (two parameters per place), so a dense radius is
+# cut to its nearest places instead of outgrowing the database's parameter limit.
+MAX_NEAR_RESULTS = 200
+
+
 class PlaceViewSet(viewsets.ModelViewSet):
     queryset = Place.objects.filter(is_active=True)
     permission_classes = (IsAdminOrReadOnly,)
@@ -49,8 +60,42 @@ class PlaceViewSet(viewsets.ModelViewSet):
                 | Q(description__icontains=query)
                 | Q(tags__name__icontains=query)
             ).distinct()
+        near = self.request.query_params.get("near")
+        if near:
+            qs = self._filter_near(qs, near)
         return qs
 
+    def _filter_near(self, qs, near: str):
+        """``near=lat,lng`` with ``radius`` (m, default 1000) or ``k`` nearest, ordered by distance.
+
+        At most ``MAX_NEAR_RESULTS`` nearest places are returned.
+        """
+
+        params = self.request.query_params
+        try:
+            lat, lng = parse_lat_lng(near)
+            radius = float(params.get("radius", 1000))
+            k = int(params["k"]) if params.get("k") else None
+        except ValueError:
+            raise ValidationError({"near": "near=lat,lng, radius(m), k 값을 확인해 주세요."})
+        if not math.isfinite(radius) or radius <= 0 or (k is not None and k <= 0):
+            raise ValidationError({"near": "radius, k 는 0보다 커야 합니다."})
+
+        radius = min(radius, MAX_NEAR_RADIUS_M)
+        if k is not None:
+            found = qs.k_nearest(lat, lng, min(k, MAX_NEAREST_K), max_radius_m=radius if "radius" in params else MAX_NEAR_RADIUS_M)
+        else:
+            found = qs.distances_within(lat, lng, radius)[:MAX_NEAR_RESULTS]
+
+        if not found:
+            return qs.none()
+        return qs.filter(id__in=[place_id for place_id, _ in found]).annotate(
+            distance_m=Case(
+                *[When(id=place_id, then=Value(distance)) for place_id, distance in found],
+                output_field=FloatField(),
+            ),
+        ).order_by("distance_m", "id")
+
 
 
 class FavoritePlaceViewSet(viewsets.ModelViewSet):
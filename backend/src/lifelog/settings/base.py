@@ -5,6 +5,7 @@ from pathlib import Path
 
 import logging
 import environ
+from celery.schedules import crontab
 
 SRC_DIR = Path(__file__).resolve().parents[2]
 BASE_DIR = SRC_DIR.parent
@@ -28,6 +29,22 @@ env = environ.Env(
     OPENROUTER_MODEL=(str, "anthropic/claude-3.5-sonnet"),
     OPENROUTER_APP_URL=(str, ""),
     OPENROUTER_TIMEOUT=(int, 45),
+    RECOMMENDATION_PLACE_INDEX_ENABLED=(bool, True),
+    RECOMMENDATION_PLACE_INDEX_MAX_AGE=(int, 900),
+    RECOMMENDATION_ROUTE_BUDGET_MS=(int, 20),
+    RECOMMENDATION_REUSE_WINDOW_SEC=(int, 600),
+    RECOMMENDATION_JOB_RETRY_AFTER_SEC=(int, 2),
+    RECOMMENDATION_PACKING=(str, "knapsack"),
+    RECOMMENDATION_PACKING_TOP_K=(int, 200),
+    RECOMMENDATION_PACKING_BUDGET_MS=(int, 15),
+    RECOMMENDATION_CONGESTION_WINDOW_DAYS=(int, 56),
+    RECOMMENDATION_CONGESTION_SATURATION=(float, 6.0),
+    RECOMMENDATION_PREFERENCE_TOP_N=(int, 500),
+    RECOMMENDATION_FEED_MAX_AGE_SEC=(int, 36 * 60 * 60),
+    RECOMMENDATION_FEED_ACTIVE_DAYS=(int, 14),
+    TRAVEL_MATRIX_DIR=(str, ""),
+    TRAVEL_MATRIX_ESTIMATOR=(str, "lifelog.trips.matrix.HaversineEstimator"),
+    ROUTING_SERVICE_URL=(str, "http://localhost:5000"),
 )
 
 ENV_FILE = BASE_DIR / ".env"
@@ -148,6 +165,7 @@ AUTH_USER_MODEL = "users.User"
 
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = env.list("CORS_ALLOWED_ORIGINS")
+CORS_EXPOSE_HEADERS = ["X-Recommendation-Cache"]
 CSRF_COOKIE_HTTPONLY = True
 SESSION_COOKIE_HTTPONLY = True
 
@@ -185,6 +203,34 @@ SIMPLE_JWT = {
 CELERY_BROKER_URL = env("REDIS_URL")
 CELERY_RESULT_BACKEND = env("REDIS_URL")
 CELERY_TASK_ALWAYS_EAGER = False
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    "trips-train-ranking-weights": {
+        "task": "trips.train_ranking_weights",
+        "schedule": crontab(minute="*/10"),
+    },
+    "places-refresh-congestion-profiles": {
+        "task": "places.refresh_congestion_profiles",
+        "schedule": crontab(minute=10),
+    },
+    "places-revalidate-opening-hours": {
+        "task": "places.revalidate_opening_hours",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "trips-recommendation-feeds": {
+        "task": "trips.build_recommendation_feeds",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "trips-rebuild-course-bundles": {
+        "task": "trips.rebuild_course_bundles",
+        "schedule": crontab(minute="*/15"),
+    },
+    "trips-rebuild-course-bundles-full": {
+        "task": "trips.rebuild_course_bundles",
+        "schedule": crontab(hour=3, minute=0),
+        "kwargs": {"full": True},
+    },
+}
 
 channel_backend = env("CHANNEL_LAYER_BACKEND")
 CHANNEL_LAYERS = {
@@ -206,6 +252,75 @@ OPENROUTER = {
     "timeout": env("OPENROUTER_TIMEOUT"),
 }
 
+# 추천 엔진 튜닝 값. 장소 인덱스는 워커 프로세스마다 메모리에 유지되며,
+# 프로세스 간 변경 전파는 CACHES["default"]를 통해 이루어집니다.
+RECOMMENDATION_ENGINE = {
+    "place_index_enabled": env("RECOMMENDATION_PLACE_INDEX_ENABLED"),
+    "place_index_max_age": env("RECOMMENDATION_PLACE_INDEX_MAX_AGE"),
+    # 동선 최적화 단계에 허용하는 시간(ms). 초과하면 휴리스틱 결과를 사용합니다.
+    "route_budget_ms": env("RECOMMENDATION_ROUTE_BUDGET_MS"),
+    # 같은 사용자·같은 조건의 추천을 이 시간(초) 안에는 새로 계산하지 않고 재사용합니다. 0이면 비활성.
+    "reuse_window_sec": env("RECOMMENDATION_REUSE_WINDOW_SEC"),
+    # 코스 구성 방식. "knapsack"은 상위 K개 후보에서 시간 예산 안의 점수 합을 최대화하고,
+    # 계산 시간(ms)을 넘기면 "greedy"(점수 순으로 채우기)로 돌아갑니다.
+    "packing": env("RECOMMENDATION_PACKING"),
+    "packing_top_k": env("RECOMMENDATION_PACKING_TOP_K"),
+    "packing_budget_ms": env("RECOMMENDATION_PACKING_BUDGET_MS"),
+    # 요일·시간대별 혼잡도: 최근 N일 활동(피드백·게시글·파티 위치)을 집계하고,
+    # 한 시간대에 주당 saturation 회 이상 방문이 기록되면 가장 붐비는 것으로 봅니다.
+    "congestion_window_days": env("RECOMMENDATION_CONGESTION_WINDOW_DAYS"),
+    "congestion_saturation": env("RECOMMENDATION_CONGESTION_SATURATION"),
+    # 늦게 커밋되는 활동을 놓치지 않도록 혼잡도 집계는 현재보다 이 시간(초)만큼 앞에서 멈춥니다.
+    "congestion_safety_lag_sec": 300,
+    # 피드백으로 점수 항목 가중치를 온라인 학습할 때의 학습률(전체 / 사용자별).
+    "learning_global_rate": 0.02,
+    "learning_user_rate": 0.05,
+    # 카테고리·태그 조건이 없을 때 사용자 선호 벡터와 코사인 유사도가 높은 상위 N곳만 점수를 매깁니다.
+    "preference_top_n": env("RECOMMENDATION_PREFERENCE_TOP_N"),
+    # 자연어 조건(q=) 해석 결과를 프로세스별로 보관하는 LRU 캐시 크기.
+    "query_cache_size": 1024,
+    # 단계별 소요 시간을 일별 지표(recommendation.<단계>_ms)에 반영할 요청 표본 비율.
+    "timing_sample_rate": 0.05,
+    # waffle 플래그(recommendation_shadow)가 켜진 요청 중 후보 엔진으로도 추천해 비교할 비율과 엔진 이름.
+    "shadow_sample_rate": 0.1,
+    "shadow_engine": "db",
+    # 신선도 보정: 최근 N일(2세대 회전) 트립에 포함된 장소는 후보에서 제외합니다.
+    "seen_filter_enabled": True,
+    "seen_window_days": 14,
+    # 후보가 scoring_parallel_threshold개 이상이면 scoring_workers개 스레드로 나눠 점수를 매기고
+    # 샤드별 상위 K개를 힙으로 병합합니다. 1이면 항상 단일 스레드로 계산합니다.
+    "scoring_workers": 4,
+    "scoring_parallel_threshold": 100000,
+    # 코스 번들: 구별로 미리 조합해 둔 2~4곳 코스. 평점 상위 후보 수와 최소 평점, 구간·총 소요 상한(분),
+    # 크기별 보관 개수와 빔 폭, 요청마다 다시 점수를 매길 번들 수와 분위기 일치 하한.
+    "bundles_enabled": True,
+    "bundle_candidates": 40,
+    "bundle_min_rating": 3.5,
+    "bundle_max_leg_min": 20,
+    "bundle_max_duration_min": 240,
+    "bundles_per_size": 20,
+    "bundle_beam_width": 200,
+    "bundle_matches": 20,
+    "bundle_min_mood": 0.3,
+    # 추천 세션(도파민 위생): 세션당 제안 수, 세션 보관 시간(초), 세션 종료 후 다음 세션까지 쿨타임(분).
+    "session_size": 9,
+    "session_ttl_sec": 3600,
+    "session_cooldown_min": 10,
+    # 끝나지 않은 비동기 추천 작업 응답의 Retry-After(초). 서버는 기다리지 않고 바로 응답합니다.
+    "job_retry_after_sec": env("RECOMMENDATION_JOB_RETRY_AFTER_SEC"),
+    # 야간 배치로 미리 계산한 사용자별 추천 피드. 최근 N일 활동 사용자만 대상으로 합니다.
+    "feed_courses": 5,
+    "feed_max_age_sec": env("RECOMMENDATION_FEED_MAX_AGE_SEC"),
+    "feed_active_days": env("RECOMMENDATION_FEED_ACTIVE_DAYS"),
+    # 구/이동수단별 이동 시간 행렬(.npy) 저장 위치와 추정기.
+    # 로컬 라우팅 서버를 쓰려면 lifelog.trips.matrix.RoutingServiceEstimator 지정.
+    "travel_matrix_dir": env("TRAVEL_MATRIX_DIR") or str(BASE_DIR / "var" / "travel_matrix"),
+    "travel_matrix_estimator": env("TRAVEL_MATRIX_ESTIMATOR"),
+    "routing_service_url": env("ROUTING_SERVICE_URL"),
+    # 라우팅 서버 /table 요청 한 번에 보내는 출발지·도착지 수(서버 max-table-size와 URL 길이 제한).
+    "routing_table_block": 50,
+}
+
 if SENTRY_DSN:
     import sentry_sdk
     from sentry_sdk.integrations.celery import CeleryIntegration
@@ -5,3 +5,5 @@ class TripsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lifelog.trips'
 
+    def ready(self):
+        from . import signals  # noqa: F401
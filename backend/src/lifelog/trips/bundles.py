@@ -0,0 +1,188 @@
+﻿from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from lifelog.core.cache import cache_lock
+from lifelog.places.models import Place
+
+from .matrix import get_travel_matrix_store
+from .models import CourseBundle, Trip
+from .packing import MIN_STAY_MIN
+from .route import _matrix, plan_route
+
+logger = logging.getLogger(__name__)
+
+DIRTY_CACHE_KEY = "trips:bundles:dirty"
+DIRTY_ALL_CACHE_KEY = "trips:bundles:dirty:all"
+DIRTY_LOCK_CACHE_KEY = "trips:bundles:dirty:lock"
+MIN_STOPS = 2
+MAX_STOPS = 4
+DEFAULT_CANDIDATES = 40
+DEFAULT_BEAM_WIDTH = 200
+DEFAULT_PER_SIZE = 20
+DEFAULT_MAX_LEG_MIN = 20
+DEFAULT_MAX_DURATION_MIN = 240
+DEFAULT_MIN_RATING = 3.5
+# Rating points given up per travel minute when ranking bundles.
+TRAVEL_PENALTY = 0.02
+
+
+def _engine_setting(key: str, default: Any) -> Any:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get(key, default)
+
+
+def mark_districts_dirty(districts: Iterable[str | None]) -> None:
+    """Queue districts whose bundles must be rebuilt by the next incremental run.
+
+    The queue is updated under a cache lock so concurrent marks are not lost; when the
+    lock stays taken, the next run rebuilds every district instead.
+    """
+
+    names = {(district or "").strip().lower() for district in districts} - {""}
+    if not names:
+        return
+    with cache_lock(DIRTY_LOCK_CACHE_KEY) as locked:
+        if locked:
+            cache.set(DIRTY_CACHE_KEY, set(cache.get(DIRTY_CACHE_KEY) or ()) | names, timeout=None)
+            return
+    logger.warning("Bundle queue lock busy; next incremental run rebuilds all districts: %s", sorted(names))
+    cache.set(DIRTY_ALL_CACHE_KEY, True, timeout=None)
+
+
+def pop_dirty_districts() -> set[str]:
+    """Take the queued districts; an empty set while another worker holds the queue."""
+
+    with cache_lock(DIRTY_LOCK_CACHE_KEY) as locked:
+        if not locked:
+            return set()
+        districts = set(cache.get(DIRTY_CACHE_KEY) or ())
+        everything = cache.get(DIRTY_ALL_CACHE_KEY)
+        cache.delete_many([DIRTY_CACHE_KEY, DIRTY_ALL_CACHE_KEY])
+    return (districts | all_districts()) if everything else districts
+
+
+def all_districts() -> set[str]:
+    """Districts a full rebuild visits: those with active places, and those with stored
+    bundles only, whose stale bundles the rebuild then deletes."""
+
+    names = Place.objects.filter(is_active=True).exclude(district="").values_list("district", flat=True).distinct()
+    stored = CourseBundle.objects.values_list("district", flat=True).distinct()
+    return {name.strip().lower() for name in names} | set(stored)
+
+
+def _objective(rating_sum: float, stops: int, travel_min: float) -> float:
+    return rating_sum / stops - TRAVEL_PENALTY * travel_min
+
+
+def _enumerate(ratings: list[float], stays: list[int], travel: list[list[float | None]], limits: dict[str, Any]):
+    """Beam search over paths of 2~4 stops, pruned by leg time, total duration and score.
+
+    Yields ``(positions, objective)`` for the best distinct place sets of each size.
+    """
+
+    max_leg = limits["max_leg_min"]
+    max_duration = limits["max_duration_min"]
+    beam = limits["beam_width"]
+    # (path, rating sum, stay + travel so far, travel so far)
+    frontier = [((position,), ratings[position], stays[position], 0.0) for position in range(len(ratings))]
+    for size in range(MIN_STOPS, MAX_STOPS + 1):
+        best: dict[frozenset[int], tuple] = {}
+        for path, rating_sum, duration, travel_sum in frontier:
+            for position in range(len(ratings)):
+                leg = travel[path[-1]][position]
+                if position in path or leg is None or leg > max_leg:
+                    continue
+                total = duration + leg + stays[position]
+                if total > max_duration:
+                    continue
+                entry = (path + (position,), rating_sum + ratings[position], total, travel_sum + leg)
+                key = frozenset(entry[0])
+                if key not in best or _objective(entry[1], size, entry[3]) > _objective(best[key][1], size, best[key][3]):
+                    best[key] = entry
+        frontier = sorted(best.values(), key=lambda entry: -_objective(entry[1], size, entry[3]))[:beam]
+        for path, rating_sum, _duration, travel_sum in frontier[: limits["per_size"]]:
+            yield path, _objective(rating_sum, size, travel_sum)
+
+
+def _bundle(district: str, mode: str, places: list[Place], score: float, known) -> CourseBundle:
+    plan = plan_route([(p.latitude, p.longitude) for p in places], mode, known=known)
+    ordered = [places[position] for position in plan.order]
+    stay = sum(place.stay_min or MIN_STAY_MIN for place in ordered)
+    priced = [place for place in ordered if place.cost_min is not None]
+    moods: dict[str, float] = {}
+    for place in ordered:
+        for key, value in (place.mood_scores or {}).items():
+            moods[key] = moods.get(key, 0.0) + float(value)
+    return CourseBundle(
+        district=district,
+        mode=mode,
+        stops=len(ordered),
+        place_ids=[str(place.id) for place in ordered],
+        legs_min=[None if leg is None else round(leg, 1) for leg in plan.legs_min],
+        score=round(score, 4),
+        stay_min=stay,
+        travel_min=round(plan.total_travel_min, 1),
+        duration_min=stay + round(plan.total_travel_min),
+        cost_floor=max(place.cost_min for place in priced) if priced else None,
+        cost_ceiling=min(place.cost_max for place in priced if place.cost_max is not None) if priced else None,
+        mood={key: round(total / len(ordered), 2) for key, total in sorted(moods.items())},
+        categories=sorted({place.category for place in ordered if place.category}),
+    )
+
+
+def build_bundles(district: str, modes: Iterable[str] | None = None) -> int:
+    """Replace the bundles of ``district`` for every mode; returns how many were stored.
+
+    Only the ``bundle_candidates`` best-rated located places above ``bundle_min_rating``
+    are combined, so the search stays small whatever the district size.
+    """
+
+    started = time.perf_counter()
+    district = district.strip().lower()
+    modes = list(modes or Trip.Mode.values)
+    limits = {
+        "max_leg_min": _engine_setting("bundle_max_leg_min", DEFAULT_MAX_LEG_MIN),
+        "max_duration_min": _engine_setting("bundle_max_duration_min", DEFAULT_MAX_DURATION_MIN),
+        "beam_width": _engine_setting("bundle_beam_width", DEFAULT_BEAM_WIDTH),
+        "per_size": _engine_setting("bundles_per_size", DEFAULT_PER_SIZE),
+    }
+    places = list(
+        Place.objects.filter(
+            is_active=True,
+            district__iexact=district,
+            rating__gte=_engine_setting("bundle_min_rating", DEFAULT_MIN_RATING),
+            latitude__isnull=False,
+            longitude__isnull=False,
+        ).order_by("-rating", "name")[: _engine_setting("bundle_candidates", DEFAULT_CANDIDATES)]
+    )
+    ratings = [float(place.rating or 0) for place in places]
+    stays = [place.stay_min or MIN_STAY_MIN for place in places]
+    points = [(place.latitude, place.longitude) for place in places]
+    store = get_travel_matrix_store()
+
+    bundles: list[CourseBundle] = []
+    for mode in modes:
+        known = store.lookup(places, mode) if len(places) > 1 else None
+        travel = _matrix(points, mode, known)
+        for path, score in _enumerate(ratings, stays, travel, limits):
+            sub = known[list(path)][:, list(path)] if known is not None else None
+            bundles.append(_bundle(district, mode, [places[position] for position in path], score, sub))
+
+    with transaction.atomic():
+        CourseBundle.objects.filter(district=district, mode__in=modes).delete()
+        CourseBundle.objects.bulk_create(bundles)
+    logger.info(
+        "Course bundles rebuilt: district=%s places=%s bundles=%s elapsed_ms=%.1f",
+        district,
+        len(places),
+        len(bundles),
+        (time.perf_counter() - started) * 1000,
+    )
+    return len(bundles)
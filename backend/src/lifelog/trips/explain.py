@@ -0,0 +1,144 @@
+﻿from __future__ import annotations
+
+import bisect
+import logging
+import random
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Any
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 0.05
+METRIC_PREFIX = "recommendation."
+# Upper bounds (ms) of the latency histogram kept in ``DailyProductMetric.metadata``.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+@dataclass
+class RecommendationTrace:
+    """Where one recommendation spent its time and which branches it took.
+
+    Stages accumulate wall time (a stage entered twice adds up), ``counts`` keeps the
+    candidate count after each filter in order and ``fallbacks`` names every
+    relaxation or alternate path taken.
+    """
+
+    stages: dict[str, float] = field(default_factory=dict)
+    counts: list[tuple[str, int]] = field(default_factory=list)
+    fallbacks: list[str] = field(default_factory=list)
+    path: str = ""
+    explain: bool = False
+    chosen: list[dict[str, Any]] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def count(self, label: str, value: int) -> None:
+        self.counts.append((label, int(value)))
+
+    def fallback(self, name: str) -> None:
+        if name not in self.fallbacks:
+            self.fallbacks.append(name)
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "total_ms": round(self.total_ms, 2),
+            "stages_ms": {name: round(value, 2) for name, value in self.stages.items()},
+            "candidates": [{"step": label, "count": value} for label, value in self.counts],
+            "fallbacks": list(self.fallbacks),
+            "chosen": self.chosen,
+        }
+
+    def finish(self) -> None:
+        """Log the trace and, for a sample of requests, add its timings to the daily metrics."""
+
+        record = self.as_dict()
+        logger.info(
+            "Recommendation %s in %.1fms (%s)",
+            record["path"] or "-",
+            record["total_ms"],
+            ", ".join(f"{name}={value}" for name, value in record["stages_ms"].items()),
+            extra={"recommendation": record},
+        )
+        rate = getattr(settings, "RECOMMENDATION_ENGINE", {}).get("timing_sample_rate", DEFAULT_SAMPLE_RATE)
+        if rate > 0 and random.random() < rate:
+            timings = {"total": record["total_ms"], **record["stages_ms"]}
+            day = timezone.localdate().isoformat()
+
+            def enqueue() -> None:
+                from .tasks import record_recommendation_timings
+
+                record_recommendation_timings.delay(day, timings)
+
+            transaction.on_commit(enqueue)
+
+
+def _bucket(value_ms: float) -> str:
+    position = bisect.bisect_left(BUCKETS_MS, value_ms)
+    return str(BUCKETS_MS[position]) if position < len(BUCKETS_MS) else "inf"
+
+
+def _percentile(buckets: dict[str, int], share: float) -> float | None:
+    """Upper bound of the histogram bucket holding the ``share`` quantile."""
+
+    total = sum(buckets.values())
+    if not total:
+        return None
+    seen = 0
+    for bound in [*map(str, BUCKETS_MS), "inf"]:
+        seen += buckets.get(bound, 0)
+        if seen >= share * total:
+            return float(bound) if bound != "inf" else None
+    return None  # pragma: no cover
+
+
+def record_timings(day: date | str, timings: dict[str, float]) -> None:
+    """Fold one sampled request into ``recommendation.<stage>_ms`` rows of ``day``.
+
+    ``value`` is the running mean; ``metadata`` keeps the sample count, sum, max and a
+    latency histogram with p50/p95 estimates read from it.
+    """
+
+    from lifelog.analytics.models import DailyProductMetric
+
+    day = date.fromisoformat(day) if isinstance(day, str) else day
+    with transaction.atomic():
+        for stage, value_ms in timings.items():
+            metric, _created = DailyProductMetric.objects.select_for_update().get_or_create(
+                date=day, metric=f"{METRIC_PREFIX}{stage}_ms", defaults={"value": Decimal("0")}
+            )
+            meta = metric.metadata or {}
+            buckets = meta.get("buckets", {})
+            buckets[_bucket(value_ms)] = buckets.get(_bucket(value_ms), 0) + 1
+            samples = meta.get("samples", 0) + 1
+            total = meta.get("sum_ms", 0.0) + value_ms
+            metric.metadata = {
+                "samples": samples,
+                "sum_ms": round(total, 3),
+                "max_ms": round(max(meta.get("max_ms", 0.0), value_ms), 3),
+                "buckets": buckets,
+                "p50_ms": _percentile(buckets, 0.5),
+                "p95_ms": _percentile(buckets, 0.95),
+            }
+            metric.value = Decimal(str(round(total / samples, 2)))
+            metric.save(update_fields=["value", "metadata", "updated_at"])
@@ -0,0 +1,167 @@
+﻿from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from lifelog.places.models import Place
+
+from .materialize import materialize, place_tag_names
+from .models import RecommendationFeed, Trip
+from .route import RoutePlan
+from .seen import get_seen_filter, place_keys
+from .services import (
+    _build_trip,
+    _course_card,
+    _json_safe,
+    _order_route,
+    _prepare_context,
+    _prepare_user_context,
+    _recommendation_hash,
+    _select_courses,
+)
+
+DEFAULT_FEED_COURSES = 5
+DEFAULT_FEED_MAX_AGE_SEC = 36 * 60 * 60
+DEFAULT_FEED_ACTIVE_DAYS = 14
+DEFAULT_FEED_CHUNK_SIZE = 200
+FEED_PREFERRED_TAGS = 5
+
+
+def _engine_setting(key: str, default: Any) -> Any:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get(key, default)
+
+
+def default_constraints(user) -> dict[str, Any]:
+    """The request the trip tab sends for ``user`` when nothing is changed."""
+
+    tags = list(user.preferred_tags.order_by("-priority", "-created_at").values_list("tag__name", flat=True))
+    constraints: dict[str, Any] = {
+        "time_budget_min": user.time_budget_min,
+        "mode": user.mobility_mode,
+        "limit": 3,
+    }
+    if tags:
+        constraints["tags"] = tags[:FEED_PREFERRED_TAGS]
+    return constraints
+
+
+def active_user_ids() -> list:
+    cutoff = timezone.now() - timedelta(days=_engine_setting("feed_active_days", DEFAULT_FEED_ACTIVE_DAYS))
+    return list(
+        get_user_model()
+        .objects.filter(is_active=True)
+        .filter(Q(last_login__gte=cutoff) | Q(trips__created_at__gte=cutoff))
+        .order_by("id")
+        .values_list("id", flat=True)
+        .distinct()
+    )
+
+
+def build_feed(user) -> RecommendationFeed:
+    """Score once for the user's default constraints and store the top courses."""
+
+    constraints = _json_safe(default_constraints(user))
+    ctx = _prepare_user_context(user.id, constraints)
+    courses: list[dict[str, Any]] = []
+    for places in _select_courses(ctx, _engine_setting("feed_courses", DEFAULT_FEED_COURSES)):
+        ordered, route = _order_route(places, ctx)
+        trip, nodes = _build_trip(user, ordered, route, ctx, constraints, "", {})
+        card = _course_card(trip, nodes, route, ctx)
+        card.pop("trip_id")
+        courses.append(
+            {
+                **card,
+                "place_ids": [str(place.id) for place in ordered],
+                "places": [{"id": str(p.id), "name": p.name, "category": p.category} for p in ordered],
+                "legs_min": route.legs_min,
+                "solver": route.solver,
+            }
+        )
+
+    feed, _created = RecommendationFeed.objects.update_or_create(
+        user=user,
+        defaults={
+            "context_hash": _recommendation_hash(str(user.id), constraints),
+            "constraints": constraints,
+            "courses": courses,
+            "computed_at": timezone.now(),
+        },
+    )
+    return feed
+
+
+def is_fresh(feed: RecommendationFeed | None) -> bool:
+    if feed is None or not feed.courses:
+        return False
+    max_age = timedelta(seconds=_engine_setting("feed_max_age_sec", DEFAULT_FEED_MAX_AGE_SEC))
+    return timezone.now() - feed.computed_at <= max_age
+
+
+def get_feed(user) -> tuple[RecommendationFeed, bool]:
+    """Return ``(feed, precomputed)``; rebuilds live when the stored one is stale or outdated."""
+
+    feed = RecommendationFeed.objects.filter(user=user).first()
+    if is_fresh(feed) and feed.constraints == _json_safe(default_constraints(user)):
+        return feed, True
+    return build_feed(user), False
+
+
+@transaction.atomic
+def trip_from_feed(user_id: str | None, raw_constraints: dict[str, Any]) -> Trip | None:
+    """Materialize the best stored course when the request equals the feed's constraints.
+
+    Courses with a closed or recently seen place are passed over for the next one; with none
+    left ``None`` sends the request down the live path.
+    """
+
+    if not user_id:
+        return None
+    feed = RecommendationFeed.objects.select_related("user").filter(user_id=user_id).first()
+    raw_constraints = _json_safe(raw_constraints)
+    if not is_fresh(feed) or feed.context_hash != _recommendation_hash(user_id, raw_constraints):
+        return None
+
+    all_ids = list({place_id for course in feed.courses for place_id in course["place_ids"]})
+    places = {str(pk): place for pk, place in Place.objects.filter(is_active=True).in_bulk(all_ids).items()}
+    seen_filter = get_seen_filter(user_id)
+    seen: set[str] = set()
+    if seen_filter is not None and places:
+        ids = list(places)
+        seen = {place_id for place_id, hit in zip(ids, seen_filter.contains(place_keys(ids), ids)) if hit}
+    course = next(
+        (
+            course
+            for course in feed.courses
+            if all(place_id in places and place_id not in seen for place_id in course["place_ids"])
+        ),
+        None,
+    )
+    if course is None:
+        return None
+    place_ids = course["place_ids"]
+
+    ctx = _prepare_context(raw_constraints)
+    legs = course.get("legs_min") or [None] * len(place_ids)
+    route = RoutePlan(
+        order=list(range(len(place_ids))),
+        legs_min=legs,
+        total_travel_min=sum(leg for leg in legs if leg is not None),
+        solver=course.get("solver", "identity"),
+    )
+    trip, nodes = _build_trip(
+        feed.user,
+        [places[place_id] for place_id in place_ids],
+        route,
+        ctx,
+        raw_constraints,
+        feed.context_hash,
+        place_tag_names(place_ids),
+    )
+    trip.summary["source"] = "feed"
+    return materialize(trip, nodes).parent
@@ -0,0 +1,459 @@
+﻿from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from lifelog.places.budget import budget_level_from_amount
+from lifelog.places.congestion import HOURS_PER_WEEK
+from lifelog.places.geo import EARTH_RADIUS_M, cells_covering
+from lifelog.places.hours import ALWAYS_OPEN, WEEK_BYTES, fits_visit
+from lifelog.places.models import Place, PlaceTag
+
+from .seen import HASHES, place_keys
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = "trips:place-index:version"
+CHANGES_CACHE_KEY = "trips:place-index:changes:{version}"
+CHANGE_LOG_TTL = 60 * 60
+MAX_INCREMENTAL_STEPS = 200
+LOAD_CHUNK_SIZE = 500
+NO_COST = -1
+GRID_PRECISION = 6
+
+
+def _engine_setting(key: str, default: Any) -> Any:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get(key, default)
+
+
+def mark_places_changed(place_ids: Iterable[Any]) -> None:
+    """Publish changed place ids so every process can patch its index incrementally."""
+
+    ids = sorted({str(place_id) for place_id in place_ids if place_id})
+    if not ids:
+        return
+    cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:  # pragma: no cover - key evicted between add and incr
+        cache.set(VERSION_CACHE_KEY, 1, timeout=None)
+        version = 1
+    cache.set(CHANGES_CACHE_KEY.format(version=version), ids, timeout=CHANGE_LOG_TTL)
+
+
+def _current_version() -> int:
+    return int(cache.get(VERSION_CACHE_KEY) or 0)
+
+
+def mood_values(mood_scores: dict[str, Any] | None) -> list[tuple[str, float]]:
+    """Readable ``(key, score)`` pairs of ``Place.mood_scores``, in document order."""
+
+    values: list[tuple[str, float]] = []
+    for key, value in (mood_scores or {}).items():
+        try:
+            values.append((key, float(value)))
+        except (TypeError, ValueError):
+            continue
+    return values
+
+
+def place_norm(tag_count: int, moods: Sequence[tuple[str, float]]) -> float:
+    """Length of a place's vector; stored per row so cosine similarity needs no per-request pass."""
+
+    return math.sqrt(tag_count + sum(score * score for _key, score in moods))
+
+
+class PlaceIndex:
+    """Columnar snapshot of the active places at ``version``.
+
+    Every column is a NumPy array with one row per place. A published snapshot is never
+    changed: a refresh builds a new one (``build``, or ``patched`` which tombstones the
+    changed rows through ``alive`` and re-appends them) and ``SharedPlaceIndex`` swaps
+    it in, so a reader keeps consistent columns for as long as it holds its snapshot.
+    """
+
+    def __init__(self) -> None:
+        self.version: int | None = None
+        self.built_at = 0.0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.size = 0
+        self.ids: list[str] = []
+        self.names: list[str] = []
+        self.row_of: dict[str, int] = {}
+        self.category_codes: dict[str, int] = {}
+        self.district_codes: dict[str, int] = {}
+        self.tag_bits: dict[str, int] = {}
+        self.mood_dims: dict[str, int] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.category = np.zeros(0, dtype=np.int32)
+        self.district = np.zeros(0, dtype=np.int32)
+        self.tags = np.zeros((0, 1), dtype=np.uint64)
+        self.cost_low = np.zeros(0, dtype=np.int64)
+        self.cost_high = np.zeros(0, dtype=np.int64)
+        self.budget_level = np.zeros(0, dtype=np.int8)
+        self.stay_min = np.zeros(0, dtype=np.int32)
+        self.rating = np.zeros(0, dtype=np.float64)
+        self.mood = np.zeros((0, 0), dtype=np.float64)
+        self.latitude = np.zeros(0, dtype=np.float64)
+        self.longitude = np.zeros(0, dtype=np.float64)
+        self.hours = np.zeros((0, WEEK_BYTES), dtype=np.uint8)
+        self.hours_overrides: dict[int, dict[str, str]] = {}
+        self.congestion = np.zeros((0, HOURS_PER_WEEK), dtype=np.uint8)
+        self.vector_norm = np.zeros(0, dtype=np.float64)
+        self.seen_keys = np.zeros((0, HASHES), dtype=np.uint32)
+        self.cells: dict[str, list[int]] = {}
+        self._name_rank: np.ndarray | None = None
+
+    # ------------------------------------------------------------------
+    # building new snapshots
+    # ------------------------------------------------------------------
+    @classmethod
+    def build(cls, version: int) -> PlaceIndex:
+        started = time.perf_counter()
+        index = cls()
+        index._load(list(Place.objects.filter(is_active=True).values_list("id", flat=True)))
+        index.version = version
+        index.built_at = time.monotonic()
+        logger.info(
+            "Place index rebuilt: rows=%s version=%s elapsed_ms=%.1f",
+            index.size,
+            version,
+            (time.perf_counter() - started) * 1000,
+        )
+        return index
+
+    def patched(self, place_ids: Iterable[Any], version: int) -> PlaceIndex:
+        """New snapshot with the rows of ``place_ids`` reloaded from the database."""
+
+        changed = {str(place_id) for place_id in place_ids}
+        index = self.without(changed)
+        index._load(changed)
+        index.version = version
+        return index
+
+    def without(self, place_ids: Iterable[Any]) -> PlaceIndex:
+        """New snapshot with the rows of ``place_ids`` tombstoned."""
+
+        index = self._copy()
+        for place_id in place_ids:
+            row = index.row_of.pop(str(place_id), None)
+            if row is not None:
+                index.alive[row] = False
+        return index
+
+    def _copy(self) -> PlaceIndex:
+        index = PlaceIndex.__new__(PlaceIndex)
+        for name, value in vars(self).items():
+            if isinstance(value, (np.ndarray, list, dict)):
+                value = value.copy()
+            setattr(index, name, value)
+        index.cells = {cell: list(rows) for cell, rows in self.cells.items()}
+        return index
+
+    def _load(self, place_ids: Iterable[Any]) -> None:
+        ids = list(place_ids)
+        records: list[tuple] = []
+        tags_by_place: dict[str, list[str]] = {}
+        for start in range(0, len(ids), LOAD_CHUNK_SIZE):
+            chunk = ids[start : start + LOAD_CHUNK_SIZE]
+            records.extend(
+                Place.objects.filter(id__in=chunk, is_active=True).values_list(
+                    "id",
+                    "name",
+                    "category",
+                    "district",
+                    "cost_min",
+                    "cost_max",
+                    "budget_level",
+                    "stay_min",
+                    "rating",
+                    "latitude",
+                    "longitude",
+                    "geohash",
+                    "mood_scores",
+                    "hours_bitmap",
+                    "hours_overrides",
+                    "congestion_profile",
+                )
+            )
+            for place_id, tag_name in PlaceTag.objects.filter(place_id__in=chunk).values_list("place_id", "tag__name"):
+                tags_by_place.setdefault(str(place_id), []).append(tag_name)
+        if records:
+            self._append(records, tags_by_place)
+
+    def _append(self, records: list[tuple], tags_by_place: dict[str, list[str]]) -> None:
+        start = self.size
+        end = start + len(records)
+        self._grow(end)
+
+        categories: list[int] = []
+        districts: list[int] = []
+        tag_cells: list[tuple[int, int]] = []
+        mood_cells: list[tuple[int, int, float]] = []
+        norms: list[float] = []
+
+        for row, record in enumerate(records, start):
+            place_id, name, category, district, *_columns, geohash, mood_scores, hours_bitmap, hours_overrides, congestion = record
+            key = str(place_id)
+            self.ids.append(key)
+            self.names.append(name or "")
+            self.row_of[key] = row
+            categories.append(self.category_codes.setdefault(category or "", len(self.category_codes)))
+            district_key = (district or "").lower()
+            districts.append(self.district_codes.setdefault(district_key, len(self.district_codes)) if district_key else -1)
+
+            self.hours[row] = np.frombuffer(bytes(hours_bitmap) if hours_bitmap else ALWAYS_OPEN, dtype=np.uint8)
+            if hours_overrides:
+                self.hours_overrides[row] = hours_overrides
+            self.congestion[row] = np.frombuffer(bytes(congestion), dtype=np.uint8) if congestion else 0
+
+            if geohash:
+                self.cells.setdefault(geohash[:GRID_PRECISION], []).append(row)
+
+            tag_names = dict.fromkeys(tags_by_place.get(key, ()))
+            for tag_name in tag_names:
+                tag_cells.append((row, self.tag_bits.setdefault(tag_name, len(self.tag_bits))))
+
+            moods = mood_values(mood_scores)
+            for mood_key, score in moods:
+                mood_cells.append((row, self.mood_dims.setdefault(mood_key, len(self.mood_dims)), score))
+            norms.append(place_norm(len(tag_names), moods))
+
+        self.alive[start:end] = True
+        self.category[start:end] = categories
+        self.district[start:end] = districts
+        self.cost_low[start:end] = [NO_COST if record[4] is None else record[4] for record in records]
+        self.cost_high[start:end] = [NO_COST if record[5] is None else record[5] for record in records]
+        self.budget_level[start:end] = [record[6] or 0 for record in records]
+        self.stay_min[start:end] = [record[7] or 0 for record in records]
+        self.rating[start:end] = [float(record[8] or 0) for record in records]
+        self.latitude[start:end] = [np.nan if record[9] is None else record[9] for record in records]
+        self.longitude[start:end] = [np.nan if record[10] is None else record[10] for record in records]
+        self.vector_norm[start:end] = norms
+        self.seen_keys[start:end] = place_keys(self.ids[start:end])
+
+        self._ensure_tag_words(len(self.tag_bits) // 64 + 1)
+        self.tags[start:end] = 0
+        for row, bit in tag_cells:
+            self.tags[row, bit // 64] |= np.uint64(1 << (bit % 64))
+
+        self._ensure_mood_dims(len(self.mood_dims))
+        self.mood[start:end] = 0
+        if mood_cells:
+            rows, dims, values = zip(*mood_cells)
+            self.mood[list(rows), list(dims)] = values
+
+        self.size = end
+        self._name_rank = None
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.alive)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+
+        def extend(column: np.ndarray, fill: Any = 0) -> np.ndarray:
+            shape = (new_capacity,) + column.shape[1:]
+            grown = np.full(shape, fill, dtype=column.dtype)
+            grown[:capacity] = column
+            return grown
+
+        self.alive = extend(self.alive, False)
+        self.category = extend(self.category)
+        self.district = extend(self.district, -1)
+        self.tags = extend(self.tags)
+        self.cost_low = extend(self.cost_low, NO_COST)
+        self.cost_high = extend(self.cost_high, NO_COST)
+        self.budget_level = extend(self.budget_level)
+        self.stay_min = extend(self.stay_min)
+        self.rating = extend(self.rating)
+        self.mood = extend(self.mood)
+        self.latitude = extend(self.latitude, np.nan)
+        self.longitude = extend(self.longitude, np.nan)
+        self.hours = extend(self.hours, 0xFF)
+        self.congestion = extend(self.congestion)
+        self.vector_norm = extend(self.vector_norm)
+        self.seen_keys = extend(self.seen_keys)
+
+    def _ensure_tag_words(self, words: int) -> None:
+        if words > self.tags.shape[1]:
+            self.tags = np.pad(self.tags, ((0, 0), (0, words - self.tags.shape[1])))
+
+    def _ensure_mood_dims(self, dims: int) -> None:
+        if dims > self.mood.shape[1]:
+            self.mood = np.pad(self.mood, ((0, 0), (0, max(dims, self.mood.shape[1] * 2) - self.mood.shape[1])))
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+    @property
+    def name_rank(self) -> np.ndarray:
+        """Rank of each row by place name, matching ``Place.Meta.ordering`` for tie-breaks."""
+
+        if self._name_rank is None or len(self._name_rank) != self.size:
+            order = np.argsort(np.array(self.names, dtype=str), kind="stable")
+            rank = np.empty(self.size, dtype=np.int64)
+            rank[order] = np.arange(self.size)
+            self._name_rank = rank
+        return self._name_rank
+
+    def active_mask(self, skip_place_ids: Iterable[Any] | None = None) -> np.ndarray:
+        mask = self.alive[: self.size].copy()
+        for place_id in skip_place_ids or ():
+            row = self.row_of.get(str(place_id))
+            if row is not None:
+                mask[row] = False
+        return mask
+
+    def category_mask(self, categories: Iterable[str]) -> np.ndarray:
+        codes = [self.category_codes[c] for c in categories if c in self.category_codes]
+        return np.isin(self.category[: self.size], codes)
+
+    def district_mask(self, district: str) -> np.ndarray:
+        code = self.district_codes.get(district.lower())
+        if code is None:
+            return np.zeros(self.size, dtype=bool)
+        return self.district[: self.size] == code
+
+    def tag_mask(self, tag_names: Iterable[str]) -> np.ndarray:
+        query = np.zeros(self.tags.shape[1], dtype=np.uint64)
+        for name in tag_names:
+            bit = self.tag_bits.get(name)
+            if bit is not None:
+                query[bit // 64] |= np.uint64(1 << (bit % 64))
+        return np.any(self.tags[: self.size] & query, axis=1)
+
+    def budget_mask(self, budget_min: int, budget_max: int) -> np.ndarray:
+        low = self.cost_low[: self.size]
+        high = self.cost_high[: self.size]
+        level = self.budget_level[: self.size]
+
+        numeric_ok = np.ones(self.size, dtype=bool)
+        if budget_min:
+            numeric_ok &= high >= budget_min
+        if budget_max:
+            numeric_ok &= low <= budget_max
+
+        min_level = budget_level_from_amount(budget_min) if budget_min > 0 else 1
+        max_level = budget_level_from_amount(budget_max) if budget_max > 0 else 3
+        label_ok = (level >= min_level) & (level <= max_level)
+
+        return np.where(low != NO_COST, numeric_ok, np.where(level > 0, label_ok, True))
+
+    def time_mask(self, time_budget_min: int) -> np.ndarray:
+        stay = self.stay_min[: self.size]
+        return (stay == 0) | (stay <= time_budget_min)
+
+    def open_mask(self, rows: np.ndarray, start: datetime, window_min: int) -> np.ndarray:
+        """Which ``rows`` stay open for their whole stay somewhere in ``[start, start + window_min)``."""
+
+        overrides = {position: self.hours_overrides[row] for position, row in enumerate(rows.tolist()) if row in self.hours_overrides}
+        return fits_visit(self.hours[rows], overrides, self.stay_min[rows], start, window_min)
+
+    def rows_near(self, lat: float, lng: float, radius_m: float) -> tuple[np.ndarray, np.ndarray]:
+        """Live rows within ``radius_m`` and their distances, found through the geohash grid."""
+
+        buckets = [self.cells[cell] for cell in cells_covering(lat, lng, radius_m, GRID_PRECISION) if cell in self.cells]
+        if not buckets:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        rows = np.concatenate([np.asarray(bucket, dtype=np.int64) for bucket in buckets])
+        rows = rows[self.alive[rows]]
+        distances = haversine_m(lat, lng, self.latitude[rows], self.longitude[rows])
+        within = distances <= radius_m
+        return rows[within], distances[within]
+
+    def radius_mask(self, lat: float, lng: float, radius_m: float) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        rows, _distances = self.rows_near(lat, lng, radius_m)
+        mask[rows] = True
+        return mask
+
+
+def haversine_m(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class SharedPlaceIndex:
+    """The process-wide current ``PlaceIndex``, replaced as a whole on every refresh.
+
+    Only writers take the lock; readers get the current snapshot from ``ensure_fresh``
+    and keep using it, so a concurrent rebuild cannot mix old and new columns.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.current = PlaceIndex()
+
+    def clear(self) -> None:
+        """Drop the snapshot; the next ``ensure_fresh`` rebuilds from the database."""
+
+        with self._lock:
+            self.current = PlaceIndex()
+
+    def ensure_fresh(self) -> PlaceIndex:
+        with self._lock:
+            index = self.current
+            target = _current_version()
+            max_age = _engine_setting("place_index_max_age", 900)
+            if index.version is None or target < index.version or time.monotonic() - index.built_at > max_age:
+                self.current = PlaceIndex.build(target)
+            elif target > index.version:
+                self.current = self._caught_up(index, target)
+            return self.current
+
+    def rebuild(self) -> PlaceIndex:
+        with self._lock:
+            self.current = PlaceIndex.build(_current_version())
+            return self.current
+
+    def discard(self, place_ids: Iterable[Any]) -> PlaceIndex:
+        """Tombstone rows of places found missing from the database; returns the new snapshot."""
+
+        with self._lock:
+            self.current = self.current.without(place_ids)
+            return self.current
+
+    def _caught_up(self, index: PlaceIndex, target: int) -> PlaceIndex:
+        if target - index.version > MAX_INCREMENTAL_STEPS:
+            return PlaceIndex.build(target)
+        changed: set[str] = set()
+        for version in range(index.version + 1, target + 1):
+            ids = cache.get(CHANGES_CACHE_KEY.format(version=version))
+            if ids is None:
+                return PlaceIndex.build(target)
+            changed.update(ids)
+        patched = index.patched(changed, target)
+        if patched.size - len(patched.row_of) > max(LOAD_CHUNK_SIZE, patched.size // 2):
+            return PlaceIndex.build(target)
+        return patched
+
+
+_place_index = SharedPlaceIndex()
+
+
+def get_place_index() -> PlaceIndex:
+    """Current snapshot of the active places; hold on to it for the whole selection."""
+
+    return _place_index.ensure_fresh()
+
+
+def rebuild_place_index() -> PlaceIndex:
+    return _place_index.rebuild()
+
+
+def discard_places(place_ids: Iterable[Any]) -> PlaceIndex:
+    return _place_index.discard(place_ids)
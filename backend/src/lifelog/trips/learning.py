@@ -0,0 +1,187 @@
+﻿from __future__ import annotations
+
+import math
+from collections import defaultdict
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from lifelog.feedback.models import Feedback
+
+from .models import RankingWatermark, RankingWeights, Trip, TripNode
+from .preferences import get_preference_vector
+from .scoring import DEFAULT_WEIGHTS, FEATURES, arrays_from_places, score_terms
+
+WEIGHTS_CACHE_KEY = "trips:ranking-weights:{key}"
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_GLOBAL_RATE = 0.02
+DEFAULT_USER_RATE = 0.05
+USER_DECAY = 0.001
+MIN_WEIGHT = 0.0
+MAX_WEIGHT = 3.0
+RATING_TARGET = {Feedback.Rating.BAD: 0.0, Feedback.Rating.NEUTRAL: 0.5, Feedback.Rating.GOOD: 1.0}
+STAY_SHARE = 0.2
+
+# Stored vectors are the term weights followed by a bias; users store offsets from the global vector.
+# The starting bias puts a typical score (~4) at a predicted satisfaction of 0.5.
+GLOBAL_START = np.array([*DEFAULT_WEIGHTS, -4.0])
+USER_START = np.zeros(len(FEATURES) + 1)
+
+
+def _engine_setting(key: str, default: Any) -> Any:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get(key, default)
+
+
+def _cache_key(user_id: Any) -> str:
+    return WEIGHTS_CACHE_KEY.format(key=user_id or "global")
+
+
+def _aligned(stored: list[float], start: np.ndarray) -> np.ndarray:
+    """Stored vector as a float array; terms added to ``FEATURES`` since it was saved start
+    from ``start`` and the bias stays last."""
+
+    vector = np.asarray(stored, dtype=np.float64)
+    if len(vector) < len(start):
+        vector = np.concatenate([vector[:-1], start[len(vector) - 1 : -1], vector[-1:]])
+    return vector
+
+
+def _combine(global_vector: list[float] | None, user_vector: list[float] | None) -> tuple[float, ...]:
+    if not global_vector:
+        return DEFAULT_WEIGHTS
+    vector = _aligned(global_vector, GLOBAL_START)[: len(FEATURES)]
+    if user_vector:
+        vector = vector + _aligned(user_vector, USER_START)[: len(FEATURES)]
+    return tuple(float(weight) for weight in np.clip(vector, MIN_WEIGHT, MAX_WEIGHT))
+
+
+def get_ranking_weights(user_id: Any = None) -> tuple[float, ...]:
+    """Term weights for ``user_id`` (global ones when anonymous): one cache round trip.
+
+    A cold cache costs one query, after which the vectors (or their absence) stay cached
+    until the trainer publishes new ones.
+    """
+
+    keys = [_cache_key(None)] + ([_cache_key(user_id)] if user_id else [])
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        owners = Q(user__isnull=True) | Q(user_id=user_id) if user_id else Q(user__isnull=True)
+        rows = {_cache_key(owner): weights for owner, weights in RankingWeights.objects.filter(owners).values_list("user_id", "weights")}
+        found = {key: rows.get(key, []) for key in keys}
+        cache.set_many(found, timeout=None)
+    return _combine(found[keys[0]], found[keys[1]] if user_id else None)
+
+
+def _target(feedback: Feedback, planned_stay_min: int) -> float:
+    target = RATING_TARGET.get(feedback.rating, 0.5)
+    if feedback.stay_actual_min and planned_stay_min:
+        stayed = min(feedback.stay_actual_min / planned_stay_min, 1.0)
+        target = (1 - STAY_SHARE) * target + STAY_SHARE * stayed
+    return target
+
+
+def _trip_inputs(trip: Trip, nodes: list[TripNode]) -> dict[str, Any]:
+    """The trip's constraints with the start it was planned for, so congestion is looked up
+    at the visit's hours, not at training time: the requested start, else the first ETA,
+    else when the trip was created (the request's "now")."""
+
+    inputs = trip.inputs or {}
+    etas = [node.eta for node in nodes if node.eta is not None]
+    return {**inputs, "start_at": inputs.get("start_at") or (min(etas) if etas else trip.created_at)}
+
+
+def _examples(feedback: Feedback, preference: dict[str, float] | None = None) -> list[tuple[np.ndarray, float]]:
+    """``(terms, target)`` for the rated stop, or every stop of the trip for trip-level feedback.
+
+    ``preference`` is the user's vector, so the preference term is the one their requests score.
+    """
+
+    from .services import _prepare_context
+
+    nodes = [feedback.trip_node] if feedback.trip_node_id else list(feedback.trip.nodes.all())
+    if not nodes:
+        return []
+    ctx = _prepare_context(_trip_inputs(feedback.trip, nodes))
+    ctx.preference = preference
+    terms = score_terms(arrays_from_places([node.place for node in nodes], ctx), ctx)
+    return [(np.append(row, 1.0), _target(feedback, node.planned_stay_min)) for row, node in zip(terms, nodes)]
+
+
+def _step(
+    global_vector: np.ndarray,
+    user_vector: np.ndarray,
+    features: np.ndarray,
+    target: float,
+    rates: tuple[float, float],
+) -> None:
+    """One logistic-regression SGD step on ``sigmoid((global + user) . features)``, in place."""
+
+    margin = float(np.clip((global_vector + user_vector) @ features, -30, 30))
+    error = target - 1 / (1 + math.exp(-margin))
+    global_vector += rates[0] * error * features
+    global_vector[: len(FEATURES)] = np.clip(global_vector[: len(FEATURES)], MIN_WEIGHT, MAX_WEIGHT)
+    user_vector *= 1 - USER_DECAY
+    user_vector += rates[1] * error * features
+
+
+def train_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Learn from the next ``batch_size`` feedback rows after the watermark; returns how many."""
+
+    with transaction.atomic():
+        watermark = RankingWatermark.objects.select_for_update().filter(pk=1).first()
+        qs = Feedback.objects.select_related("trip", "trip_node__place").prefetch_related(
+            "trip_node__place__tags", "trip__nodes__place__tags"
+        )
+        if watermark is not None:
+            qs = qs.filter(
+                Q(created_at__gt=watermark.processed_until)
+                | Q(created_at=watermark.processed_until, id__gt=watermark.last_feedback_id)
+            )
+        batch = list(qs.order_by("created_at", "id")[:batch_size])
+        if not batch:
+            return 0
+
+        global_row = RankingWeights.objects.select_for_update().filter(user__isnull=True).first()
+        global_row = global_row or RankingWeights(user=None, weights=GLOBAL_START.tolist())
+        user_ids = {feedback.user_id for feedback in batch}
+        user_rows = {row.user_id: row for row in RankingWeights.objects.select_for_update().filter(user_id__in=user_ids)}
+
+        global_vector = _aligned(global_row.weights, GLOBAL_START)
+        user_vectors: dict[Any, np.ndarray] = {
+            user_id: _aligned(row.weights, USER_START) for user_id, row in user_rows.items()
+        }
+        rates = (
+            _engine_setting("learning_global_rate", DEFAULT_GLOBAL_RATE),
+            _engine_setting("learning_user_rate", DEFAULT_USER_RATE),
+        )
+        preferences = {user_id: get_preference_vector(user_id) for user_id in user_ids}
+        samples: dict[Any, int] = defaultdict(int)
+        for feedback in batch:
+            user_vector = user_vectors.setdefault(feedback.user_id, USER_START.copy())
+            for features, target in _examples(feedback, preferences[feedback.user_id]):
+                _step(global_vector, user_vector, features, target, rates)
+                samples[feedback.user_id] += 1
+
+        global_row.weights = global_vector.tolist()
+        global_row.samples += sum(samples.values())
+        global_row.save()
+        for user_id, count in samples.items():
+            row = user_rows.get(user_id) or RankingWeights(user_id=user_id)
+            row.weights = user_vectors[user_id].tolist()
+            row.samples += count
+            row.save()
+            user_rows[user_id] = row
+
+        last = batch[-1]
+        RankingWatermark.objects.update_or_create(
+            pk=1, defaults={"processed_until": last.created_at, "last_feedback_id": last.id}
+        )
+
+    published = {_cache_key(None): global_row.weights}
+    published.update({_cache_key(user_id): row.weights for user_id, row in user_rows.items()})
+    cache.set_many(published, timeout=None)
+    return len(batch)
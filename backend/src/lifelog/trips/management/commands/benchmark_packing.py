@@ -0,0 +1,54 @@
+﻿from __future__ import annotations
+
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from lifelog.trips.packing import MIN_STAY_MIN, knapsack, leg_estimates
+from lifelog.trips.services import RecommendationContext, _fill_time_budget
+
+
+class Command(BaseCommand):
+    help = "임의로 만든 후보 K개에 대해 greedy와 knapsack 코스 구성의 점수 합과 계산 시간을 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="50,200,1000", help="후보 수 K 목록(쉼표 구분)")
+        parser.add_argument("--runs", type=int, default=20, help="K마다 반복할 횟수")
+        parser.add_argument("--time-budget", type=int, default=240, help="코스 시간 예산(분)")
+        parser.add_argument("--limit", type=int, default=5, help="코스당 최대 장소 수")
+        parser.add_argument("--mode", default="walk", help="이동수단")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        ctx = RecommendationContext(time_budget_min=options["time_budget"], limit=options["limit"], mode=options["mode"])
+
+        self.stdout.write(f"{'K':>6} {'greedy ms':>10} {'knapsack ms':>12} {'점수 비율':>9} {'예산 사용(g/k)':>16}")
+        for size in [int(value) for value in options["sizes"].split(",") if value.strip()]:
+            greedy_ms, knapsack_ms, ratios, greedy_use, knapsack_use = [], [], [], [], []
+            for _run in range(options["runs"]):
+                scores = np.sort(rng.gamma(2.0, 0.6, size))[::-1]
+                stays = rng.choice([20, 30, 45, 60, 90, 120], size)
+                lat = 37.26 + rng.normal(0, 0.01, size)
+                lng = 127.02 + rng.normal(0, 0.01, size)
+
+                # Called as _pack_course does: greedy filling budgets stays only, not travel.
+                started = time.perf_counter()
+                greedy = _fill_time_budget(list(range(size)), stays.tolist(), ctx)
+                greedy_ms.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                costs = np.maximum(stays, MIN_STAY_MIN) + leg_estimates(lat, lng, ctx.mode)
+                packed = knapsack(scores, costs, ctx.time_budget_min, ctx.limit) or greedy
+                knapsack_ms.append((time.perf_counter() - started) * 1000)
+
+                ratios.append(scores[packed].sum() / max(scores[greedy].sum(), 1e-9))
+                greedy_use.append(min(costs[greedy].sum() / ctx.time_budget_min, 9.99))
+                knapsack_use.append(costs[packed].sum() / ctx.time_budget_min)
+
+            self.stdout.write(
+                f"{size:>6} {statistics.median(greedy_ms):>10.2f} {statistics.median(knapsack_ms):>12.2f} "
+                f"{statistics.mean(ratios):>9.3f} {statistics.mean(greedy_use):>7.0%} / {statistics.mean(knapsack_use):>4.0%}"
+            )
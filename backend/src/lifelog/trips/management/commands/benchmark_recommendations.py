@@ -0,0 +1,256 @@
+﻿from __future__ import annotations
+
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from lifelog.places.hours import parse_hours
+from lifelog.places.models import Place, PlaceTag, Tag
+from lifelog.trips.index import rebuild_place_index
+from lifelog.trips.services import NoPlacesAvailableError, _prepare_context, _select_courses, create_recommendation
+
+CHUNK_SIZE = 5000
+CATEGORIES = {"cafe": 0.35, "food": 0.2, "brunch": 0.1, "bar": 0.1, "culture": 0.1, "park": 0.07, "library": 0.04, "market": 0.04}
+DISTRICTS = {
+    "수원 팔달구": (37.2800, 127.0170),
+    "수원 장안구": (37.3030, 127.0100),
+    "수원 권선구": (37.2580, 126.9720),
+    "수원 영통구": (37.2590, 127.0460),
+    "성남 분당구": (37.3830, 127.1190),
+    "용인 수지구": (37.3220, 127.0980),
+}
+MOODS = ["calm", "sunny", "focus", "vibrant", "cozy", "romantic"]
+COST_BANDS = ["", "무료", "5000~9000", "8000-12000", "15000", "25000", "cheap", "moderate", "premium"]
+STAYS = [20, 30, 45, 60, 90, 120]
+HOURS = [
+    {},
+    {"daily": "10:00-22:00"},
+    {"mon": "closed", "daily": "11:00-21:00"},
+    {"daily": "09:00-18:00", "sat": "10:00-17:00", "sun": "closed"},
+    {"daily": "18:00-02:00"},
+    {"daily": "24h"},
+]
+TAGS = 40
+
+
+def _mixes(start: datetime) -> dict[str, dict[str, Any]]:
+    """Representative request shapes, from an empty form to every filter at once."""
+
+    lat, lng = DISTRICTS["수원 팔달구"]
+    return {
+        "default": {},
+        "mood_budget": {"mood": ["calm", "sunny"], "budget_max": 15000, "time_budget_min": 120},
+        "category_tags": {"categories": ["cafe", "brunch"], "tags": ["tag-0", "tag-1"], "limit": 4},
+        "district": {"district": "수원 영통구", "time_budget_min": 180, "limit": 5},
+        "origin": {"origin_lat": lat, "origin_lng": lng, "max_travel_min": 15, "mode": "walk"},
+        "start_at": {"start_at": start.isoformat(), "mood": ["calm"], "time_budget_min": 150},
+        "alternatives": {"alternatives": 3, "time_budget_min": 240, "limit": 4},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "합성 장소 데이터(1k~1M)로 추천 엔진의 지연 시간(p50/p95/p99), 쿼리 수, 최대 메모리를 측정합니다. "
+        "기본적으로 임시 테스트 DB(SQLite/Postgres)를 만들어 사용하고 끝나면 삭제합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="장소 수 목록(쉼표 구분, 오름차순으로 누적 생성)")
+        parser.add_argument("--runs", type=int, default=30, help="조건 조합마다 반복할 횟수")
+        parser.add_argument("--mixes", default="", help="측정할 조건 조합 이름(쉼표 구분, 기본 전체)")
+        parser.add_argument("--paths", default="index", help="index, db 중 측정할 경로(쉼표 구분)")
+        parser.add_argument("--db-path-max-size", type=int, default=10000, help="db 경로를 측정할 최대 장소 수")
+        parser.add_argument("--output", default="", help="결과 JSON 파일 경로")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument(
+            "--use-current-db",
+            action="store_true",
+            help="임시 DB 대신 현재 DB에서 실행하고 마지막에 롤백합니다",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(value) for value in options["sizes"].split(",") if value.strip())
+        paths = [value.strip() for value in options["paths"].split(",") if value.strip()]
+        if not sizes or set(paths) - {"index", "db"}:
+            raise CommandError("--sizes 와 --paths(index, db)를 확인해 주세요.")
+
+        if options["use_current_db"]:
+            with transaction.atomic():
+                report = self._run(sizes, paths, options)
+                transaction.set_rollback(True)
+            # Drop the synthetic rows from this process's index as well.
+            rebuild_place_index()
+        else:
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                report = self._run(sizes, paths, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(report, handle, ensure_ascii=False, indent=2)
+            self.stdout.write(f"결과를 {options['output']}에 저장했습니다.")
+
+    def _run(self, sizes: list[int], paths: list[str], options: dict[str, Any]) -> dict[str, Any]:
+        rng = np.random.default_rng(options["seed"])
+        start = (timezone.localtime() + timedelta(days=(5 - timezone.localtime().weekday()) % 7 or 7)).replace(
+            hour=14, minute=0, second=0, microsecond=0
+        )
+        mixes = _mixes(start)
+        if options["mixes"]:
+            wanted = [value.strip() for value in options["mixes"].split(",") if value.strip()]
+            unknown = set(wanted) - set(mixes)
+            if unknown:
+                raise CommandError(f"알 수 없는 조건 조합: {', '.join(sorted(unknown))}")
+            mixes = {name: mixes[name] for name in wanted}
+
+        tags = [Tag(name=f"tag-{position}", type=Tag.Type.MOOD) for position in range(TAGS)]
+        Tag.objects.bulk_create(tags)
+        # Zipf-like tag popularity: a few tags are on most places, the long tail on few.
+        tag_weights = 1 / np.arange(1, TAGS + 1)
+        tag_weights /= tag_weights.sum()
+
+        report: dict[str, Any] = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "vendor": connection.vendor,
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "seed": options["seed"],
+                "runs": options["runs"],
+            },
+            "index": [],
+            "results": [],
+        }
+        self.stdout.write(
+            f"{'rows':>8} {'path':>5} {'mix':>14} {'target':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'peak MiB':>9}"
+        )
+
+        created = 0
+        for size in sizes:
+            created += self._generate(rng, created, size - created, tags, tag_weights)
+            report["index"].append(self._measure_index(size))
+            for path in paths:
+                if path == "db" and size > options["db_path_max_size"]:
+                    continue
+                engine = {**getattr(settings, "RECOMMENDATION_ENGINE", {}), "place_index_enabled": path == "index"}
+                with override_settings(RECOMMENDATION_ENGINE=engine):
+                    for name, constraints in mixes.items():
+                        for target in ("select", "create"):
+                            row = {"rows": size, "path": path, "mix": name, "target": target}
+                            row.update(self._measure(target, constraints, options["runs"]))
+                            report["results"].append(row)
+                            self._print(row)
+        return report
+
+    def _generate(self, rng: np.random.Generator, offset: int, count: int, tags: list[Tag], tag_weights: np.ndarray) -> int:
+        """Insert ``count`` synthetic places (and their tags) in chunks, bypassing signals."""
+
+        hours = [parse_hours(document) for document in HOURS]
+        districts = list(DISTRICTS)
+        categories = list(CATEGORIES)
+        for chunk_start in range(0, count, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, count - chunk_start)
+            district_picks = rng.integers(0, len(districts), size)
+            category_picks = rng.choice(len(categories), size, p=list(CATEGORIES.values()))
+            offsets = rng.normal(0, 0.012, (size, 2))
+            ratings = np.clip(rng.normal(4.1, 0.5, size), 0, 5).round(2)
+            places = []
+            for position in range(size):
+                number = offset + chunk_start + position
+                district = districts[district_picks[position]]
+                lat, lng = DISTRICTS[district]
+                mood_keys = rng.choice(MOODS, rng.integers(0, 4), replace=False)
+                hours_choice = int(rng.integers(0, len(HOURS)))
+                place = Place(
+                    name=f"bench-{number:07d}",
+                    slug=f"bench-{number:07d}",
+                    category=categories[category_picks[position]],
+                    district=district,
+                    location={"type": "Point", "coordinates": [lng + offsets[position, 1], lat + offsets[position, 0]]},
+                    cost_band=COST_BANDS[int(rng.integers(0, len(COST_BANDS)))],
+                    stay_min=STAYS[int(rng.integers(0, len(STAYS)))],
+                    rating=float(ratings[position]),
+                    mood_scores={str(key): round(float(rng.random()), 2) for key in mood_keys},
+                    hours=HOURS[hours_choice],
+                    hours_bitmap=hours[hours_choice][0],
+                    hours_overrides=hours[hours_choice][1],
+                    congestion_profile=rng.integers(0, 256, 168, dtype=np.uint8).tobytes() if rng.random() < 0.3 else None,
+                )
+                place.sync_budget_fields()
+                place.sync_geo_fields()
+                places.append(place)
+            Place.objects.bulk_create(places)
+            links = [
+                PlaceTag(place=place, tag=tags[tag])
+                for place in places
+                for tag in rng.choice(TAGS, rng.integers(0, 5), replace=False, p=tag_weights)
+            ]
+            PlaceTag.objects.bulk_create(links)
+        return count
+
+    def _measure_index(self, size: int) -> dict[str, Any]:
+        started = time.perf_counter()
+        index = rebuild_place_index()
+        elapsed = (time.perf_counter() - started) * 1000
+        columns = [value for value in vars(index).values() if isinstance(value, np.ndarray)]
+        return {
+            "rows": size,
+            "rebuild_ms": round(elapsed, 1),
+            "array_mib": round(sum(column.nbytes for column in columns) / 2**20, 2),
+        }
+
+    def _call(self, target: str, constraints: dict[str, Any]) -> None:
+        try:
+            if target == "select":
+                _select_courses(_prepare_context(constraints))
+            else:
+                with transaction.atomic():
+                    create_recommendation(None, constraints)
+                    transaction.set_rollback(True)
+        except NoPlacesAvailableError:
+            pass
+
+    def _measure(self, target: str, constraints: dict[str, Any], runs: int) -> dict[str, Any]:
+        self._call(target, constraints)  # warm-up: index refresh, travel matrices, caches
+
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            for _run in range(runs):
+                started = time.perf_counter()
+                self._call(target, constraints)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        try:
+            self._call(target, constraints)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "queries": round(len(queries) / max(runs, 1), 1),
+            "peak_mib": round(peak / 2**20, 2),
+        }
+
+    def _print(self, row: dict[str, Any]) -> None:
+        self.stdout.write(
+            f"{row['rows']:>8} {row['path']:>5} {row['mix']:>14} {row['target']:>7} {row['p50_ms']:>8.2f} "
+            f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['queries']:>7} {row['peak_mib']:>9.2f}"
+        )
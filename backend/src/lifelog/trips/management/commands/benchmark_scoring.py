@@ -0,0 +1,144 @@
+﻿from __future__ import annotations
+
+import json
+import os
+import platform
+import statistics
+import time
+import uuid
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from lifelog.trips.index import PlaceIndex
+from lifelog.trips.packing import DEFAULT_TOP_K
+from lifelog.trips.parallel import score_top_rows
+from lifelog.trips.scoring import rank, score_rows
+from lifelog.trips.services import RecommendationContext
+
+CHUNK_SIZE = 50000
+CATEGORIES = ["cafe", "food", "brunch", "bar", "culture", "park", "library", "market"]
+DISTRICTS = ["수원 팔달구", "수원 장안구", "수원 권선구", "수원 영통구", "성남 분당구", "용인 수지구"]
+MOODS = ["calm", "sunny", "focus", "vibrant", "cozy", "romantic"]
+STAYS = [20, 30, 45, 60, 90, 120]
+
+
+class Command(BaseCommand):
+    help = (
+        "합성 장소 인덱스(DB 없이 메모리에만 생성)로 단일 스레드 점수 계산과 샤드 병렬 점수 계산(top-K 병합)의 "
+        "지연 시간을 비교해 손익분기 후보 수와 코어 수별 속도 향상을 출력합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,50000,100000,200000,500000,1000000", help="후보 수 목록(쉼표 구분)")
+        parser.add_argument("--workers", default="2,4,8", help="비교할 스레드 수 목록(쉼표 구분)")
+        parser.add_argument("--runs", type=int, default=10, help="크기·스레드 수마다 반복할 횟수")
+        parser.add_argument("--k", type=int, default=0, help="남길 상위 후보 수(기본 packing_top_k + 3)")
+        parser.add_argument("--output", default="", help="결과 JSON 파일 경로")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(value) for value in options["sizes"].split(",") if value.strip())
+        workers = sorted(int(value) for value in options["workers"].split(",") if value.strip())
+        if not sizes or not workers or min(workers) < 2:
+            raise CommandError("--sizes 와 --workers(2 이상)를 확인해 주세요.")
+        engine = getattr(settings, "RECOMMENDATION_ENGINE", {})
+        k = options["k"] or engine.get("packing_top_k", DEFAULT_TOP_K) + 3
+        rng = np.random.default_rng(options["seed"])
+        ctx = RecommendationContext(
+            mood=["calm", "sunny"],
+            budget_max=15000,
+            time_budget_min=180,
+            district="수원 영통구",
+            preference={"mood:calm": 0.6, "mood:cozy": 0.8},
+        )
+
+        report: dict[str, Any] = {
+            "meta": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "cpus": os.cpu_count(),
+                "seed": options["seed"],
+                "runs": options["runs"],
+                "k": k,
+            },
+            "results": [],
+        }
+        self.stdout.write(f"{'rows':>8} {'workers':>7} {'p50 ms':>8} {'serial ms':>9} {'speedup':>7} {'same':>5}")
+
+        index = PlaceIndex()
+        for size in sizes:
+            self._generate(index, rng, size - index.size)
+            rows = np.arange(index.size)
+            serial_ms, expected = self._time(options["runs"], lambda: self._serial(index, rows, ctx, k))
+            for count in workers:
+                with override_settings(RECOMMENDATION_ENGINE={**engine, "scoring_workers": count}):
+                    parallel_ms, result = self._time(options["runs"], lambda: score_top_rows(index, rows, ctx, k)[0])
+                row = {
+                    "rows": size,
+                    "workers": count,
+                    "p50_ms": round(parallel_ms, 2),
+                    "serial_ms": round(serial_ms, 2),
+                    "speedup": round(serial_ms / max(parallel_ms, 1e-9), 2),
+                    "same": bool(np.array_equal(result, expected)),
+                }
+                report["results"].append(row)
+                self.stdout.write(
+                    f"{size:>8} {count:>7} {row['p50_ms']:>8.2f} {row['serial_ms']:>9.2f} {row['speedup']:>7.2f} {str(row['same']):>5}"
+                )
+
+        faster = [row["rows"] for row in report["results"] if row["speedup"] > 1]
+        report["crossover_rows"] = min(faster) if faster else None
+        self.stdout.write(f"병렬 계산이 더 빨라지는 최소 후보 수: {report['crossover_rows'] or '없음'}")
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(report, handle, ensure_ascii=False, indent=2)
+            self.stdout.write(f"결과를 {options['output']}에 저장했습니다.")
+
+    def _serial(self, index: PlaceIndex, rows: np.ndarray, ctx: RecommendationContext, k: int) -> np.ndarray:
+        scores = score_rows(index, rows, ctx)
+        return rows[rank(scores, index.name_rank[rows])][:k]
+
+    def _time(self, runs: int, call) -> tuple[float, Any]:
+        result = call()  # warm-up: pool threads, lazily built columns
+        latencies = []
+        for _run in range(runs):
+            started = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return statistics.median(latencies), result
+
+    def _generate(self, index: PlaceIndex, rng: np.random.Generator, count: int) -> None:
+        """Append ``count`` synthetic rows through the index's own loader, skipping the database."""
+
+        for chunk_start in range(0, count, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, count - chunk_start)
+            ratings = np.clip(rng.normal(4.1, 0.5, size), 0, 5).round(2)
+            costs = rng.choice([0, 5000, 8000, 12000, 25000], size)
+            records = []
+            for position in range(size):
+                mood_keys = rng.choice(MOODS, rng.integers(0, 4), replace=False)
+                records.append(
+                    (
+                        uuid.uuid4(),
+                        f"bench-{index.size + chunk_start + position:07d}",
+                        CATEGORIES[int(rng.integers(0, len(CATEGORIES)))],
+                        DISTRICTS[int(rng.integers(0, len(DISTRICTS)))],
+                        int(costs[position]) or None,
+                        int(costs[position] * 1.5) or None,
+                        None,
+                        STAYS[int(rng.integers(0, len(STAYS)))],
+                        float(ratings[position]),
+                        37.26 + float(rng.normal(0, 0.02)),
+                        127.02 + float(rng.normal(0, 0.02)),
+                        "",
+                        {str(key): round(float(rng.random()), 2) for key in mood_keys},
+                        None,
+                        None,
+                        rng.integers(0, 256, 168, dtype=np.uint8).tobytes() if rng.random() < 0.3 else None,
+                    )
+                )
+            index._append(records, {})
@@ -0,0 +1,188 @@
+﻿from __future__ import annotations
+
+import json
+import platform
+import random
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from lifelog.trips.models import Trip
+from lifelog.trips.services import NoPlacesAvailableError, _json_safe, _prepare_user_context, _select_courses, create_recommendation
+from lifelog.trips.shadow import compare_courses
+
+TARGETS = ("select", "create")
+
+
+def _recorded_trips(days: int):
+    """Trips made by the recommendation path: no template copies, no alternative siblings."""
+
+    return (
+        Trip.objects.filter(created_at__gte=timezone.now() - timedelta(days=days), summary__has_key="place_ids")
+        .exclude(inputs__has_key="template_id")
+        .filter(Q(summary__alternative_rank__isnull=True) | Q(summary__alternative_rank=0))
+    )
+
+
+def export_cases(limit: int, days: int, seed: int) -> list[dict[str, Any]]:
+    """A reproducible random sample of recorded requests and the places they got."""
+
+    ids = list(_recorded_trips(days).order_by("created_at", "id").values_list("id", flat=True))
+    picked = random.Random(seed).sample(ids, min(limit, len(ids)))
+    trips = Trip.objects.in_bulk(picked)
+    return [
+        {
+            "trip_id": str(trip.id),
+            "owner_id": str(trip.owner_id) if trip.owner_id else None,
+            "created_at": trip.created_at.isoformat(),
+            "source": trip.summary.get("source", "recommendation"),
+            "inputs": trip.inputs,
+            "place_ids": trip.summary["place_ids"],
+        }
+        for trip in (trips[pk] for pk in picked)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "실제 추천 기록(Trip.inputs)을 표본 추출해 현재 추천 엔진으로 다시 실행하고 "
+        "지연 시간(p50/p95/p99), 쿼리 수, 기록된 결과와의 차이를 측정합니다. 모든 쓰기는 롤백됩니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=500, help="표본으로 뽑을 추천 기록 수")
+        parser.add_argument("--days", type=int, default=30, help="최근 N일 기록에서 표본 추출")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--runs", type=int, default=3, help="기록마다 반복할 횟수")
+        parser.add_argument("--export", default="", help="표본을 JSONL로 저장만 하고 종료")
+        parser.add_argument("--input", default="", help="--export 로 저장한 JSONL 표본을 재생")
+        parser.add_argument("--output", default="", help="결과 JSON 파일 경로")
+        parser.add_argument("--details", action="store_true", help="결과 JSON에 기록별 비교를 포함")
+
+    def handle(self, *args, **options):
+        if options["input"]:
+            path = Path(options["input"])
+            if not path.exists():
+                raise CommandError(f"표본 파일이 없습니다: {path}")
+            cases = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+        else:
+            cases = export_cases(options["limit"], options["days"], options["seed"])
+
+        if options["export"]:
+            with open(options["export"], "w", encoding="utf-8") as handle:
+                for case in cases:
+                    handle.write(json.dumps(case, ensure_ascii=False) + "\n")
+            self.stdout.write(f"추천 기록 {len(cases)}건을 {options['export']}에 저장했습니다.")
+            return
+        if not cases:
+            raise CommandError("재생할 추천 기록이 없습니다. --days 또는 --input 을 확인해 주세요.")
+
+        report = self._replay(cases, options)
+        self._print(report)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(report, handle, ensure_ascii=False, indent=2)
+            self.stdout.write(f"결과를 {options['output']}에 저장했습니다.")
+
+    def _call(self, target: str, case: dict[str, Any]) -> list[str] | None:
+        """Place ids of the first course, or ``None`` when nothing could be recommended."""
+
+        try:
+            with transaction.atomic():
+                if target == "select":
+                    constraints = _json_safe(case["inputs"])
+                    courses = _select_courses(_prepare_user_context(case["owner_id"], constraints))
+                    place_ids = [str(place.id) for place in courses[0]]
+                else:
+                    place_ids = create_recommendation(case["owner_id"], case["inputs"]).summary["place_ids"]
+                transaction.set_rollback(True)
+        except NoPlacesAvailableError:
+            return None
+        return place_ids
+
+    def _replay(self, cases: list[dict[str, Any]], options: dict[str, Any]) -> dict[str, Any]:
+        # Recorded places are in their owners' seen filters now; replay as if they were not.
+        engine = {**getattr(settings, "RECOMMENDATION_ENGINE", {}), "seen_filter_enabled": False}
+        with override_settings(RECOMMENDATION_ENGINE=engine):
+            return self._replay_cases(cases, options)
+
+    def _replay_cases(self, cases: list[dict[str, Any]], options: dict[str, Any]) -> dict[str, Any]:
+        runs = max(options["runs"], 1)
+        for target in TARGETS:
+            self._call(target, cases[0])  # warm-up: index refresh, travel matrices, caches
+
+        latencies: dict[str, list[float]] = {target: [] for target in TARGETS}
+        queries: dict[str, int] = dict.fromkeys(TARGETS, 0)
+        failures: dict[str, int] = dict.fromkeys(TARGETS, 0)
+        details = []
+        for case in cases:
+            replayed: list[str] | None = None
+            for target in TARGETS:
+                with CaptureQueriesContext(connection) as captured:
+                    for _run in range(runs):
+                        started = time.perf_counter()
+                        result = self._call(target, case)
+                        latencies[target].append((time.perf_counter() - started) * 1000)
+                queries[target] += len(captured)
+                if result is None:
+                    failures[target] += 1
+                elif target == "create":
+                    replayed = result
+            detail = {"trip_id": case["trip_id"], "source": case.get("source"), "place_ids": replayed}
+            detail.update(compare_courses(case["place_ids"], replayed) if replayed is not None else {"failed": True})
+            details.append(detail)
+
+        compared = [detail for detail in details if not detail.get("failed")]
+        report: dict[str, Any] = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "vendor": connection.vendor,
+                "python": platform.python_version(),
+                "cases": len(cases),
+                "runs": runs,
+                "seed": options["seed"],
+                "input": options["input"] or None,
+            },
+            "latency": {},
+            "diff": {
+                "compared": len(compared),
+                "identical": sum(detail["identical"] for detail in compared),
+                "same_places": sum(detail["same_places"] for detail in compared),
+                "same_first": sum(detail["same_first"] for detail in compared),
+                "mean_jaccard": round(float(np.mean([detail["jaccard"] for detail in compared])), 4) if compared else None,
+            },
+        }
+        for target in TARGETS:
+            p50, p95, p99 = np.percentile(latencies[target], [50, 95, 99])
+            report["latency"][target] = {
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "queries": round(queries[target] / (len(cases) * runs), 1),
+                "no_places": failures[target],
+            }
+        if options["details"]:
+            report["cases"] = details
+        return report
+
+    def _print(self, report: dict[str, Any]) -> None:
+        self.stdout.write(f"{'target':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'no places':>9}")
+        for target, row in report["latency"].items():
+            self.stdout.write(
+                f"{target:>7} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+                f"{row['queries']:>7} {row['no_places']:>9}"
+            )
+        diff = report["diff"]
+        self.stdout.write(
+            f"기록 {report['meta']['cases']}건 중 {diff['compared']}건 비교: 동일 {diff['identical']}, "
+            f"같은 장소 {diff['same_places']}, 첫 장소 동일 {diff['same_first']}, 평균 Jaccard {diff['mean_jaccard']}"
+        )
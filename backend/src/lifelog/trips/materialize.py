@@ -0,0 +1,96 @@
+﻿from __future__ import annotations
+
+import logging
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
+
+from django.db import transaction
+
+from lifelog.core.db import count_queries
+from lifelog.places.models import PlaceTag
+
+from .models import Trip, TripNode, TripTemplate, TripTemplateNode
+from .seen import remember_places
+
+logger = logging.getLogger(__name__)
+
+_PARENT_FIELD = {Trip: "trip", TripTemplate: "template"}
+
+
+@dataclass
+class Materialized:
+    parent: Trip | TripTemplate
+    nodes: list[TripNode] | list[TripTemplateNode]
+    queries: int
+
+
+def place_tag_names(place_ids: Iterable) -> dict[str, list[str]]:
+    """Tag names per place id (as ``str``), fetched in a single query."""
+
+    names: dict[str, list[str]] = {}
+    rows = (
+        PlaceTag.objects.filter(place_id__in=list(place_ids))
+        .order_by("tag__name")
+        .values_list("place_id", "tag__name")
+    )
+    for place_id, name in rows:
+        names.setdefault(str(place_id), []).append(name)
+    return names
+
+
+def _remember_on_commit(batch: Sequence[tuple[Trip, Sequence[TripNode]]]) -> None:
+    """Add the places of committed trips to their owners' seen-places filters."""
+
+    by_owner: dict[Any, list[Any]] = {}
+    for trip, nodes in batch:
+        if trip.owner_id:
+            by_owner.setdefault(trip.owner_id, []).extend(node.place_id for node in nodes)
+    for owner_id, place_ids in by_owner.items():
+        transaction.on_commit(partial(remember_places, owner_id, place_ids))
+
+
+@transaction.atomic(savepoint=False)
+def materialize(
+    parent: Trip | TripTemplate,
+    nodes: Sequence[TripNode] | Sequence[TripTemplateNode],
+    replace: bool = False,
+) -> Materialized:
+    """Save ``parent`` if it is new and insert all of its ``nodes`` with one ``bulk_create``.
+
+    With ``replace`` the existing nodes are deleted first (one more query). Node
+    signals are not sent, same as any ``bulk_create``.
+    """
+
+    field = _PARENT_FIELD[type(parent)]
+    with count_queries() as counter:
+        if parent._state.adding:
+            parent.save()
+        elif replace:
+            parent.nodes.all().delete()
+        for node in nodes:
+            setattr(node, field, parent)
+        created = type(nodes[0]).objects.bulk_create(nodes) if nodes else []
+    logger.debug("Materialized %s %s: %d nodes in %d queries", field, parent.pk, len(created), counter.count)
+    if isinstance(parent, Trip):
+        _remember_on_commit([(parent, nodes)])
+    return Materialized(parent=parent, nodes=list(created), queries=counter.count)
+
+
+@transaction.atomic(savepoint=False)
+def materialize_many(batch: Sequence[tuple[Trip, Sequence[TripNode]]]) -> list[Materialized]:
+    """Insert several new trips and all of their nodes with two ``bulk_create`` calls."""
+
+    with count_queries() as counter:
+        trips = Trip.objects.bulk_create([trip for trip, _nodes in batch])
+        nodes: list[TripNode] = []
+        for trip, trip_nodes in zip(trips, (trip_nodes for _trip, trip_nodes in batch)):
+            for node in trip_nodes:
+                node.trip = trip
+            nodes.extend(trip_nodes)
+        if nodes:
+            TripNode.objects.bulk_create(nodes)
+    logger.debug("Materialized %d trips: %d nodes in %d queries", len(trips), len(nodes), counter.count)
+    _remember_on_commit(batch)
+    return [Materialized(parent=trip, nodes=list(trip_nodes), queries=counter.count) for trip, trip_nodes in batch]
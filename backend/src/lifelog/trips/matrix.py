@@ -0,0 +1,258 @@
+﻿from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+import httpx
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from lifelog.places.models import Place
+
+from .index import haversine_m
+from .models import Trip
+from .travel import travel_minutes
+
+logger = logging.getLogger(__name__)
+
+# Minutes are stored as uint16 tenths of a minute; UNKNOWN marks pairs that still
+# need estimating (or that the estimator could not route).
+UNKNOWN = np.iinfo(np.uint16).max
+MAX_MINUTES = (UNKNOWN - 1) / 10
+DEFAULT_ESTIMATOR = "lifelog.trips.matrix.HaversineEstimator"
+# Sources and destinations per /table request; 50 + 50 stays within OSRM's default
+# max-table-size of 100 coordinates and keeps the URL short.
+DEFAULT_ROUTING_BLOCK = 50
+
+
+class TravelEstimator(Protocol):
+    def estimate(self, origins: np.ndarray, destinations: np.ndarray, mode: str) -> np.ndarray:
+        """``(len(origins), len(destinations))`` travel minutes; NaN where unknown."""
+
+
+class HaversineEstimator:
+    """Great-circle distance × detour factor at the mode's average speed."""
+
+    def estimate(self, origins: np.ndarray, destinations: np.ndarray, mode: str) -> np.ndarray:
+        minutes = np.empty((len(origins), len(destinations)), dtype=np.float64)
+        for row, (lat, lng) in enumerate(origins):
+            minutes[row] = travel_minutes(haversine_m(lat, lng, destinations[:, 0], destinations[:, 1]), mode)
+        return minutes
+
+
+class RoutingServiceEstimator:
+    """OSRM-compatible ``/table`` endpoint, e.g. a routing container on the worker host.
+
+    Large districts are requested in ``block`` × ``block`` tiles that are stitched into one matrix.
+    """
+
+    PROFILES = {
+        Trip.Mode.WALK: "foot",
+        Trip.Mode.BIKE: "bike",
+        Trip.Mode.TRANSIT: "car",
+        Trip.Mode.DRIVE: "car",
+    }
+
+    def __init__(self, base_url: str | None = None, timeout: float = 30, block: int | None = None):
+        self.base_url = (base_url or _engine_setting("routing_service_url", "")).rstrip("/")
+        self.timeout = timeout
+        self.block = max(int(block or _engine_setting("routing_table_block", DEFAULT_ROUTING_BLOCK)), 1)
+
+    def estimate(self, origins: np.ndarray, destinations: np.ndarray, mode: str) -> np.ndarray:
+        minutes = np.full((len(origins), len(destinations)), np.nan, dtype=np.float64)
+        profile = self.PROFILES.get(mode, "car")
+        with httpx.Client(timeout=self.timeout) as client:
+            for row in range(0, len(origins), self.block):
+                for column in range(0, len(destinations), self.block):
+                    sources = origins[row : row + self.block]
+                    targets = destinations[column : column + self.block]
+                    minutes[row : row + len(sources), column : column + len(targets)] = self._table(
+                        client, profile, sources, targets
+                    )
+        return minutes
+
+    def _table(self, client: httpx.Client, profile: str, origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+        points = np.vstack([origins, destinations])
+        coordinates = ";".join(f"{lng:.6f},{lat:.6f}" for lat, lng in points)
+        params = {
+            "sources": ";".join(str(i) for i in range(len(origins))),
+            "destinations": ";".join(str(i) for i in range(len(origins), len(points))),
+            "annotations": "duration",
+        }
+        response = client.get(f"{self.base_url}/table/v1/{profile}/{coordinates}", params=params)
+        response.raise_for_status()
+        durations = response.json().get("durations") or []
+        seconds = np.array(
+            [[np.nan if value is None else value for value in row] for row in durations], dtype=np.float64
+        )
+        return seconds.reshape(len(origins), len(destinations)) / 60
+
+
+def _engine_setting(key: str, default):
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get(key, default)
+
+
+def get_estimator() -> TravelEstimator:
+    return import_string(_engine_setting("travel_matrix_estimator", DEFAULT_ESTIMATOR))()
+
+
+def district_key(district: str | None) -> str:
+    return hashlib.sha1((district or "").strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def _encode(minutes: np.ndarray) -> np.ndarray:
+    encoded = np.full(minutes.shape, UNKNOWN, dtype=np.uint16)
+    known = np.isfinite(minutes)
+    encoded[known] = np.rint(np.clip(minutes[known], 0, MAX_MINUTES) * 10).astype(np.uint16)
+    return encoded
+
+
+def _coordinates(places: Sequence[tuple[str, float | None, float | None]]) -> tuple[list[str], np.ndarray]:
+    located = [(str(pk), lat, lng) for pk, lat, lng in places if lat is not None and lng is not None]
+    ids = [pk for pk, _, _ in located]
+    points = np.array([(lat, lng) for _, lat, lng in located], dtype=np.float64).reshape(len(located), 2)
+    return ids, points
+
+
+@dataclass
+class TravelMatrix:
+    """Memory-mapped ``(district, mode)`` block; pages are only read when touched."""
+
+    ids: list[str]
+    row_of: dict[str, int]
+    minutes: np.ndarray
+    path: Path
+    manifest_mtime: int
+
+    def lookup(self, place_ids: Sequence[str]) -> np.ndarray:
+        rows = [self.row_of.get(str(pk), -1) for pk in place_ids]
+        result = np.full((len(rows), len(rows)), np.nan)
+        present = [position for position, row in enumerate(rows) if row >= 0]
+        if present:
+            index = [rows[position] for position in present]
+            block = self.minutes[np.ix_(index, index)]
+            values = np.where(block == UNKNOWN, np.nan, block / 10)
+            result[np.ix_(present, present)] = values
+        return result
+
+
+class TravelMatrixStore:
+    """On-disk travel-time matrices, one per (district, mode).
+
+    Each block is a ``.npy`` file of uint16 tenths of a minute plus a JSON manifest
+    with the place id order. Rebuilds write a new ``.npy`` and swap the manifest, so
+    readers never see a half-written block; moved places are patched in place.
+    """
+
+    def __init__(self, root: str | os.PathLike | None = None):
+        self._root = Path(root) if root else None
+        self._loaded: dict[Path, TravelMatrix] = {}
+
+    @property
+    def root(self) -> Path:
+        return self._root or Path(_engine_setting("travel_matrix_dir", "var/travel_matrix"))
+
+    def _manifest_path(self, district: str | None, mode: str) -> Path:
+        return self.root / f"{district_key(district)}.{mode}.json"
+
+    def has(self, district: str | None, mode: str) -> bool:
+        return self._manifest_path(district, mode).exists()
+
+    def get(self, district: str | None, mode: str) -> TravelMatrix | None:
+        manifest_path = self._manifest_path(district, mode)
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._loaded.pop(manifest_path, None)
+            return None
+        matrix = self._loaded.get(manifest_path)
+        if matrix is None or matrix.manifest_mtime != mtime:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            ids = manifest["ids"]
+            matrix = TravelMatrix(
+                ids=ids,
+                row_of={pk: row for row, pk in enumerate(ids)},
+                minutes=np.load(self.root / manifest["matrix"], mmap_mode="r"),
+                path=self.root / manifest["matrix"],
+                manifest_mtime=mtime,
+            )
+            self._loaded[manifest_path] = matrix
+        return matrix
+
+    def lookup(self, places: Sequence[Place], mode: str) -> np.ndarray:
+        """Pairwise minutes between ``places``; NaN for pairs not held by any block."""
+
+        result = np.full((len(places), len(places)), np.nan)
+        by_district: dict[str, list[int]] = {}
+        for position, place in enumerate(places):
+            by_district.setdefault((place.district or "").strip().lower(), []).append(position)
+        for district, positions in by_district.items():
+            matrix = self.get(district, mode)
+            if matrix is None:
+                continue
+            result[np.ix_(positions, positions)] = matrix.lookup([places[p].pk for p in positions])
+        return result
+
+    def build(self, district: str | None, mode: str, estimator: TravelEstimator | None = None) -> int:
+        estimator = estimator or get_estimator()
+        rows = Place.objects.filter(is_active=True, district__iexact=(district or "").strip()).values_list(
+            "id", "latitude", "longitude"
+        )
+        ids, points = _coordinates(list(rows.order_by("id")))
+        minutes = estimator.estimate(points, points, mode) if ids else np.empty((0, 0))
+        encoded = _encode(minutes)
+        np.fill_diagonal(encoded, 0)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        stem = f"{district_key(district)}.{mode}"
+        matrix_name = f"{stem}.{time.time_ns()}.npy"
+        np.save(self.root / matrix_name, encoded)
+        manifest_path = self._manifest_path(district, mode)
+        previous = None
+        if manifest_path.exists():
+            previous = json.loads(manifest_path.read_text(encoding="utf-8")).get("matrix")
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"district": district, "mode": mode, "ids": ids, "matrix": matrix_name}))
+        os.replace(tmp_path, manifest_path)
+        if previous and previous != matrix_name:
+            (self.root / previous).unlink(missing_ok=True)
+        return len(ids)
+
+    def refresh_place(self, place: Place, mode: str, estimator: TravelEstimator | None = None) -> bool:
+        """Re-estimate only ``place``'s row and column; return False if a rebuild is needed."""
+
+        matrix = self.get(place.district, mode)
+        row = matrix.row_of.get(str(place.pk)) if matrix else None
+        if matrix is None or row is None:
+            return False
+
+        estimator = estimator or get_estimator()
+        writable = np.load(matrix.path, mmap_mode="r+")
+        if place.latitude is None or place.longitude is None or not place.is_active:
+            writable[row, :] = UNKNOWN
+            writable[:, row] = UNKNOWN
+        else:
+            others = Place.objects.filter(id__in=matrix.ids).values_list("id", "latitude", "longitude")
+            ids, points = _coordinates(list(others))
+            columns = [matrix.row_of[pk] for pk in ids]
+            origin = np.array([[place.latitude, place.longitude]], dtype=np.float64)
+            writable[row, columns] = _encode(estimator.estimate(origin, points, mode)[0])
+            writable[columns, row] = _encode(estimator.estimate(points, origin, mode)[:, 0])
+        writable[row, row] = 0
+        writable.flush()
+        return True
+
+
+_store = TravelMatrixStore()
+
+
+def get_travel_matrix_store() -> TravelMatrixStore:
+    return _store
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.15 on 2026-10-18 11:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_profile_token_balance_userstamp_userbadge'),
+        ('trips', '0005_triprecommendationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationFeed',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendation_feed', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('context_hash', models.CharField(max_length=64)),
+                ('constraints', models.JSONField(blank=True, default=dict)),
+                ('courses', models.JSONField(blank=True, default=list)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0008_user_preference_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowRecommendation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('engine', models.CharField(max_length=40)),
+                ('inputs', models.JSONField(blank=True, default=dict)),
+                ('production_place_ids', models.JSONField(blank=True, default=list)),
+                ('shadow_place_ids', models.JSONField(blank=True, default=list)),
+                ('production_ms', models.FloatField(help_text='운영 엔진의 후보 선정~장소 조회 시간')),
+                ('shadow_ms', models.FloatField(blank=True, null=True)),
+                ('identical', models.BooleanField(default=False)),
+                ('same_first', models.BooleanField(default=False)),
+                ('jaccard', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('trip', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shadow_runs', to='trips.trip')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['engine', 'created_at'], name='trips_shado_engine_98882b_idx')],
+            },
+        ),
+    ]
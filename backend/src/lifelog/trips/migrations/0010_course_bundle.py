@@ -0,0 +1,39 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:47
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trips', '0009_shadow_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseBundle',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('district', models.CharField(help_text='소문자로 정규화한 Place.district', max_length=120)),
+                ('mode', models.CharField(choices=[('walk', '도보'), ('transit', '대중교통'), ('bike', '자전거'), ('drive', '자가용')], max_length=16)),
+                ('stops', models.PositiveSmallIntegerField()),
+                ('place_ids', models.JSONField(blank=True, default=list, help_text='동선 순서')),
+                ('legs_min', models.JSONField(blank=True, default=list)),
+                ('score', models.FloatField()),
+                ('stay_min', models.PositiveIntegerField()),
+                ('travel_min', models.FloatField()),
+                ('duration_min', models.PositiveIntegerField(help_text='체류 + 이동 시간')),
+                ('cost_floor', models.PositiveIntegerField(blank=True, help_text='장소별 최소 비용 중 가장 큰 값', null=True)),
+                ('cost_ceiling', models.PositiveIntegerField(blank=True, help_text='장소별 최대 비용 중 가장 작은 값', null=True)),
+                ('mood', models.JSONField(blank=True, default=dict, help_text='장소 분위기 점수 평균')),
+                ('categories', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['district', 'mode', 'stops', 'duration_min'], name='trips_cours_distric_f8ddb2_idx')],
+            },
+        ),
+    ]
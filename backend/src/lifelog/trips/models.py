@@ -2,6 +2,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from django.utils.text import slugify
 import uuid
@@ -157,3 +158,149 @@ class TripTemplateGenerationJob(UUIDModel, TimeStampedModel):
 
 
 
+
+class TripRecommendationJob(UUIDModel, TimeStampedModel):
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    FINISHED = (Status.COMPLETED, Status.FAILED)
+
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="recommendation_jobs")
+    constraints = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    reuse = models.BooleanField(default=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    trip = models.ForeignKey(Trip, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    reused = models.BooleanField(default=False)
+    error_code = models.CharField(max_length=60, blank=True)
+    error_detail = models.TextField(blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["requested_by", "created_at"]),
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"Trip Recommendation Job {self.id}"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.FINISHED
+
+    def mark_running(self):
+        self.status = self.Status.RUNNING
+        self.error_code = ""
+        self.error_detail = ""
+        self.completed_at = None
+        self.save(update_fields=["status", "error_code", "error_detail", "completed_at", "updated_at"])
+
+    def mark_completed(self, trip: Trip, reused: bool = False):
+        self.status = self.Status.COMPLETED
+        self.trip = trip
+        self.reused = reused
+        self.completed_at = timezone.now()
+        self.save(update_fields=["status", "trip", "reused", "completed_at", "updated_at"])
+
+    def mark_failed(self, code: str, detail: str = ""):
+        self.status = self.Status.FAILED
+        self.error_code = code
+        self.error_detail = (detail or "")[:2000]
+        self.completed_at = timezone.now()
+        self.save(update_fields=["status", "error_code", "error_detail", "completed_at", "updated_at"])
+
+class RecommendationFeed(TimeStampedModel):
+    """Courses precomputed overnight for a user's default constraints; one row per user."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="recommendation_feed"
+    )
+    context_hash = models.CharField(max_length=64)
+    constraints = models.JSONField(default=dict, blank=True)
+    courses = models.JSONField(default=list, blank=True)
+    computed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"Recommendation feed {self.user_id}"
+
+
+class RankingWeights(TimeStampedModel):
+    """Learned multipliers of the scoring terms; the row without a user holds the global vector."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="ranking_weights"
+    )
+    weights = models.JSONField(default=list, blank=True, help_text="scoring.FEATURES 순서의 가중치 + 마지막 bias")
+    samples = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"Ranking weights {self.user_id or 'global'}"
+
+
+class RankingWatermark(models.Model):
+    """Single row: feedback up to ``(processed_until, last_feedback_id)`` is already learned."""
+
+    processed_until = models.DateTimeField()
+    last_feedback_id = models.UUIDField()
+
+
+class UserPreferenceVector(TimeStampedModel):
+    """Sparse taste vector of a user over ``tag:<name>`` / ``mood:<key>`` dimensions (unit length)."""
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="preference_vector")
+    vector = models.JSONField(default=dict, blank=True, help_text="차원 키 → 가중치, 키 순서대로 정렬")
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"Preference vector {self.user_id}"
+
+
+class ShadowRecommendation(UUIDModel, TimeStampedModel):
+    """One request answered again by a candidate engine off the response path, for comparison."""
+
+    trip = models.ForeignKey(Trip, on_delete=models.SET_NULL, null=True, blank=True, related_name="shadow_runs")
+    engine = models.CharField(max_length=40)
+    inputs = models.JSONField(default=dict, blank=True)
+    production_place_ids = models.JSONField(default=list, blank=True)
+    shadow_place_ids = models.JSONField(default=list, blank=True)
+    production_ms = models.FloatField(help_text="운영 엔진의 후보 선정~장소 조회 시간")
+    shadow_ms = models.FloatField(null=True, blank=True)
+    identical = models.BooleanField(default=False)
+    same_first = models.BooleanField(default=False)
+    jaccard = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["engine", "created_at"])]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"Shadow {self.engine} {self.trip_id}"
+
+
+class CourseBundle(UUIDModel, TimeStampedModel):
+    """A precomputed 2~4 stop course of one district and mode, with the constraints it fits."""
+
+    district = models.CharField(max_length=120, help_text="소문자로 정규화한 Place.district")
+    mode = models.CharField(max_length=16, choices=Trip.Mode.choices)
+    stops = models.PositiveSmallIntegerField()
+    place_ids = models.JSONField(default=list, blank=True, help_text="동선 순서")
+    legs_min = models.JSONField(default=list, blank=True)
+    score = models.FloatField()
+    stay_min = models.PositiveIntegerField()
+    travel_min = models.FloatField()
+    duration_min = models.PositiveIntegerField(help_text="체류 + 이동 시간")
+    cost_floor = models.PositiveIntegerField(null=True, blank=True, help_text="장소별 최소 비용 중 가장 큰 값")
+    cost_ceiling = models.PositiveIntegerField(null=True, blank=True, help_text="장소별 최대 비용 중 가장 작은 값")
+    mood = models.JSONField(default=dict, blank=True, help_text="장소 분위기 점수 평균")
+    categories = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ["-score"]
+        indexes = [models.Index(fields=["district", "mode", "stops", "duration_min"])]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"Bundle {self.district}/{self.mode} x{self.stops}"
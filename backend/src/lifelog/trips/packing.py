@@ -0,0 +1,113 @@
+﻿from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .index import haversine_m
+from .travel import travel_minutes
+
+# Stays are packed in whole slots; a stop always costs at least MIN_STAY_MIN,
+# matching the greedy filler.
+SLOT_MIN = 5
+MIN_STAY_MIN = 15
+DEFAULT_TOP_K = 200
+DEFAULT_BUDGET_MS = 15
+
+
+@dataclass
+class Candidates:
+    """Ranked candidates (best first) as parallel columns."""
+
+    items: list[Any]
+    scores: np.ndarray
+    stays: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def take(self, positions: np.ndarray) -> Candidates:
+        return Candidates(
+            items=[self.items[p] for p in positions],
+            scores=self.scores[positions],
+            stays=self.stays[positions],
+            latitude=self.latitude[positions],
+            longitude=self.longitude[positions],
+        )
+
+
+def leg_estimates(latitude: np.ndarray, longitude: np.ndarray, mode: str) -> np.ndarray:
+    """Expected travel minutes into each stop: distance to the candidates' centroid.
+
+    Candidates without coordinates get no allowance.
+    """
+
+    legs = np.zeros(len(latitude), dtype=np.float64)
+    located = ~(np.isnan(latitude) | np.isnan(longitude))
+    if located.sum() < 2:
+        return legs
+    lat, lng = float(latitude[located].mean()), float(longitude[located].mean())
+    legs[located] = travel_minutes(haversine_m(lat, lng, latitude[located], longitude[located]), mode)
+    return legs
+
+
+def knapsack(
+    scores: np.ndarray,
+    costs_min: np.ndarray,
+    budget_min: int,
+    limit: int,
+    deadline: float | None = None,
+) -> list[int] | None:
+    """Positions maximising total score with sum(cost) <= budget and at most ``limit`` picks.
+
+    Bounded 0/1 knapsack over ``(stops, slots)``; each item updates one row per stop
+    count as a vector op, so the cost is O(K * limit) NumPy calls. Returns ``None``
+    when ``deadline`` (a ``perf_counter`` value) passes or nothing fits.
+    """
+
+    weights = np.ceil(np.asarray(costs_min, dtype=np.float64) / SLOT_MIN).astype(np.int64)
+    count = len(scores)
+    stops = min(limit, count)
+    # No course can use more slots than its ``stops`` heaviest items; the table is sized
+    # by that, not by however large a budget the request asked for.
+    capacity = min(int(budget_min) // SLOT_MIN, int(np.sort(weights)[count - stops :].sum()))
+    if capacity <= 0 or stops <= 0:
+        return None
+
+    best = np.full((stops + 1, capacity + 1), -np.inf)
+    best[0, 0] = 0.0
+    took = np.zeros((count, stops + 1, capacity + 1), dtype=bool)
+
+    for item in range(count):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        weight = int(weights[item])
+        if weight > capacity:
+            continue
+        score = float(scores[item])
+        for used in range(stops, 0, -1):
+            candidate = best[used - 1, : capacity + 1 - weight] + score
+            current = best[used, weight:]
+            better = candidate > current
+            if better.any():
+                current[better] = candidate[better]
+                took[item, used, weight:][better] = True
+
+    flat = int(np.argmax(best))
+    used, slot = divmod(flat, capacity + 1)
+    if not np.isfinite(best[used, slot]) or used == 0:
+        return None
+
+    picked: list[int] = []
+    for item in range(count - 1, -1, -1):
+        if used == 0:
+            break
+        if took[item, used, slot]:
+            picked.append(item)
+            used -= 1
+            slot -= int(weights[item])
+    return sorted(picked)
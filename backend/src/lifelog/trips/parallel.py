@@ -0,0 +1,78 @@
+﻿from __future__ import annotations
+
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from django.conf import settings
+
+from .index import PlaceIndex
+from .scoring import rank, score_rows
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .services import RecommendationContext
+
+DEFAULT_WORKERS = 4
+DEFAULT_THRESHOLD = 100_000
+
+_pool: ThreadPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _engine_setting(key: str, default: Any) -> Any:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get(key, default)
+
+
+def scoring_workers() -> int:
+    return max(int(_engine_setting("scoring_workers", DEFAULT_WORKERS)), 1)
+
+
+def should_shard(size: int) -> bool:
+    """Whether ``size`` candidates are worth splitting across the scoring pool."""
+
+    return scoring_workers() > 1 and size >= _engine_setting("scoring_parallel_threshold", DEFAULT_THRESHOLD)
+
+
+def _executor(workers: int) -> ThreadPoolExecutor:
+    """Process-wide pool, recreated only when ``scoring_workers`` changes."""
+
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="trip-scoring")
+            _pool_workers = workers
+        return _pool
+
+
+def _shard_top(index: PlaceIndex, rows: np.ndarray, ctx: RecommendationContext, k: int) -> list[tuple[float, int, int]]:
+    scores = score_rows(index, rows, ctx)
+    tie_break = index.name_rank[rows]
+    order = rank(scores, tie_break)[:k]
+    return list(zip((-scores[order]).tolist(), tie_break[order].tolist(), rows[order].tolist()))
+
+
+def score_top_rows(index: PlaceIndex, rows: np.ndarray, ctx: RecommendationContext, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """The ``k`` best rows and their scores, scored in shards on the pool.
+
+    Each shard keeps its own top ``k`` in ranking order (score, then name) and the shards
+    are merged through a heap, so the result equals the head of a single-pass ranking.
+    """
+
+    workers = scoring_workers()
+    # Lazily computed shared state is filled here, not raced for by the shard threads.
+    index.name_rank
+    ctx.visit_buckets
+    shards = np.array_split(rows, workers)
+    tops = list(_executor(workers).map(lambda shard: _shard_top(index, shard, ctx, k), shards))
+    merged = list(islice(heapq.merge(*tops), k))
+    ctx.trace.count("scoring_shards", len(shards))
+    return (
+        np.array([row for _score, _name, row in merged], dtype=rows.dtype),
+        np.array([-score for score, _name, _row in merged], dtype=np.float64),
+    )
@@ -0,0 +1,165 @@
+﻿from __future__ import annotations
+
+import math
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+import numpy as np
+from django.core.cache import cache
+
+from lifelog.feedback.models import Feedback
+from lifelog.places.models import FavoritePlace, Place, PlaceTag
+
+from .index import PlaceIndex, mood_values, place_norm
+from .models import UserPreferenceVector
+
+# A user's taste as a sparse vector over "tag:<name>" and "mood:<key>" dimensions, the same
+# space the place index describes places in (tag = 1.0, mood = its score).
+VECTOR_CACHE_KEY = "trips:preference-vector:{user_id}"
+TAG_PREFIX = "tag:"
+MOOD_PREFIX = "mood:"
+MAX_DIMS = 32
+MAX_PRIORITY = 5
+FAVORITE_WEIGHT = 0.5
+FEEDBACK_WEIGHT = {Feedback.Rating.BAD: -0.5, Feedback.Rating.NEUTRAL: 0.0, Feedback.Rating.GOOD: 0.5}
+FEEDBACK_LIMIT = 100
+
+
+def _place_vector(tag_names: Iterable[str], mood_scores: dict[str, Any] | None) -> dict[str, float]:
+    tags = set(tag_names)
+    moods = mood_values(mood_scores)
+    norm = place_norm(len(tags), moods)
+    if not norm:
+        return {}
+    vector = {f"{TAG_PREFIX}{name}": 1.0 / norm for name in tags}
+    vector.update({f"{MOOD_PREFIX}{key}": score / norm for key, score in moods})
+    return vector
+
+
+def build_vector(user_id: Any) -> dict[str, float]:
+    """Unit-length preference vector of ``user_id`` from preferred tags, favorites and feedback.
+
+    Preferred tags add their priority; favorites and rated stops add (or, for bad ratings,
+    subtract) the normalized vector of the place. Only the strongest ``MAX_DIMS``
+    dimensions are kept so scoring stays a handful of column operations.
+    """
+
+    from lifelog.users.models import UserPreferredTag
+
+    weights: dict[str, float] = defaultdict(float)
+    for name, priority in UserPreferredTag.objects.filter(user_id=user_id).values_list("tag__name", "priority"):
+        weights[f"{TAG_PREFIX}{name}"] += float(min(max(priority, 1), MAX_PRIORITY))
+
+    rated: list[tuple[Any, float]] = [
+        (place_id, FAVORITE_WEIGHT)
+        for place_id in FavoritePlace.objects.filter(user_id=user_id).values_list("place_id", flat=True)
+    ]
+    feedback = (
+        Feedback.objects.filter(user_id=user_id, trip_node__isnull=False)
+        .order_by("-created_at")
+        .values_list("trip_node__place_id", "rating")[:FEEDBACK_LIMIT]
+    )
+    rated.extend((place_id, FEEDBACK_WEIGHT.get(rating, 0.0)) for place_id, rating in feedback if place_id)
+
+    place_ids = {place_id for place_id, weight in rated if weight}
+    if place_ids:
+        moods = dict(Place.objects.filter(id__in=place_ids).values_list("id", "mood_scores"))
+        tags: dict[Any, list[str]] = defaultdict(list)
+        for place_id, name in PlaceTag.objects.filter(place_id__in=place_ids).values_list("place_id", "tag__name"):
+            tags[place_id].append(name)
+        for place_id, weight in rated:
+            if not weight or place_id not in moods:
+                continue
+            for key, value in _place_vector(tags[place_id], moods[place_id]).items():
+                weights[key] += weight * value
+
+    strongest = sorted((item for item in weights.items() if item[1]), key=lambda item: (-abs(item[1]), item[0]))[:MAX_DIMS]
+    norm = math.sqrt(sum(value * value for _key, value in strongest))
+    if not norm:
+        return {}
+    return {key: value / norm for key, value in sorted(strongest)}
+
+
+def refresh_vector(user_id: Any) -> dict[str, float]:
+    """Rebuild and publish one user's vector; only that user's rows are read."""
+
+    vector = build_vector(user_id)
+    UserPreferenceVector.objects.update_or_create(user_id=user_id, defaults={"vector": vector})
+    cache.set(VECTOR_CACHE_KEY.format(user_id=user_id), vector, timeout=None)
+    return vector
+
+
+def get_preference_vector(user_id: Any) -> dict[str, float] | None:
+    """Cached vector of ``user_id``; a cold cache costs one query, no joins."""
+
+    if not user_id:
+        return None
+    key = VECTOR_CACHE_KEY.format(user_id=user_id)
+    vector = cache.get(key)
+    if vector is None:
+        vector = UserPreferenceVector.objects.filter(user_id=user_id).values_list("vector", flat=True).first() or {}
+        cache.set(key, vector, timeout=None)
+    return vector or None
+
+
+def similarity_rows(index: PlaceIndex, rows: np.ndarray, vector: dict[str, float] | None) -> np.ndarray:
+    """Cosine similarity between ``vector`` and each row of the place index.
+
+    The user's few dimensions are gathered from the tag bitset and mood matrix and
+    accumulated in key order, matching :func:`similarity_places` bit for bit.
+    """
+
+    dot = np.zeros(len(rows), dtype=np.float64)
+    if not vector or not len(rows):
+        return dot
+    for key, weight in vector.items():
+        if key.startswith(TAG_PREFIX):
+            bit = index.tag_bits.get(key[len(TAG_PREFIX) :])
+            if bit is None:
+                continue
+            mask = np.uint64(1 << (bit % 64))
+            dot += weight * ((index.tags[rows, bit // 64] & mask) != 0).astype(np.float64)
+        elif key.startswith(MOOD_PREFIX):
+            dim = index.mood_dims.get(key[len(MOOD_PREFIX) :])
+            if dim is None:
+                continue
+            dot += weight * index.mood[rows, dim]
+    norms = index.vector_norm[rows]
+    return np.divide(dot, norms, out=np.zeros_like(dot), where=norms > 0)
+
+
+def similarity_places(places: Sequence[Place], vector: dict[str, float] | None) -> np.ndarray:
+    """:func:`similarity_rows` for ``Place`` objects; reads ``place.tags`` (prefetch it)."""
+
+    similarity = np.zeros(len(places), dtype=np.float64)
+    if not vector:
+        return similarity
+    for position, place in enumerate(places):
+        tags = {tag.name for tag in place.tags.all()}
+        moods = mood_values(place.mood_scores)
+        norm = place_norm(len(tags), moods)
+        if not norm:
+            continue
+        mood = dict(moods)
+        dot = 0.0
+        for key, weight in vector.items():
+            if key.startswith(TAG_PREFIX):
+                if key[len(TAG_PREFIX) :] in tags:
+                    dot += weight * 1.0
+            elif key.startswith(MOOD_PREFIX) and key[len(MOOD_PREFIX) :] in mood:
+                dot += weight * mood[key[len(MOOD_PREFIX) :]]
+        similarity[position] = dot / norm
+    return similarity
+
+
+def top_similar(similarity: np.ndarray, rating: np.ndarray, tie_break: np.ndarray, count: int) -> np.ndarray:
+    """Positions of the ``count`` most similar candidates, in their original order.
+
+    Vectors are sparse, so most places tie at 0; ties go to the better-rated place, which
+    tops the retrieval up with the places the scoring would favour instead of by name.
+    """
+
+    if len(similarity) <= count:
+        return np.arange(len(similarity))
+    return np.sort(np.lexsort((tie_break, -rating, -similarity))[:count])
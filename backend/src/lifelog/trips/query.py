@@ -0,0 +1,309 @@
+﻿from __future__ import annotations
+
+import json
+import logging
+import re
+import textwrap
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+from django.conf import settings
+
+from lifelog.core.clients.openrouter import OpenRouterClient, OpenRouterConfigurationError, OpenRouterError
+
+from .models import Trip
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+MIN_TIME_BUDGET_MIN = 15
+MAX_TIME_BUDGET_MIN = 24 * 60
+
+# Keyword stems -> mood keys / categories used by ``Place.mood_scores`` and ``Place.category``.
+MOOD_WORDS = {
+    "조용": "calm",
+    "한적": "calm",
+    "차분": "calm",
+    "여유": "calm",
+    "quiet": "calm",
+    "calm": "calm",
+    "햇빛": "sunny",
+    "햇살": "sunny",
+    "채광": "sunny",
+    "sunny": "sunny",
+    "공부": "focus",
+    "작업": "focus",
+    "집중": "focus",
+    "study": "focus",
+    "활기": "vibrant",
+    "북적": "vibrant",
+    "신나": "vibrant",
+    "lively": "vibrant",
+}
+CATEGORY_WORDS = {
+    "카페": ["cafe"],
+    "커피": ["cafe"],
+    "디저트": ["cafe", "brunch"],
+    "브런치": ["brunch"],
+    "공부": ["cafe", "library"],
+    "도서관": ["library"],
+    "책": ["library"],
+    "전시": ["culture"],
+    "미술관": ["culture"],
+    "박물관": ["culture"],
+    "공원": ["park"],
+    "산책": ["park"],
+    "시장": ["market"],
+    "맛집": ["food"],
+    "식당": ["food"],
+    "밥": ["food"],
+    "술": ["bar"],
+    "술집": ["bar"],
+    "맥주": ["bar"],
+    "바": ["bar"],
+    "cafe": ["cafe"],
+    "library": ["library"],
+    "park": ["park"],
+}
+MODE_WORDS = {
+    "걸어": Trip.Mode.WALK,
+    "도보": Trip.Mode.WALK,
+    "대중교통": Trip.Mode.TRANSIT,
+    "지하철": Trip.Mode.TRANSIT,
+    "버스": Trip.Mode.TRANSIT,
+    "자전거": Trip.Mode.BIKE,
+    "따릉이": Trip.Mode.BIKE,
+    "차로": Trip.Mode.DRIVE,
+    "드라이브": Trip.Mode.DRIVE,
+    "자가용": Trip.Mode.DRIVE,
+}
+# Words that carry no constraint; they do not count against the parse.
+FILLER_WORDS = {"좋은", "자리", "곳", "데", "코스", "추천", "해줘", "하고", "싶어", "가고", "그리고", "정도", "쯤", "좀", "로"}
+# Particles and endings stripped before looking a word up, longest first.
+SUFFIXES = ("에서", "으로", "하고", "해서", "이랑", "랑", "로", "한", "은", "는", "이", "가", "을", "를", "에", "도", "와", "과")
+
+HOURS_RE = re.compile(r"(\d+(?:\.\d+)?)\s*시간(\s*반)?")
+MINUTES_RE = re.compile(r"(\d+)\s*분")
+HALF_DAY_RE = re.compile(r"반나절")
+MONEY_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(만|천)?\s*원\s*(대|이하|까지|안|이내|이상|넘게)?")
+MONEY_UNITS = {"만": 10_000, "천": 1_000, None: 1}
+TOKEN_RE = re.compile(r"[0-9a-z가-힣.]+")
+WORD_RE = re.compile(r"[0-9a-z가-힣]+")
+
+SYSTEM_PROMPT = textwrap.dedent(
+    """
+    You turn a Korean trip request into search constraints.
+    Respond with a single JSON object using only these keys (omit unknown ones):
+    {
+      "time_budget_min": integer,
+      "budget_min": integer (KRW),
+      "budget_max": integer (KRW),
+      "mood": list of "calm" | "sunny" | "focus" | "vibrant",
+      "categories": list of "cafe" | "brunch" | "library" | "culture" | "park" | "market" | "food" | "bar",
+      "mode": "walk" | "transit" | "bike" | "drive"
+    }
+    """
+)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key of a query: width/case folded, punctuation dropped, word order kept.
+
+    Queries that differ only in spacing, punctuation or case share one entry; order matters
+    ("A 말고 B" is not "B 말고 A").
+    """
+
+    folded = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(TOKEN_RE.findall(folded))
+
+
+def _money(amount: str, unit: str | None) -> int:
+    return int(float(amount) * MONEY_UNITS[unit])
+
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if len(word) > len(suffix) and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def parse_rules(text: str) -> tuple[dict[str, Any], bool]:
+    """Constraints found by the local rules and whether every word was understood."""
+
+    folded = unicodedata.normalize("NFKC", text).lower()
+    constraints: dict[str, Any] = {}
+    rest = folded
+
+    minutes = 0
+    for match in HOURS_RE.finditer(folded):
+        minutes += round(float(match.group(1)) * 60) + (30 if match.group(2) else 0)
+    for match in MINUTES_RE.finditer(folded):
+        minutes += int(match.group(1))
+    if HALF_DAY_RE.search(folded):
+        minutes += 4 * 60
+    if minutes:
+        constraints["time_budget_min"] = min(max(minutes, MIN_TIME_BUDGET_MIN), MAX_TIME_BUDGET_MIN)
+    rest = HALF_DAY_RE.sub(" ", MINUTES_RE.sub(" ", HOURS_RE.sub(" ", rest)))
+
+    for match in MONEY_RE.finditer(rest):
+        amount, unit, qualifier = match.groups()
+        value = _money(amount, unit)
+        if qualifier == "대":
+            constraints["budget_min"] = value
+            constraints["budget_max"] = value + MONEY_UNITS[unit] - 1 if unit else value
+        elif qualifier in {"이상", "넘게"}:
+            constraints["budget_min"] = value
+        else:
+            constraints["budget_max"] = value
+    rest = MONEY_RE.sub(" ", rest)
+
+    moods: list[str] = []
+    categories: list[str] = []
+    understood = True
+    for token in WORD_RE.findall(rest):
+        stem = _stem(token)
+        matched = token in FILLER_WORDS or stem in FILLER_WORDS
+        for word, mood in MOOD_WORDS.items():
+            if word in token:
+                matched = True
+                if mood not in moods:
+                    moods.append(mood)
+        for word, names in CATEGORY_WORDS.items():
+            # One-syllable words ("바", "책") must match whole, or "바로" would mean a bar.
+            if token == word or (len(word) > 1 and token.startswith(word)):
+                matched = True
+                categories.extend(name for name in names if name not in categories)
+        for word, mode in MODE_WORDS.items():
+            if word in token:
+                matched = True
+                constraints.setdefault("mode", mode.value)
+        understood = understood and matched
+    if moods:
+        constraints["mood"] = moods
+    if categories:
+        constraints["categories"] = categories
+    return constraints, understood
+
+
+def _clean_llm(data: dict[str, Any]) -> dict[str, Any]:
+    """Keep only known keys with sane values from an LLM answer."""
+
+    constraints: dict[str, Any] = {}
+    for key, low, high in (
+        ("time_budget_min", MIN_TIME_BUDGET_MIN, MAX_TIME_BUDGET_MIN),
+        ("budget_min", 0, None),
+        ("budget_max", 0, None),
+    ):
+        try:
+            value = int(float(data[key]))
+        except (KeyError, TypeError, ValueError):
+            continue
+        constraints[key] = min(max(value, low), high) if high else max(value, low)
+    moods = set(MOOD_WORDS.values())
+    categories = {name for names in CATEGORY_WORDS.values() for name in names}
+    for key, allowed in (("mood", moods), ("categories", categories)):
+        values = data.get(key)
+        if isinstance(values, list):
+            kept = [str(value).lower() for value in values if str(value).lower() in allowed]
+            if kept:
+                constraints[key] = list(dict.fromkeys(kept))
+    if data.get("mode") in Trip.Mode.values:
+        constraints["mode"] = data["mode"]
+    return constraints
+
+
+def parse_with_llm(text: str) -> dict[str, Any] | None:
+    """Constraints from OpenRouter, or ``None`` when it is not configured.
+
+    Raises ``OpenRouterError`` when the call fails, so callers can tell a transient failure
+    from an answer.
+    """
+
+    try:
+        data = OpenRouterClient().complete_json(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps({"query": text}, ensure_ascii=False)},
+            ]
+        )
+    except OpenRouterConfigurationError:
+        return None
+    return _clean_llm(data) if isinstance(data, dict) else None
+
+
+class QueryCache:
+    """Process-local LRU of parsed queries keyed by :func:`normalize_query`."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_query_cache = QueryCache(getattr(settings, "RECOMMENDATION_ENGINE", {}).get("query_cache_size", DEFAULT_CACHE_SIZE))
+
+
+def get_query_cache() -> QueryCache:
+    return _query_cache
+
+
+def parse_query(text: str) -> dict[str, Any]:
+    """Recommendation constraints for free text such as ``"조용한 카페에서 2시간, 1만원대"``.
+
+    Local rules run first; OpenRouter is asked only when they leave words unexplained,
+    and its answer only fills what the rules did not find. Results are cached per
+    normalized query, except when the fallback failed, so that query asks again next time.
+    """
+
+    key = normalize_query(text)
+    cached = _query_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    constraints, understood = parse_rules(text)
+    if not understood:
+        try:
+            fallback = parse_with_llm(text)
+        except OpenRouterError:
+            logger.warning("Trip query fallback failed: %r", text)
+            return dict(constraints)
+        if fallback:
+            constraints = {**fallback, **constraints}
+    _query_cache.put(key, constraints)
+    return dict(constraints)
+
+
+def apply_query(constraints: dict[str, Any]) -> dict[str, Any]:
+    """``constraints`` with the fields implied by its free-text ``q`` filled in.
+
+    Explicit fields win over the query. Runs in the service layer (or the job worker), never
+    in request validation, since an unexplained query may wait on the LLM.
+    """
+
+    if not constraints.get("q"):
+        return constraints
+    return {**parse_query(constraints["q"]), **constraints}
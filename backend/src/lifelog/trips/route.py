@@ -0,0 +1,170 @@
+﻿from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from lifelog.places.geo import haversine_m
+
+from .travel import travel_minutes
+
+# Held-Karp is O(n^2 * 2^n); beyond this many stops nearest-neighbour + 2-opt is used.
+EXACT_MAX_STOPS = 7
+DEFAULT_BUDGET_MS = 20
+
+Point = tuple[float, float]
+
+
+@dataclass
+class RoutePlan:
+    """Visiting order for a list of stops.
+
+    ``order`` holds positions into the input list, ``legs_min[i]`` is the travel
+    time into ``order[i]`` (from ``origin`` for the first stop), ``None`` when a
+    coordinate is missing.
+    """
+
+    order: list[int]
+    legs_min: list[float | None] = field(default_factory=list)
+    total_travel_min: float = 0.0
+    solver: str = "identity"
+
+
+class _Deadline(Exception):
+    pass
+
+
+def _matrix(points: list[Point | None], mode: str, known: np.ndarray | None) -> list[list[float | None]]:
+    size = len(points)
+    matrix: list[list[float | None]] = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        for j in range(i + 1, size):
+            a, b = points[i], points[j]
+            minutes = travel_minutes(haversine_m(a[0], a[1], b[0], b[1]), mode) if a and b else None
+            matrix[i][j] = matrix[j][i] = minutes
+    if known is not None:
+        for i, j in zip(*np.nonzero(~np.isnan(known))):
+            if i != j:
+                matrix[i][j] = float(known[i, j])
+    return matrix
+
+
+def _path_cost(path: list[int], cost: list[list[float]], start: int | None) -> float:
+    total = cost[start][path[0]] if start is not None and path else 0.0
+    for a, b in zip(path, path[1:]):
+        total += cost[a][b]
+    return total
+
+
+def _held_karp(stops: int, cost: list[list[float]], start: int | None, deadline: float) -> list[int]:
+    full = (1 << stops) - 1
+    best: dict[tuple[int, int], tuple[float, int]] = {}
+    for j in range(stops):
+        best[(1 << j, j)] = (cost[start][j] if start is not None else 0.0, -1)
+
+    for mask in range(1, full + 1):
+        if time.perf_counter() > deadline:
+            raise _Deadline
+        for j in range(stops):
+            state = best.get((mask, j))
+            if state is None:
+                continue
+            for k in range(stops):
+                if mask & (1 << k):
+                    continue
+                candidate = state[0] + cost[j][k]
+                key = (mask | (1 << k), k)
+                if key not in best or candidate < best[key][0]:
+                    best[key] = (candidate, j)
+
+    last = min(range(stops), key=lambda j: best[(full, j)][0])
+    path: list[int] = []
+    mask = full
+    while last != -1:
+        path.append(last)
+        previous = best[(mask, last)][1]
+        mask ^= 1 << last
+        last = previous
+    path.reverse()
+    return path
+
+
+def _nearest_neighbour(stops: int, cost: list[list[float]], start: int | None) -> list[int]:
+    if start is not None:
+        current = min(range(stops), key=lambda j: cost[start][j])
+    else:
+        current = 0
+    path = [current]
+    remaining = set(range(stops)) - {current}
+    while remaining:
+        current = min(remaining, key=lambda j: cost[current][j])
+        path.append(current)
+        remaining.remove(current)
+    return path
+
+
+def _two_opt(path: list[int], cost: list[list[float]], start: int | None, deadline: float) -> list[int]:
+    best_cost = _path_cost(path, cost, start)
+    improved = True
+    while improved and time.perf_counter() <= deadline:
+        improved = False
+        for i in range(len(path) - 1):
+            for j in range(i + 1, len(path)):
+                candidate = path[:i] + path[i : j + 1][::-1] + path[j + 1 :]
+                candidate_cost = _path_cost(candidate, cost, start)
+                if candidate_cost + 1e-9 < best_cost:
+                    path, best_cost, improved = candidate, candidate_cost, True
+    return path
+
+
+def plan_route(
+    points: list[Point | None],
+    mode: str,
+    origin: Point | None = None,
+    budget_ms: float = DEFAULT_BUDGET_MS,
+    known: np.ndarray | None = None,
+) -> RoutePlan:
+    """Order stops to minimise total travel time for ``mode``.
+
+    Exact (Held-Karp) for up to ``EXACT_MAX_STOPS`` stops, nearest-neighbour +
+    2-opt beyond that or when the exact search runs out of ``budget_ms``. Stops
+    without coordinates cost nothing to reach, so they keep their relative place.
+    ``known`` holds precomputed minutes between stops (NaN where missing), e.g.
+    from the travel matrix store; missing pairs fall back to the haversine model.
+    """
+
+    stops = len(points)
+    if stops == 0:
+        return RoutePlan(order=[])
+
+    deadline = time.perf_counter() + budget_ms / 1000
+    nodes = list(points) + ([origin] if origin else [])
+    start = stops if origin else None
+    travel = _matrix(nodes, mode, known)
+    cost = [[minutes or 0.0 for minutes in row] for row in travel]
+
+    solver = "identity"
+    order = list(range(stops))
+    if stops > 1 and any(points):
+        try:
+            if stops <= EXACT_MAX_STOPS:
+                order = _held_karp(stops, cost, start, deadline)
+                solver = "exact"
+            else:
+                raise _Deadline
+        except _Deadline:
+            order = _two_opt(_nearest_neighbour(stops, cost, start), cost, start, deadline)
+            solver = "heuristic"
+
+    legs: list[float | None] = []
+    previous = start
+    for stop in order:
+        legs.append(travel[previous][stop] if previous is not None else None)
+        previous = stop
+    return RoutePlan(
+        order=order,
+        legs_min=legs,
+        total_travel_min=sum(leg for leg in legs if leg is not None),
+        solver=solver,
+    )
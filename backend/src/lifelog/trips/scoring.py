@@ -0,0 +1,158 @@
+﻿from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from lifelog.places.congestion import congestion_levels, stack_profiles
+from lifelog.places.models import Place
+
+from .index import NO_COST, PlaceIndex
+from .preferences import similarity_places, similarity_rows
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .services import RecommendationContext
+
+
+# Score lost by a place that is fully packed during the whole visit window.
+CONGESTION_WEIGHT = 0.5
+# Score gained by a place pointing exactly along the user's preference vector.
+PREFERENCE_WEIGHT = 0.5
+# Score terms in order; learned weights (see ``learning``) scale each of them.
+FEATURES = ("rating", "mood", "district", "budget", "time", "congestion", "preference")
+DEFAULT_WEIGHTS = (1.0,) * len(FEATURES)
+
+
+@dataclass
+class CandidateArrays:
+    """Column view of a candidate set, one entry per candidate."""
+
+    rating: np.ndarray
+    mood: np.ndarray
+    district_match: np.ndarray
+    cost_low: np.ndarray
+    cost_high: np.ndarray
+    stay_min: np.ndarray
+    congestion: np.ndarray
+    preference: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rating)
+
+
+def arrays_from_places(places: Sequence[Place], ctx: RecommendationContext) -> CandidateArrays:
+    moods = ctx.mood or []
+    return CandidateArrays(
+        rating=np.array([float(place.rating or 0) for place in places], dtype=np.float64),
+        mood=np.array(
+            [[float(place.mood_scores.get(m, 0)) for m in moods] for place in places],
+            dtype=np.float64,
+        ).reshape(len(places), len(moods)),
+        district_match=np.array(
+            [bool(ctx.district and place.district and place.district.lower() == ctx.district) for place in places],
+            dtype=bool,
+        ),
+        cost_low=np.array([NO_COST if place.cost_min is None else place.cost_min for place in places], dtype=np.int64),
+        cost_high=np.array([NO_COST if place.cost_max is None else place.cost_max for place in places], dtype=np.int64),
+        stay_min=np.array([place.stay_min or 0 for place in places], dtype=np.int64),
+        congestion=congestion_levels(stack_profiles([place.congestion_profile for place in places]), ctx.visit_buckets),
+        preference=similarity_places(places, ctx.preference),
+    )
+
+
+def arrays_from_index(index: PlaceIndex, rows: np.ndarray, ctx: RecommendationContext) -> CandidateArrays:
+    moods = ctx.mood or []
+    mood = np.zeros((len(rows), len(moods)), dtype=np.float64)
+    for position, m in enumerate(moods):
+        dim = index.mood_dims.get(m)
+        if dim is not None:
+            mood[:, position] = index.mood[rows, dim]
+
+    district_code = index.district_codes.get(ctx.district) if ctx.district else None
+    if district_code is None:
+        district_match = np.zeros(len(rows), dtype=bool)
+    else:
+        district_match = index.district[rows] == district_code
+
+    return CandidateArrays(
+        rating=index.rating[rows],
+        mood=mood,
+        district_match=district_match,
+        cost_low=index.cost_low[rows],
+        cost_high=index.cost_high[rows],
+        stay_min=index.stay_min[rows].astype(np.int64),
+        congestion=congestion_levels(index.congestion[rows], ctx.visit_buckets),
+        preference=similarity_rows(index, rows, ctx.preference),
+    )
+
+
+def score_terms(arrays: CandidateArrays, ctx: RecommendationContext) -> np.ndarray:
+    """``(n, len(FEATURES))`` matrix of the unweighted score terms of each candidate."""
+
+    terms = np.zeros((len(arrays), len(FEATURES)), dtype=np.float64)
+    terms[:, 0] = arrays.rating
+
+    if ctx.mood:
+        mood_match = np.zeros(len(arrays), dtype=np.float64)
+        for column in range(arrays.mood.shape[1]):
+            mood_match += arrays.mood[:, column]
+        terms[:, 1] = mood_match / max(len(ctx.mood), 1)
+
+    if ctx.district:
+        terms[:, 2] = np.where(arrays.district_match, 0.2, 0.0)
+
+    if ctx.budget_max > 0 or ctx.budget_min > 0:
+        parsed = arrays.cost_low != NO_COST
+        target = ctx.budget_max or ctx.budget_min
+        midpoint = (arrays.cost_low + arrays.cost_high) / 2
+        diff_ratio = np.abs(midpoint - target) / max(target, 1)
+        budget_term = np.maximum(0.3 - diff_ratio * 0.3, -0.3)
+        terms[:, 3] = np.where(parsed, budget_term, 0.1)
+
+    if ctx.time_budget_min > 0:
+        stay = arrays.stay_min
+        diff_ratio = np.abs(stay - ctx.time_budget_min / max(ctx.limit, 1))
+        norm = ctx.time_budget_min or 1
+        time_term = np.maximum(0.2 - (diff_ratio / norm) * 0.2, -0.2)
+        terms[:, 4] = np.where(stay != 0, time_term, 0.0)
+
+    terms[:, 5] = -(arrays.congestion * CONGESTION_WEIGHT)
+    terms[:, 6] = arrays.preference * PREFERENCE_WEIGHT
+    return terms
+
+
+def score_arrays(arrays: CandidateArrays, ctx: RecommendationContext) -> np.ndarray:
+    """Vectorized ``_score_place``.
+
+    Terms are computed and summed in the same order and with the same float
+    operations as the per-place scorer, so both produce identical values and
+    therefore identical rankings.
+    """
+
+    terms = score_terms(arrays, ctx)
+    scores = terms[:, 0] * ctx.weights[0]
+    for feature in range(1, len(FEATURES)):
+        scores += terms[:, feature] * ctx.weights[feature]
+    return scores
+
+
+def score_places(places: Sequence[Place], ctx: RecommendationContext) -> np.ndarray:
+    """Score a whole candidate set of ``Place`` objects at once."""
+
+    return score_arrays(arrays_from_places(places, ctx), ctx)
+
+
+def score_rows(index: PlaceIndex, rows: np.ndarray, ctx: RecommendationContext) -> np.ndarray:
+    """Score candidate rows of the place index at once."""
+
+    return score_arrays(arrays_from_index(index, rows, ctx), ctx)
+
+
+def rank(scores: np.ndarray, tie_break: np.ndarray | None = None) -> np.ndarray:
+    """Positions ordered by descending score; ties keep ``tie_break`` (or input) order."""
+
+    if tie_break is None:
+        tie_break = np.arange(len(scores))
+    return np.lexsort((tie_break, -scores))
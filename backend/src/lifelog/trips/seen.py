@@ -0,0 +1,166 @@
+﻿from __future__ import annotations
+
+import hashlib
+import time
+from collections.abc import Iterable, Sequence
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from lifelog.core.cache import cache_lock
+
+from .models import TripNode
+
+SEEN_CACHE_KEY = "trips:seen:{user_id}"
+LOCK_CACHE_KEY = "trips:seen:{user_id}:lock"
+LOCK_TIMEOUT_SEC = 5
+LOCK_ATTEMPTS = 50
+LOCK_WAIT_SEC = 0.01
+BLOOM_BITS = 1 << 17  # 16 KiB per generation; ~0.5% false positives at 10k places
+HASHES = 4
+DEFAULT_WINDOW_DAYS = 14
+
+
+def _engine_setting(key: str, default: Any) -> Any:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get(key, default)
+
+
+def place_keys(place_ids: Iterable[Any]) -> np.ndarray:
+    """Bloom bit positions of each place, ``(n, HASHES)``; stable across processes."""
+
+    digests = b"".join(hashlib.blake2b(str(place_id).encode(), digest_size=4 * HASHES).digest() for place_id in place_ids)
+    return (np.frombuffer(digests, dtype="<u4").reshape(-1, HASHES) & (BLOOM_BITS - 1)).astype(np.uint32)
+
+
+def _empty() -> np.ndarray:
+    return np.zeros(BLOOM_BITS // 8, dtype=np.uint8)
+
+
+@dataclass
+class SeenFilter:
+    """Places recently recommended to a user, as two rotating Bloom filter generations.
+
+    ``current`` collects new places; after a window it becomes ``previous`` and the
+    oldest generation is dropped, so a place counts as seen for one to two windows.
+    Ids in ``allow`` are never reported as seen.
+    """
+
+    current: np.ndarray = field(default_factory=_empty)
+    previous: np.ndarray = field(default_factory=_empty)
+    started: float = field(default_factory=time.time)
+    allow: frozenset[str] = frozenset()
+
+    def add(self, keys: np.ndarray, previous: bool = False) -> None:
+        flat = keys.ravel()
+        np.bitwise_or.at(self.previous if previous else self.current, flat >> 3, (1 << (flat & 7)).astype(np.uint8))
+
+    def contains(self, keys: np.ndarray, ids: Sequence[str] | None = None) -> np.ndarray:
+        """Whether each row of ``keys`` is (probably) seen; pass ``ids`` when ``allow`` is set."""
+
+        bits = self.current | self.previous
+        seen = ((bits[keys >> 3] >> (keys & 7)) & 1).all(axis=1)
+        if self.allow and ids is not None:
+            seen &= np.array([place_id not in self.allow for place_id in ids], dtype=bool)
+        return seen
+
+    def rotate(self, window_sec: float, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        elapsed = now - self.started
+        if elapsed < window_sec:
+            return False
+        self.previous = self.current if elapsed < 2 * window_sec else _empty()
+        self.current = _empty()
+        self.started = now
+        return True
+
+    def dump(self) -> dict[str, Any]:
+        return {"current": self.current.tobytes(), "previous": self.previous.tobytes(), "started": self.started}
+
+    @classmethod
+    def load(cls, data: dict[str, Any]) -> SeenFilter:
+        return cls(
+            current=np.frombuffer(data["current"], dtype=np.uint8).copy(),
+            previous=np.frombuffer(data["previous"], dtype=np.uint8).copy(),
+            started=data["started"],
+        )
+
+
+def _window_sec() -> float:
+    return _engine_setting("seen_window_days", DEFAULT_WINDOW_DAYS) * 86400
+
+
+def build_seen_filter(user_id: Any) -> SeenFilter:
+    """Filter of the places in the user's trips of the last two windows (one query)."""
+
+    window = _window_sec()
+    now = timezone.now()
+    rows = TripNode.objects.filter(trip__owner_id=user_id, trip__created_at__gte=now - timedelta(seconds=2 * window))
+    recent: list[str] = []
+    older: list[str] = []
+    boundary = now - timedelta(seconds=window)
+    for place_id, created_at in rows.values_list("place_id", "trip__created_at"):
+        (recent if created_at >= boundary else older).append(str(place_id))
+    seen = SeenFilter()
+    if recent:
+        seen.add(place_keys(recent))
+    if older:
+        seen.add(place_keys(older), previous=True)
+    return seen
+
+
+def _save(user_id: Any, seen: SeenFilter) -> None:
+    cache.set(SEEN_CACHE_KEY.format(user_id=user_id), seen.dump(), timeout=int(2 * _window_sec()))
+
+
+def _locked(user_id: Any) -> AbstractContextManager[bool]:
+    """The user's filter lock; yields ``False`` when it stays taken and the filter must not be written."""
+
+    return cache_lock(LOCK_CACHE_KEY.format(user_id=user_id), LOCK_TIMEOUT_SEC, LOCK_ATTEMPTS, LOCK_WAIT_SEC)
+
+
+def get_seen_filter(user_id: Any) -> SeenFilter | None:
+    """The user's filter from the cache, built from trip history on a miss; ``None`` when off."""
+
+    if not user_id or not _engine_setting("seen_filter_enabled", True):
+        return None
+    key = SEEN_CACHE_KEY.format(user_id=user_id)
+    data = cache.get(key)
+    if data is None:
+        seen = build_seen_filter(user_id)
+        # ``add``: a filter stored meanwhile by ``remember_places`` is newer than this build.
+        cache.add(key, seen.dump(), timeout=int(2 * _window_sec()))
+        return seen
+    seen = SeenFilter.load(data)
+    if seen.rotate(_window_sec()):
+        with _locked(user_id) as locked:
+            data = cache.get(key) if locked else None
+            if data is not None:
+                seen = SeenFilter.load(data)
+                seen.rotate(_window_sec())
+                _save(user_id, seen)
+    return seen
+
+
+def remember_places(user_id: Any, place_ids: Iterable[Any]) -> None:
+    """Add places of a new trip to the owner's filter, under the user's lock."""
+
+    place_ids = list(place_ids)
+    if not user_id or not place_ids or not _engine_setting("seen_filter_enabled", True):
+        return
+    key = SEEN_CACHE_KEY.format(user_id=user_id)
+    with _locked(user_id) as locked:
+        data = cache.get(key) if locked else None
+        if data is None:
+            # The trip is committed, so the next read rebuilds it from history, with no lost update.
+            cache.delete(key)
+            return
+        seen = SeenFilter.load(data)
+        seen.rotate(_window_sec())
+        seen.add(place_keys(place_ids))
+        _save(user_id, seen)
@@ -7,13 +7,16 @@ from rest_framework import serializers
 from lifelog.places.serializers import TagSerializer
 from lifelog.places.models import Tag
 
+from .materialize import materialize
 from .models import (
     Trip,
     TripNode,
+    TripRecommendationJob,
     TripTemplate,
     TripTemplateGenerationJob,
     TripTemplateNode,
 )
+from .query import MAX_TIME_BUDGET_MIN
 
 
 class TripTemplateNodeSerializer(serializers.ModelSerializer):
@@ -101,19 +104,20 @@ class TripTemplateWriteSerializer(serializers.ModelSerializer):
         if tag_ids is not None:
             template.tags.set(Tag.objects.filter(id__in=tag_ids))
         if nodes_data is not None:
-            template.nodes.all().delete()
-            self._sync_nodes(template, nodes_data)
+            self._sync_nodes(template, nodes_data, replace=True)
         return template
 
-    def _sync_nodes(self, template: TripTemplate, nodes_data: list[dict]):
-        for index, node_data in enumerate(nodes_data, start=1):
-            TripTemplateNode.objects.create(
-                template=template,
+    def _sync_nodes(self, template: TripTemplate, nodes_data: list[dict], replace: bool = False):
+        nodes = [
+            TripTemplateNode(
                 place=node_data["place"],
                 sequence=node_data.get("sequence", index),
                 stay_min=node_data.get("stay_min", 30),
                 notes=node_data.get("notes", {}),
             )
+            for index, node_data in enumerate(nodes_data, start=1)
+        ]
+        materialize(template, nodes, replace=replace)
 
 
 class TripTemplateGenerationJobSerializer(serializers.ModelSerializer):
@@ -269,14 +273,12 @@ class TripWriteSerializer(serializers.ModelSerializer):
         nodes_data = validated_data.pop("nodes", None)
         trip = super().update(instance, validated_data)
         if nodes_data is not None:
-            trip.nodes.all().delete()
-            self._sync_nodes(trip, nodes_data)
+            self._sync_nodes(trip, nodes_data, replace=True)
         return trip
 
-    def _sync_nodes(self, trip: Trip, nodes_data: list[dict]):
-        for index, node_data in enumerate(nodes_data, start=1):
-            TripNode.objects.create(
-                trip=trip,
+    def _sync_nodes(self, trip: Trip, nodes_data: list[dict], replace: bool = False):
+        nodes = [
+            TripNode(
                 sequence=node_data.get("sequence", index),
                 place=node_data["place"],
                 planned_stay_min=node_data.get("planned_stay_min", 30),
@@ -284,10 +286,13 @@ class TripWriteSerializer(serializers.ModelSerializer):
                 notes=node_data.get("notes", {}),
                 eta=node_data.get("eta"),
             )
+            for index, node_data in enumerate(nodes_data, start=1)
+        ]
+        materialize(trip, nodes, replace=replace)
 
 
 class TripRecommendationRequestSerializer(serializers.Serializer):
-    time_budget_min = serializers.IntegerField(min_value=15, required=False)
+    time_budget_min = serializers.IntegerField(min_value=15, max_value=MAX_TIME_BUDGET_MIN, required=False)
     budget_min = serializers.IntegerField(min_value=0, required=False)
     budget_max = serializers.IntegerField(min_value=0, required=False)
     mode = serializers.ChoiceField(choices=Trip.Mode.choices, required=False)
@@ -297,3 +302,43 @@ class TripRecommendationRequestSerializer(serializers.Serializer):
     district = serializers.CharField(required=False, allow_blank=True)
     limit = serializers.IntegerField(min_value=1, max_value=10, required=False, default=3)
     skip_place_ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=True)
+    origin_lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    origin_lng = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    max_travel_min = serializers.IntegerField(min_value=1, max_value=120, required=False)
+    start_at = serializers.DateTimeField(required=False)
+    reuse = serializers.BooleanField(required=False, default=True)
+    alternatives = serializers.IntegerField(min_value=1, max_value=5, required=False)
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    explain = serializers.BooleanField(required=False, default=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # `async` is a keyword, so it cannot be declared as a class attribute.
+        fields["async"] = serializers.BooleanField(required=False, default=False)
+        return fields
+
+    def validate(self, attrs):
+        if ("origin_lat" in attrs) != ("origin_lng" in attrs):
+            raise serializers.ValidationError({"origin": "origin_lat, origin_lng 를 함께 보내 주세요."})
+        # ``q`` is parsed by the service layer (``query.apply_query``), off the request path for jobs.
+        return attrs
+
+
+class TripRecommendationJobSerializer(serializers.ModelSerializer):
+    trip = TripSerializer(read_only=True)
+
+    class Meta:
+        model = TripRecommendationJob
+        fields = (
+            "id",
+            "status",
+            "constraints",
+            "trip",
+            "reused",
+            "error_code",
+            "error_detail",
+            "created_at",
+            "updated_at",
+            "completed_at",
+        )
+        read_only_fields = fields
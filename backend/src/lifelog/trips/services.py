@@ -2,16 +2,46 @@
 
 import hashlib
 import json
-import re
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from datetime import datetime, timedelta
 from typing import Any
 
+import numpy as np
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
+from lifelog.places.congestion import congestion_levels, stack_profiles, visit_buckets
+from lifelog.places.hours import fits_visit, stack_bitmaps
 from lifelog.places.models import Place
 
-from .models import Trip, TripNode, TripTemplate
+from .explain import RecommendationTrace
+from .index import PlaceIndex, discard_places, get_place_index
+from .learning import get_ranking_weights
+from .materialize import materialize, materialize_many, place_tag_names
+from .matrix import get_travel_matrix_store
+from .models import CourseBundle, Trip, TripNode, TripTemplate
+from .packing import DEFAULT_TOP_K, MIN_STAY_MIN, Candidates, knapsack, leg_estimates
+from .packing import DEFAULT_BUDGET_MS as DEFAULT_PACKING_BUDGET_MS
+from .parallel import score_top_rows, should_shard
+from .route import DEFAULT_BUDGET_MS, RoutePlan, plan_route
+from .preferences import get_preference_vector, similarity_places, similarity_rows, top_similar
+from .query import apply_query
+from .seen import SeenFilter, get_seen_filter, place_keys
+from .scoring import CONGESTION_WEIGHT, DEFAULT_WEIGHTS, FEATURES, PREFERENCE_WEIGHT, rank, score_places, score_rows
+from .travel import DEFAULT_MAX_TRAVEL_MIN, reachable_radius_m
+
+DEFAULT_REUSE_WINDOW_SEC = 600
+DEFAULT_PREFERENCE_TOP_N = 500
+DEFAULT_BUNDLE_MATCHES = 20
+DEFAULT_BUNDLE_MIN_MOOD = 0.3
+MAX_ALTERNATIVES = 5
 
 
 @dataclass
@@ -26,7 +56,32 @@ class RecommendationContext:
     district: str | None = None
     limit: int = 3
     skip_place_ids: list[str] | None = None
-
+    origin: tuple[float, float] | None = None
+    max_travel_min: int = DEFAULT_MAX_TRAVEL_MIN
+    alternatives: int = 1
+    start_at: datetime | None = None
+    weights: tuple[float, ...] = DEFAULT_WEIGHTS
+    preference: dict[str, float] | None = None
+    seen: SeenFilter | None = None
+    trace: RecommendationTrace = field(default_factory=RecommendationTrace)
+
+    @property
+    def local_start(self) -> datetime | None:
+        if self.start_at is None:
+            return None
+        return timezone.localtime(self.start_at) if timezone.is_aware(self.start_at) else self.start_at
+
+    @cached_property
+    def visit_buckets(self) -> list[int]:
+        """Hour-of-week buckets of the planned trip, used to look up congestion."""
+
+        return visit_buckets(self.local_start or timezone.localtime(), self.time_budget_min)
+
+    @property
+    def origin_radius_m(self) -> float | None:
+        if self.origin is None:
+            return None
+        return reachable_radius_m(self.mode, self.max_travel_min)
 
 
 class NoPlacesAvailableError(Exception):
@@ -34,6 +89,12 @@ class NoPlacesAvailableError(Exception):
 
 
 def _prepare_context(data: dict[str, Any]) -> RecommendationContext:
+    origin = None
+    if data.get("origin_lat") is not None and data.get("origin_lng") is not None:
+        origin = (float(data["origin_lat"]), float(data["origin_lng"]))
+    start_at = data.get("start_at")
+    if isinstance(start_at, str):
+        start_at = parse_datetime(start_at)
     return RecommendationContext(
         time_budget_min=data.get("time_budget_min", 90),
         budget_min=data.get("budget_min", 0),
@@ -45,81 +106,25 @@ def _prepare_context(data: dict[str, Any]) -> RecommendationContext:
         district=(data.get("district") or None or "").lower() or None,
         limit=max(1, min(int(data.get("limit", 3)), 10)),
         skip_place_ids=data.get("skip_place_ids", []),
+        origin=origin,
+        max_travel_min=max(1, int(data.get("max_travel_min") or DEFAULT_MAX_TRAVEL_MIN)),
+        alternatives=max(1, min(int(data.get("alternatives") or 1), MAX_ALTERNATIVES)),
+        start_at=start_at,
     )
 
 
 
 
-def _parse_cost_band(cost_band: str | None) -> tuple[int, int] | None:
-    if not cost_band:
-        return None
-    numbers = [int(value) for value in re.findall(r"\d+", cost_band)]
-    if not numbers:
-        return None
-    low = min(numbers)
-    high = max(numbers)
-    return low, high
-
-
-def _budget_level_from_amount(amount: int) -> int:
-    if amount <= 15000:
-        return 1
-    if amount <= 30000:
-        return 2
-    return 3
+def _prepare_user_context(user_id: str | None, raw_constraints: dict[str, Any]) -> RecommendationContext:
+    """Context of a request as ``user_id`` would get it: their ranking weights, preference vector
+    and recently seen places."""
 
+    ctx = _prepare_context(raw_constraints)
+    ctx.weights = get_ranking_weights(user_id)
+    ctx.preference = get_preference_vector(user_id)
+    ctx.seen = get_seen_filter(user_id)
+    return ctx
 
-def _budget_level_from_label(label: str | None) -> int | None:
-    if not label:
-        return None
-    normalized = label.strip().lower()
-    mapping = {
-        "cheap": 1,
-        "low": 1,
-        "budget": 1,
-        "moderate": 2,
-        "medium": 2,
-        "standard": 2,
-        "high": 3,
-        "premium": 3,
-        "expensive": 3,
-    }
-    return mapping.get(normalized)
-
-
-def _matches_budget(place: Place, ctx: RecommendationContext) -> bool:
-    if ctx.budget_min <= 0 and ctx.budget_max <= 0:
-        return True
-
-    parsed = _parse_cost_band(place.cost_band)
-    if parsed:
-        low, high = parsed
-        if ctx.budget_min and high < ctx.budget_min:
-            return False
-        if ctx.budget_max and low > ctx.budget_max:
-            return False
-        return True
-
-    level = _budget_level_from_label(place.cost_band)
-    if level is None:
-        return True
-
-    min_level = 1
-    max_level = 3
-    if ctx.budget_min > 0:
-        min_level = _budget_level_from_amount(ctx.budget_min)
-    if ctx.budget_max > 0:
-        max_level = _budget_level_from_amount(ctx.budget_max)
-    return min_level <= level <= max_level
-
-
-def _matches_time(place: Place, ctx: RecommendationContext) -> bool:
-    if ctx.time_budget_min <= 0:
-        return True
-    stay = place.stay_min or 0
-    if stay == 0:
-        return True
-    return stay <= ctx.time_budget_min
 
 def _build_context_hash(payload: dict[str, Any]) -> str:
     canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
@@ -127,116 +132,506 @@ def _build_context_hash(payload: dict[str, Any]) -> str:
 
 
 
-def _score_place(place: Place, ctx: RecommendationContext) -> float:
-    base = float(place.rating or 0)
+def _place_terms(place: Place, ctx: RecommendationContext) -> list[float]:
+    """Unweighted score terms of one place, in ``scoring.FEATURES`` order."""
+
+    terms = [float(place.rating or 0), 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
 
     if ctx.mood:
         mood_match = sum(place.mood_scores.get(m, 0) for m in ctx.mood)
-        base += mood_match / max(len(ctx.mood), 1)
+        terms[1] = mood_match / max(len(ctx.mood), 1)
 
     if ctx.district and place.district and place.district.lower() == ctx.district:
-        base += 0.2
+        terms[2] = 0.2
 
     if ctx.budget_max > 0 or ctx.budget_min > 0:
-        parsed = _parse_cost_band(place.cost_band)
-        if parsed:
-            low, high = parsed
+        if place.cost_min is not None:
+            low, high = place.cost_min, place.cost_max
             target = ctx.budget_max or ctx.budget_min
             if target:
                 midpoint = (low + high) / 2
                 diff_ratio = abs(midpoint - target) / max(target, 1)
-                base += max(0.3 - diff_ratio * 0.3, -0.3)
+                terms[3] = max(0.3 - diff_ratio * 0.3, -0.3)
         else:
-            base += 0.1  # slight boost when cost info exists and already matched budget filter
+            terms[3] = 0.1  # slight boost when cost info exists and already matched budget filter
 
     if ctx.time_budget_min > 0:
         stay = place.stay_min or 0
         if stay:
             diff_ratio = abs(stay - ctx.time_budget_min / max(ctx.limit, 1))
             norm = ctx.time_budget_min or 1
-            base += max(0.2 - (diff_ratio / norm) * 0.2, -0.2)
-
-    return base
+            terms[4] = max(0.2 - (diff_ratio / norm) * 0.2, -0.2)
 
+    congestion = congestion_levels(stack_profiles([place.congestion_profile]), ctx.visit_buckets)[0]
+    terms[5] = -(float(congestion) * CONGESTION_WEIGHT)
+    terms[6] = float(similarity_places([place], ctx.preference)[0]) * PREFERENCE_WEIGHT
 
+    return terms
 
-def _select_places(ctx: RecommendationContext) -> list[Place]:
-    qs = Place.objects.filter(is_active=True)
-
-    if ctx.categories:
-        qs = qs.filter(category__in=ctx.categories)
-    if ctx.tags:
-        qs = qs.filter(tags__name__in=ctx.tags)
-    if ctx.district:
-        qs = qs.filter(district__iexact=ctx.district)
-    if ctx.skip_place_ids:
-        qs = qs.exclude(id__in=ctx.skip_place_ids)
-
-    qs = qs.distinct()
 
-    candidates = list(qs)
-    if not candidates:
-        candidates = list(Place.objects.filter(is_active=True).exclude(id__in=ctx.skip_place_ids or []))
-
-    if not candidates:
-        raise NoPlacesAvailableError("no_places_available")
+def _score_place(place: Place, ctx: RecommendationContext) -> float:
+    """Reference scorer for a single place; ``scoring.score_arrays`` is its batch twin."""
 
-    budget_filtered = [place for place in candidates if _matches_budget(place, ctx)]
-    if budget_filtered:
-        candidates = budget_filtered
+    terms = _place_terms(place, ctx)
+    base = terms[0] * ctx.weights[0]
+    for term, weight in zip(terms[1:], ctx.weights[1:]):
+        base += term * weight
+    return base
 
-    time_filtered = [place for place in candidates if _matches_time(place, ctx)]
-    if time_filtered:
-        candidates = time_filtered
 
-    scored = sorted(candidates, key=lambda place: _score_place(place, ctx), reverse=True)
 
-    selected: list[Place] = []
+def _fill_time_budget(ranked: list[Any], stays: list[int], ctx: RecommendationContext) -> list[Any]:
+    selected: list[Any] = []
     remaining_time = ctx.time_budget_min if ctx.time_budget_min > 0 else None
 
-    for place in scored:
-        stay = max(place.stay_min or 0, 15)
+    for item, stay_min in zip(ranked, stays):
+        stay = max(stay_min or 0, MIN_STAY_MIN)
         if remaining_time is not None and selected and stay > remaining_time:
             continue
-        selected.append(place)
+        selected.append(item)
         if remaining_time is not None:
             remaining_time = max(0, remaining_time - stay)
         if len(selected) >= ctx.limit:
             break
 
     if not selected:
-        selected = scored[: ctx.limit]
+        selected = ranked[: ctx.limit]
 
     return selected
 
 
-@transaction.atomic
-def create_recommendation(user_id: str | None, raw_constraints: dict[str, Any]) -> Trip:
-    ctx = _prepare_context(raw_constraints)
-    selected_places = _select_places(ctx)
+def _pack_course(candidates: Candidates, ctx: RecommendationContext, deadline: float) -> list[Any]:
+    """Best-scoring course that fits the time budget, stays plus travel into each stop.
 
-    User = get_user_model()
-    user = None
-    if user_id:
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            user = None
+    Solved exactly over the top-K candidates; greedy filling is used when packing is
+    disabled, there is no time budget, the deadline passed or nothing fits.
+    """
+
+    engine = getattr(settings, "RECOMMENDATION_ENGINE", {})
+    if engine.get("packing", "knapsack") == "knapsack" and ctx.time_budget_min > 0:
+        top = candidates.take(np.arange(min(len(candidates), engine.get("packing_top_k", DEFAULT_TOP_K))))
+        costs = np.maximum(top.stays, MIN_STAY_MIN) + leg_estimates(top.latitude, top.longitude, ctx.mode)
+        positions = knapsack(top.scores, costs, ctx.time_budget_min, ctx.limit, deadline)
+        if positions:
+            return [top.items[position] for position in positions]
+        ctx.trace.fallback("greedy_packing")
+    return _fill_time_budget(candidates.items, candidates.stays.tolist(), ctx)
+
+
+def _split_courses(candidates: Candidates, ctx: RecommendationContext, count: int) -> list[list[Any]]:
+    """Fill up to ``count`` courses from one ranking; no item appears in two courses."""
+
+    budget_ms = getattr(settings, "RECOMMENDATION_ENGINE", {}).get("packing_budget_ms", DEFAULT_PACKING_BUDGET_MS)
+    deadline = time.perf_counter() + budget_ms / 1000
+    courses: list[list[Any]] = []
+    while len(candidates) and len(courses) < count:
+        course = _pack_course(candidates, ctx, deadline)
+        courses.append(course)
+        used = set(course)
+        keep = [position for position, item in enumerate(candidates.items) if item not in used]
+        candidates = candidates.take(np.array(keep, dtype=np.int64))
+    return courses
+
+
+def _drop_seen(rows: np.ndarray, seen: np.ndarray, ctx: RecommendationContext, count: int = 1) -> np.ndarray:
+    """Rows not recently recommended to the user, unless that leaves too few for ``count`` courses."""
+
+    fresh = rows[~seen]
+    if fresh.size >= min(ctx.limit * count, rows.size):
+        rows = fresh
+    else:
+        ctx.trace.fallback("seen_filter_relaxed")
+    ctx.trace.count("unseen", rows.size)
+    return rows
+
+
+def _preference_top_n() -> int:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get("preference_top_n", DEFAULT_PREFERENCE_TOP_N)
+
+
+def _retrieves_by_preference(ctx: RecommendationContext) -> bool:
+    """Without explicit categories or tags the candidate set is narrowed to the places most
+    similar to the user's preference vector before scoring."""
+
+    return bool(ctx.preference) and not ctx.categories and not ctx.tags
+
+
+def _candidate_limit(ctx: RecommendationContext, count: int) -> int | None:
+    """Ranked candidates handed to course packing: the top-K the knapsack solves over after
+    each of ``count`` courses, on every path. Greedy packing walks the whole ranking (short
+    stays far down still fit), so it gets no cut, which also keeps it off the scoring shards."""
+
+    engine = getattr(settings, "RECOMMENDATION_ENGINE", {})
+    if engine.get("packing", "knapsack") != "knapsack":
+        return None
+    return engine.get("packing_top_k", DEFAULT_TOP_K) + ctx.limit * count
+
+
+def _rank_rows(
+    index: PlaceIndex, ctx: RecommendationContext, top_n: int | None = None, count: int = 1
+) -> tuple[np.ndarray, np.ndarray]:
+    """Matching rows best first, with their scores, cut to the best ``top_n`` when given.
+
+    Large candidate sets are scored in parallel shards and merged.
+    """
+
+    trace = ctx.trace
+    with trace.stage("candidates"):
+        active = index.active_mask(ctx.skip_place_ids)
+
+        mask = active.copy()
+        if ctx.categories:
+            mask &= index.category_mask(ctx.categories)
+        if ctx.tags:
+            mask &= index.tag_mask(ctx.tags)
+        if ctx.district:
+            mask &= index.district_mask(ctx.district)
+        if ctx.origin is not None:
+            mask &= index.radius_mask(*ctx.origin, ctx.origin_radius_m)
+
+        rows = np.flatnonzero(mask)
+        trace.count("matched", rows.size)
+        if not rows.size:
+            rows = np.flatnonzero(active)
+            trace.fallback("no_match_use_all_active")
+            trace.count("all_active", rows.size)
+
+    if not rows.size:
+        raise NoPlacesAvailableError("no_places_available")
+
+    with trace.stage("filters"):
+        if ctx.budget_min > 0 or ctx.budget_max > 0:
+            budget_rows = rows[index.budget_mask(ctx.budget_min, ctx.budget_max)[rows]]
+            if budget_rows.size:
+                rows = budget_rows
+            else:
+                trace.fallback("budget_filter_relaxed")
+            trace.count("budget", rows.size)
+
+        if ctx.time_budget_min > 0:
+            time_rows = rows[index.time_mask(ctx.time_budget_min)[rows]]
+            if time_rows.size:
+                rows = time_rows
+            else:
+                trace.fallback("time_filter_relaxed")
+            trace.count("time", rows.size)
+
+        if ctx.start_at is not None:
+            rows = rows[index.open_mask(rows, ctx.local_start, ctx.time_budget_min)]
+            trace.count("open", rows.size)
+            if not rows.size:
+                raise NoPlacesAvailableError("no_places_available")
+
+        if ctx.seen is not None:
+            ids = [index.ids[row] for row in rows] if ctx.seen.allow else None
+            rows = _drop_seen(rows, ctx.seen.contains(index.seen_keys[rows], ids), ctx, count)
+
+        if _retrieves_by_preference(ctx):
+            similarity = similarity_rows(index, rows, ctx.preference)
+            keep = top_similar(similarity, index.rating[rows], index.name_rank[rows], _preference_top_n())
+            rows = rows[keep]
+            trace.count("preference", rows.size)
+
+    with trace.stage("scoring"):
+        if top_n is not None and rows.size > top_n and should_shard(rows.size):
+            return score_top_rows(index, rows, ctx, top_n)
+        scores = score_rows(index, rows, ctx)
+        order = rank(scores, index.name_rank[rows])[:top_n]
+    return rows[order], scores[order]
+
+
+def _select_rows(index: PlaceIndex, ctx: RecommendationContext, count: int = 1) -> list[list[int]]:
+    ranked, scores = _rank_rows(index, ctx, top_n=_candidate_limit(ctx, count), count=count)
+    candidates = Candidates(
+        items=ranked.tolist(),
+        scores=scores,
+        stays=index.stay_min[ranked].astype(np.int64),
+        latitude=index.latitude[ranked],
+        longitude=index.longitude[ranked],
+    )
+    with ctx.trace.stage("selection"):
+        return _split_courses(candidates, ctx, count)
+
+
+def _select_courses_from_db(ctx: RecommendationContext, count: int = 1) -> list[list[Place]]:
+    trace = ctx.trace
+    trace.path = trace.path or "db"
+    with trace.stage("candidates"):
+        qs = Place.objects.filter(is_active=True)
+
+        if ctx.categories:
+            qs = qs.filter(category__in=ctx.categories)
+        if ctx.tags:
+            qs = qs.filter(tags__name__in=ctx.tags)
+        if ctx.district:
+            qs = qs.filter(district__iexact=ctx.district)
+        if ctx.skip_place_ids:
+            qs = qs.exclude(id__in=ctx.skip_place_ids)
+        if ctx.origin is not None:
+            nearby = qs.distances_within(*ctx.origin, ctx.origin_radius_m)
+            qs = qs.filter(id__in=[place_id for place_id, _distance in nearby])
+
+        qs = qs.distinct()
+
+        if not qs.exists():
+            trace.fallback("no_match_use_all_active")
+            qs = Place.objects.filter(is_active=True).exclude(id__in=ctx.skip_place_ids or [])
+            if not qs.exists():
+                raise NoPlacesAvailableError("no_places_available")
+
+    with trace.stage("filters"):
+        if ctx.budget_min > 0 or ctx.budget_max > 0:
+            budget_qs = qs.within_budget(ctx.budget_min, ctx.budget_max)
+            if budget_qs.exists():
+                qs = budget_qs
+            else:
+                trace.fallback("budget_filter_relaxed")
+
+        if ctx.time_budget_min > 0:
+            time_qs = qs.filter(Q(stay_min=0) | Q(stay_min__lte=ctx.time_budget_min))
+            if time_qs.exists():
+                qs = time_qs
+            else:
+                trace.fallback("time_filter_relaxed")
+
+        if ctx.preference:
+            qs = qs.prefetch_related("tags")
+        places = list(qs)
+        trace.count("matched", len(places))
+        if ctx.start_at is not None:
+            overrides = {position: place.hours_overrides for position, place in enumerate(places) if place.hours_overrides}
+            stays = np.array([place.stay_min or 0 for place in places], dtype=np.int64)
+            open_now = fits_visit(stack_bitmaps([p.hours_bitmap for p in places]), overrides, stays, ctx.local_start, ctx.time_budget_min)
+            places = [place for place, is_open in zip(places, open_now) if is_open]
+            trace.count("open", len(places))
+            if not places:
+                raise NoPlacesAvailableError("no_places_available")
+        if ctx.seen is not None:
+            ids = [str(place.id) for place in places]
+            keep = _drop_seen(np.arange(len(places)), ctx.seen.contains(place_keys(ids), ids), ctx, count)
+            places = [places[position] for position in keep]
+        if _retrieves_by_preference(ctx):
+            ratings = np.array([float(place.rating or 0) for place in places], dtype=np.float64)
+            similarity = similarity_places(places, ctx.preference)
+            keep = top_similar(similarity, ratings, np.arange(len(places)), _preference_top_n())
+            places = [places[position] for position in keep]
+            trace.count("preference", len(places))
+
+    with trace.stage("scoring"):
+        scores = score_places(places, ctx)
+        order = rank(scores)[: _candidate_limit(ctx, count)]
+    ranked = [places[position] for position in order]
+    candidates = Candidates(
+        items=ranked,
+        scores=scores[order],
+        stays=np.array([place.stay_min or 0 for place in ranked], dtype=np.int64),
+        latitude=np.array([np.nan if p.latitude is None else p.latitude for p in ranked], dtype=np.float64),
+        longitude=np.array([np.nan if p.longitude is None else p.longitude for p in ranked], dtype=np.float64),
+    )
+    with trace.stage("selection"):
+        return _split_courses(candidates, ctx, count)
+
+
+def _select_places_from_db(ctx: RecommendationContext) -> list[Place]:
+    return _select_courses_from_db(ctx)[0]
+
+
+def _select_courses(ctx: RecommendationContext, count: int = 1) -> list[list[Place]]:
+    """Up to ``count`` non-overlapping courses, best first, from a single scoring pass."""
+
+    if not getattr(settings, "RECOMMENDATION_ENGINE", {}).get("place_index_enabled", True):
+        return _select_courses_from_db(ctx, count)
+
+    ctx.trace.path = "index"
+    with ctx.trace.stage("index_refresh"):
+        index = get_place_index()
+    for _attempt in range(3):
+        courses = [[index.ids[row] for row in rows] for rows in _select_rows(index, ctx, count)]
+        place_ids = [place_id for course in courses for place_id in course]
+        with ctx.trace.stage("fetch"):
+            places = {str(pk): place for pk, place in Place.objects.filter(is_active=True).in_bulk(place_ids).items()}
+        missing = [place_id for place_id in place_ids if place_id not in places]
+        if not missing:
+            return [[places[place_id] for place_id in course] for course in courses]
+        # Rows for places that vanished without a change notification (raw SQL, rolled back
+        # transactions) are dropped and the selection is retried on the patched index.
+        ctx.trace.fallback("index_missing_rows")
+        index = discard_places(missing)
+
+    ctx.trace.path = "db"
+    ctx.trace.fallback("index_retries_exhausted")
+    return _select_courses_from_db(ctx, count)
 
-    context_payload = {
-        "user_id": str(user_id) if user_id else None,
-        "constraints": raw_constraints,
-    }
-    context_hash = _build_context_hash(context_payload)
 
+def _select_places(ctx: RecommendationContext) -> list[Place]:
+    return _select_courses(ctx)[0]
+
+
+def _bundle_eligible(ctx: RecommendationContext) -> bool:
+    """Whether a precomputed bundle can answer the request: a plain district course of 2~4 stops."""
+
+    return bool(
+        getattr(settings, "RECOMMENDATION_ENGINE", {}).get("bundles_enabled", True)
+        and ctx.district
+        and 2 <= ctx.limit <= 4
+        and ctx.alternatives == 1
+        and not (ctx.categories or ctx.tags or ctx.skip_place_ids)
+        and ctx.origin is None
+        and ctx.start_at is None
+    )
+
+
+def _select_bundle(ctx: RecommendationContext) -> tuple[list[Place], RoutePlan] | None:
+    """Best stored bundle inside the request envelope, rescored for the user; ``None`` on no match.
+
+    Bundles already fit the time budget and price range by their stored totals; their places
+    are re-read so closed, re-priced or moved ones (and seen ones) disqualify the bundle.
+    """
+
+    trace = ctx.trace
+    engine = getattr(settings, "RECOMMENDATION_ENGINE", {})
+    with trace.stage("bundle"):
+        qs = CourseBundle.objects.filter(
+            district=ctx.district, mode=ctx.mode, stops=ctx.limit, duration_min__lte=ctx.time_budget_min
+        )
+        if ctx.budget_max > 0:
+            qs = qs.filter(Q(cost_floor__isnull=True) | Q(cost_floor__lte=ctx.budget_max))
+        if ctx.budget_min > 0:
+            qs = qs.filter(Q(cost_ceiling__isnull=True) | Q(cost_ceiling__gte=ctx.budget_min))
+        bundles = list(qs.order_by("-score")[: engine.get("bundle_matches", DEFAULT_BUNDLE_MATCHES)])
+        if ctx.mood:
+            min_mood = engine.get("bundle_min_mood", DEFAULT_BUNDLE_MIN_MOOD)
+            bundles = [b for b in bundles if sum(b.mood.get(m, 0.0) for m in ctx.mood) / len(ctx.mood) >= min_mood]
+        trace.count("bundles", len(bundles))
+        if not bundles:
+            return None
+
+        place_ids = {place_id for bundle in bundles for place_id in bundle.place_ids}
+        places_qs = Place.objects.filter(is_active=True, id__in=place_ids, district__iexact=ctx.district).within_budget(
+            ctx.budget_min, ctx.budget_max
+        )
+        if ctx.preference:
+            places_qs = places_qs.prefetch_related("tags")
+        places = {str(place.id): place for place in places_qs}
+        seen: set[str] = set()
+        if ctx.seen is not None and places:
+            ids = list(places)
+            seen = {place_id for place_id, hit in zip(ids, ctx.seen.contains(place_keys(ids), ids)) if hit}
+
+        best: tuple[float, CourseBundle, list[Place]] | None = None
+        for bundle in bundles:
+            if any(place_id not in places or place_id in seen for place_id in bundle.place_ids):
+                continue
+            members = [places[place_id] for place_id in bundle.place_ids]
+            value = sum(_score_place(place, ctx) for place in members) / len(members)
+            if best is None or value > best[0]:
+                best = (value, bundle, members)
+    if best is None:
+        return None
+    _value, bundle, members = best
+    route = RoutePlan(
+        order=list(range(len(members))), legs_min=list(bundle.legs_min), total_travel_min=bundle.travel_min, solver="bundle"
+    )
+    return members, route
+
+
+def _order_route(places: list[Place], ctx: RecommendationContext) -> tuple[list[Place], RoutePlan]:
+    budget_ms = getattr(settings, "RECOMMENDATION_ENGINE", {}).get("route_budget_ms", DEFAULT_BUDGET_MS)
+    points = [(p.latitude, p.longitude) if p.latitude is not None and p.longitude is not None else None for p in places]
+    known = get_travel_matrix_store().lookup(places, ctx.mode) if len(places) > 1 else None
+    plan = plan_route(points, ctx.mode, origin=ctx.origin, budget_ms=budget_ms, known=known)
+    return [places[position] for position in plan.order], plan
+
+
+def _json_safe(data: dict[str, Any]) -> dict[str, Any]:
+    """Round-trip validated input (UUIDs, decimals) through JSON for hashing and storage."""
+
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def _recommendation_hash(user_id: str | None, raw_constraints: dict[str, Any]) -> str:
+    return _build_context_hash(
+        {
+            "user_id": str(user_id) if user_id else None,
+            "constraints": raw_constraints,
+        }
+    )
+
+
+def find_reusable_recommendation(user_id: str | None, raw_constraints: dict[str, Any]) -> Trip | None:
+    """Latest trip of ``user_id`` for the same constraints inside the reuse window.
+
+    Only returned while every place on it is still active, so a reused course never
+    points at a closed or hidden place.
+    """
+
+    window = getattr(settings, "RECOMMENDATION_ENGINE", {}).get("reuse_window_sec", DEFAULT_REUSE_WINDOW_SEC)
+    if not user_id or window <= 0:
+        return None
+
+    context_hash = _recommendation_hash(user_id, _json_safe(raw_constraints))
+    trip = (
+        Trip.objects.filter(
+            owner_id=user_id,
+            context_hash=context_hash,
+            created_at__gte=timezone.now() - timedelta(seconds=window),
+        )
+        .order_by("-created_at")
+        .first()
+    )
+    if trip is None:
+        return None
+    place_ids = trip.summary.get("place_ids") or []
+    if not place_ids or Place.objects.filter(id__in=place_ids, is_active=True).count() != len(set(place_ids)):
+        return None
+    return trip
+
+
+def get_or_create_recommendation(
+    user_id: str | None,
+    raw_constraints: dict[str, Any],
+    reuse: bool = True,
+    trace: RecommendationTrace | None = None,
+) -> tuple[Trip, bool]:
+    """Return ``(trip, created)``; ``created`` is False when a recent identical trip was reused."""
+
+    from .feed import trip_from_feed
+
+    trace = trace or RecommendationTrace()
+    raw_constraints = apply_query(raw_constraints)
+    if reuse:
+        with trace.stage("reuse_lookup"):
+            trip = find_reusable_recommendation(user_id, raw_constraints)
+        if trip is not None:
+            trace.path = "reused"
+            trace.finish()
+            return trip, False
+    with trace.stage("feed_lookup"):
+        trip = trip_from_feed(user_id, raw_constraints)
+    if trip is not None:
+        trace.path = "feed"
+        trace.finish()
+        return trip, True
+    return create_recommendation(user_id, raw_constraints, trace=trace), True
+
+
+def _build_trip(
+    user,
+    places: list[Place],
+    route: RoutePlan,
+    ctx: RecommendationContext,
+    raw_constraints: dict[str, Any],
+    context_hash: str,
+    tag_names: dict[str, list[str]],
+) -> tuple[Trip, list[TripNode]]:
     duration = ctx.time_budget_min or 90
-    per_stop = max(15, duration // max(len(selected_places), 1))
+    per_stop = max(15, duration // max(len(places), 1))
 
-    title = selected_places[0].name if selected_places else "추천 코스"
-    if len(selected_places) > 1:
-        title = f"{title} 외 {len(selected_places) - 1}곳"
+    title = places[0].name if places else "추천 코스"
+    if len(places) > 1:
+        title = f"{title} 외 {len(places) - 1}곳"
 
-    trip = Trip.objects.create(
+    trip = Trip(
         owner=user,
         title=title,
         context_hash=context_hash,
@@ -246,34 +641,143 @@ def create_recommendation(user_id: str | None, raw_constraints: dict[str, Any])
         budget_max=ctx.budget_max or ctx.budget_min,
         mode=ctx.mode,
         summary={
-            "place_ids": [str(p.id) for p in selected_places],
-            "categories": sorted({p.category for p in selected_places if p.category}),
-            "tags": sorted({tag for p in selected_places for tag in p.tags.values_list("name", flat=True)}),
+            "place_ids": [str(p.id) for p in places],
+            "categories": sorted({p.category for p in places if p.category}),
+            "tags": sorted({tag for p in places for tag in tag_names.get(str(p.id), [])}),
             "limit": ctx.limit,
+            "route": {"solver": route.solver, "travel_min": round(route.total_travel_min, 1)},
         },
     )
 
-    for sequence, place in enumerate(selected_places, start=1):
-        TripNode.objects.create(
-            trip=trip,
+    nodes: list[TripNode] = []
+    eta = ctx.start_at or timezone.now()
+    for sequence, (place, leg_min) in enumerate(zip(places, route.legs_min), start=1):
+        notes: dict[str, Any] = {"selected_by": "recommendation"}
+        if leg_min is not None:
+            notes["travel_min"] = round(leg_min, 1)
+            eta += timedelta(minutes=leg_min)
+        node = TripNode(
             place=place,
             sequence=sequence,
             planned_stay_min=per_stop,
             transition_mode=ctx.mode,
-            notes={"selected_by": "recommendation"},
+            notes=notes,
+            eta=eta,
+        )
+        nodes.append(node)
+        eta += timedelta(minutes=per_stop)
+
+    return trip, nodes
+
+
+def _course_card(trip: Trip, nodes: list[TripNode], route: RoutePlan, ctx: RecommendationContext) -> dict[str, Any]:
+    """Time / cost / mood figures for comparing alternative courses side by side."""
+
+    places = [node.place for node in nodes]
+    priced = [p for p in places if p.cost_min is not None]
+    mood_keys = ctx.mood or sorted({key for p in places for key in p.mood_scores})
+    mood = {key: round(sum(float(p.mood_scores.get(key, 0)) for p in places) / len(places), 2) for key in mood_keys}
+    if not ctx.mood:
+        mood = dict(sorted(mood.items(), key=lambda item: -item[1])[:3])
+    return {
+        "trip_id": str(trip.id),
+        "title": trip.title,
+        "stops": len(places),
+        "duration_min": sum(node.planned_stay_min for node in nodes) + round(route.total_travel_min),
+        "travel_min": round(route.total_travel_min, 1),
+        "cost_min": sum(p.cost_min for p in priced) if priced else None,
+        "cost_max": sum(p.cost_max for p in priced) if priced else None,
+        "mood": mood,
+        "categories": trip.summary["categories"],
+    }
+
+
+def _explain_places(places: list[Place], ctx: RecommendationContext) -> list[dict[str, Any]]:
+    """Weighted score terms of the chosen places, for ``explain`` responses."""
+
+    chosen = []
+    for place in places:
+        terms = _place_terms(place, ctx)
+        chosen.append(
+            {
+                "place_id": str(place.id),
+                "name": place.name,
+                "score": round(_score_place(place, ctx), 4),
+                "terms": {feature: round(term * weight, 4) for feature, term, weight in zip(FEATURES, terms, ctx.weights)},
+            }
         )
+    return chosen
+
+
+@transaction.atomic
+def create_recommendation(
+    user_id: str | None, raw_constraints: dict[str, Any], trace: RecommendationTrace | None = None
+) -> Trip:
+    """Create the recommended trip; with ``alternatives`` > 1 also its non-overlapping siblings.
+
+    Siblings are scored in the same pass and written in the same two inserts. Every
+    trip of the set carries the comparison cards in ``summary["alternatives"]``.
+    Stage timings and fallbacks go to ``trace`` (a fresh one when omitted) and are logged.
+    """
+
+    trace = trace or RecommendationTrace()
+    with trace.stage("context"):
+        raw_constraints = _json_safe(raw_constraints)
+        ctx = _prepare_user_context(user_id, raw_constraints)
+        ctx.trace = trace
+    bundle = _select_bundle(ctx) if _bundle_eligible(ctx) else None
+    if bundle is not None:
+        trace.path = "bundle"
+        courses = [bundle]
+    else:
+        try:
+            selected = _select_courses(ctx, ctx.alternatives)
+        except NoPlacesAvailableError:
+            trace.fallback("no_places_available")
+            trace.finish()
+            raise
+        with trace.stage("route"):
+            courses = [_order_route(places, ctx) for places in selected]
+    if trace.explain:
+        trace.chosen = _explain_places(courses[0][0], ctx)
 
+    User = get_user_model()
+    user = None
+    if user_id:
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            user = None
+
+    context_hash = _recommendation_hash(user_id, raw_constraints)
+    tag_names = place_tag_names(p.id for places, _route in courses for p in places)
+
+    batch: list[tuple[Trip, list[TripNode]]] = []
+    for position, (places, route) in enumerate(courses):
+        course_hash = context_hash if position == 0 else _build_context_hash({"alternative_of": context_hash, "rank": position})
+        batch.append(_build_trip(user, places, route, ctx, raw_constraints, course_hash, tag_names))
+
+    if len(batch) > 1:
+        cards = [_course_card(trip, nodes, route, ctx) for (trip, nodes), (_places, route) in zip(batch, courses)]
+        for rank_position, (trip, _nodes) in enumerate(batch):
+            trip.summary["alternatives"] = cards
+            trip.summary["alternative_rank"] = rank_position
+
+    with trace.stage("insert"):
+        trip = materialize_many(batch)[0].parent
+    trace.finish()
     return trip
 
+
 @transaction.atomic
 def create_trip_from_template(template: TripTemplate, owner, title_override: str | None = None) -> Trip:
     title = title_override.strip() if title_override else template.title
     context_payload = {"template_id": str(template.id), "origin": template.origin}
     context_hash = _build_context_hash(context_payload)
 
-    nodes = list(template.nodes.select_related("place"))
+    nodes = list(template.nodes.all())
 
-    trip = Trip.objects.create(
+    trip = Trip(
         owner=owner,
         title=title,
         context_hash=context_hash,
@@ -289,15 +793,15 @@ def create_trip_from_template(template: TripTemplate, owner, title_override: str
         },
     )
 
-    for sequence, node in enumerate(nodes, start=1):
-        TripNode.objects.create(
-            trip=trip,
-            place=node.place,
+    trip_nodes = [
+        TripNode(
+            place_id=node.place_id,
             sequence=sequence,
             planned_stay_min=node.stay_min,
             transition_mode=trip.mode,
             notes=node.notes or {"template_node_id": str(node.id)},
         )
-
-    return trip
+        for sequence, node in enumerate(nodes, start=1)
+    ]
+    return materialize(trip, trip_nodes).parent
 
@@ -0,0 +1,183 @@
+﻿from __future__ import annotations
+
+import math
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from lifelog.places.models import Place
+
+from .materialize import materialize, place_tag_names
+from .models import Trip
+from .query import apply_query
+from .services import (
+    NoPlacesAvailableError,
+    _build_trip,
+    _json_safe,
+    _order_route,
+    _prepare_user_context,
+    _recommendation_hash,
+    _select_courses,
+)
+
+SESSION_CACHE_KEY = "trips:session:{session_id}"
+USER_SESSION_CACHE_KEY = "trips:session:user:{user_id}"
+COOLDOWN_CACHE_KEY = "trips:session:cooldown:{user_id}"
+DEFAULT_SESSION_SIZE = 9
+DEFAULT_SESSION_TTL_SEC = 60 * 60
+DEFAULT_COOLDOWN_MIN = 10
+
+
+class SessionCooldownError(Exception):
+    """Raised when a user opens a session before the previous one's cooldown is over."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("session_cooldown")
+        self.retry_after = retry_after
+
+
+def _engine() -> dict[str, Any]:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {})
+
+
+def cooldown_remaining(user_id: str) -> int:
+    """Seconds until ``user_id`` may open a new session (0 when allowed)."""
+
+    until = cache.get(COOLDOWN_CACHE_KEY.format(user_id=user_id))
+    return max(math.ceil(until - time.time()), 0) if until else 0
+
+
+def _proposal(rank: int, places: list[Place]) -> dict[str, Any]:
+    return {
+        "rank": rank,
+        "place_ids": [str(place.id) for place in places],
+        "places": [
+            {
+                "id": str(place.id),
+                "name": place.name,
+                "category": place.category,
+                "district": place.district,
+                "stay_min": place.stay_min,
+            }
+            for place in places
+        ],
+        "stay_min": sum(place.stay_min or 0 for place in places),
+        "categories": sorted({place.category for place in places if place.category}),
+    }
+
+
+def _save(session: dict[str, Any]) -> None:
+    timeout = max(math.ceil(session["expires"] - time.time()), 1)
+    cache.set(SESSION_CACHE_KEY.format(session_id=session["id"]), session, timeout=timeout)
+
+
+def open_session(user_id: str, raw_constraints: dict[str, Any]) -> tuple[dict[str, Any], bool]:
+    """The user's open session, or a new one holding every proposal from one scoring pass.
+
+    Proposals are non-overlapping courses ranked best first, capped at ``session_size``
+    (7~9 by design). Nothing is written to the database.
+    """
+
+    remaining = cooldown_remaining(user_id)
+    if remaining:
+        raise SessionCooldownError(remaining)
+    active = cache.get(USER_SESSION_CACHE_KEY.format(user_id=user_id))
+    if active:
+        session = cache.get(SESSION_CACHE_KEY.format(session_id=active))
+        if session is not None:
+            return session, False
+
+    engine = _engine()
+    raw_constraints = _json_safe(apply_query(raw_constraints))
+    ctx = _prepare_user_context(user_id, raw_constraints)
+    courses = _select_courses(ctx, engine.get("session_size", DEFAULT_SESSION_SIZE))
+    if not courses:
+        raise NoPlacesAvailableError("no_places_available")
+    ttl = engine.get("session_ttl_sec", DEFAULT_SESSION_TTL_SEC)
+    session = {
+        "id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "constraints": raw_constraints,
+        "proposals": [_proposal(rank, places) for rank, places in enumerate(courses, start=1)],
+        "position": 0,
+        "expires": time.time() + ttl,
+    }
+    _save(session)
+    cache.set(USER_SESSION_CACHE_KEY.format(user_id=user_id), session["id"], timeout=ttl)
+    return session, True
+
+
+def get_session(session_id: str, user_id: str) -> dict[str, Any] | None:
+    session = cache.get(SESSION_CACHE_KEY.format(session_id=session_id))
+    if session is None or session["user_id"] != user_id:
+        return None
+    return session
+
+
+def end_session(session: dict[str, Any]) -> None:
+    """Drop the session and start the user's cooldown before the next one."""
+
+    user_id = session["user_id"]
+    cache.delete_many([SESSION_CACHE_KEY.format(session_id=session["id"]), USER_SESSION_CACHE_KEY.format(user_id=user_id)])
+    cooldown = _engine().get("session_cooldown_min", DEFAULT_COOLDOWN_MIN) * 60
+    if cooldown > 0:
+        cache.set(COOLDOWN_CACHE_KEY.format(user_id=user_id), time.time() + cooldown, timeout=cooldown)
+
+
+def next_proposal(session: dict[str, Any]) -> dict[str, Any] | None:
+    """Advance to the next proposal; ``None`` (and the cooldown) once the list is used up."""
+
+    if session["position"] + 1 >= len(session["proposals"]):
+        end_session(session)
+        return None
+    session["position"] += 1
+    _save(session)
+    return session["proposals"][session["position"]]
+
+
+@transaction.atomic
+def accept_proposal(session: dict[str, Any]) -> Trip:
+    """Turn the current proposal into a trip: the only database write of a session."""
+
+    proposal = session["proposals"][session["position"]]
+    found = {str(pk): place for pk, place in Place.objects.filter(is_active=True).in_bulk(proposal["place_ids"]).items()}
+    places = [found[place_id] for place_id in proposal["place_ids"] if place_id in found]
+    if not places:
+        raise NoPlacesAvailableError("no_places_available")
+
+    user_id = session["user_id"]
+    ctx = _prepare_user_context(user_id, session["constraints"])
+    ordered, route = _order_route(places, ctx)
+    trip, nodes = _build_trip(
+        get_user_model().objects.filter(id=user_id).first(),
+        ordered,
+        route,
+        ctx,
+        session["constraints"],
+        _recommendation_hash(user_id, session["constraints"]),
+        place_tag_names(place.id for place in ordered),
+    )
+    trip.summary["source"] = "session"
+    trip = materialize(trip, nodes).parent
+    # Only a committed trip ends the session; a rolled-back accept leaves it open to retry.
+    transaction.on_commit(lambda: end_session(session))
+    return trip
+
+
+def session_payload(session: dict[str, Any]) -> dict[str, Any]:
+    position = session["position"]
+    return {
+        "id": session["id"],
+        "position": position + 1,
+        "total": len(session["proposals"]),
+        "remaining": len(session["proposals"]) - position - 1,
+        "proposal": session["proposals"][position],
+        "constraints": session["constraints"],
+        "expires_at": datetime.fromtimestamp(session["expires"], tz=dt_timezone.utc).isoformat(),
+    }
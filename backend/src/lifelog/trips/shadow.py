@@ -0,0 +1,125 @@
+﻿from __future__ import annotations
+
+import logging
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+from django.conf import settings
+from django.db import transaction
+from waffle import flag_is_active
+
+from lifelog.places.models import Place
+
+from .explain import RecommendationTrace
+from .models import ShadowRecommendation, Trip
+from .services import RecommendationContext, _order_route, _prepare_user_context, _select_courses, _select_courses_from_db
+
+logger = logging.getLogger(__name__)
+
+SHADOW_FLAG = "recommendation_shadow"
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_ENGINE = "db"
+# Stages of the production trace that correspond to one engine call.
+SELECTION_STAGES = ("bundle", "index_refresh", "candidates", "filters", "scoring", "selection", "fetch")
+
+Engine = Callable[[RecommendationContext], list[Place]]
+ENGINES: dict[str, Engine] = {}
+
+
+def register_engine(name: str) -> Callable[[Engine], Engine]:
+    """Register a candidate selection/scoring implementation under ``name``."""
+
+    def decorator(engine: Engine) -> Engine:
+        ENGINES[name] = engine
+        return engine
+
+    return decorator
+
+
+@register_engine("db")
+def _db_engine(ctx: RecommendationContext) -> list[Place]:
+    return _select_courses_from_db(ctx)[0]
+
+
+@register_engine("index")
+def _index_engine(ctx: RecommendationContext) -> list[Place]:
+    return _select_courses(ctx)[0]
+
+
+def compare_courses(recorded: list[str], replayed: list[str]) -> dict[str, Any]:
+    """How far one course moved from another: exact match, same places, same first stop, Jaccard."""
+
+    before, after = set(recorded), set(replayed)
+    union = before | after
+    return {
+        "identical": recorded == replayed,
+        "same_places": before == after,
+        "same_first": bool(recorded and replayed and recorded[0] == replayed[0]),
+        "jaccard": round(len(before & after) / len(union), 4) if union else 1.0,
+    }
+
+
+def shadow_requested(request) -> bool:
+    """Whether this request should also be answered by the shadow engine (flag + sample rate)."""
+
+    if not flag_is_active(request, SHADOW_FLAG):
+        return False
+    rate = getattr(settings, "RECOMMENDATION_ENGINE", {}).get("shadow_sample_rate", DEFAULT_SAMPLE_RATE)
+    return rate > 0 and random.random() < rate
+
+
+def schedule_shadow(trip: Trip, user_id: str | None, trace: RecommendationTrace) -> None:
+    """Queue the shadow run once the production trip is committed; reused/feed answers are skipped."""
+
+    if trace.path not in {"bundle", "index", "db"}:
+        return
+    engine = getattr(settings, "RECOMMENDATION_ENGINE", {}).get("shadow_engine", DEFAULT_ENGINE)
+    production_ms = round(sum(trace.stages.get(stage, 0.0) for stage in SELECTION_STAGES), 3)
+    args = (str(trip.id), user_id, trip.inputs, production_ms, engine)
+
+    def enqueue() -> None:
+        from .tasks import run_shadow_recommendation
+
+        run_shadow_recommendation.delay(*args)
+
+    transaction.on_commit(enqueue)
+
+
+def run_shadow(
+    trip_id: str, user_id: str | None, constraints: dict[str, Any], production_ms: float, engine: str = DEFAULT_ENGINE
+) -> ShadowRecommendation | None:
+    """Answer a recorded request with ``engine`` and store latency, overlap or the error."""
+
+    trip = Trip.objects.filter(id=trip_id).first()
+    if trip is None:
+        logger.warning("Shadow recommendation skipped, trip not found: %s", trip_id)
+        return None
+    record = ShadowRecommendation(
+        trip=trip,
+        engine=engine,
+        inputs=constraints,
+        production_place_ids=trip.summary.get("place_ids", []),
+        production_ms=production_ms,
+    )
+    try:
+        ctx = _prepare_user_context(user_id, constraints)
+        if ctx.seen is not None:
+            # The production course is already in the seen filter by now; it was not when production ran.
+            ctx.seen.allow = frozenset(record.production_place_ids)
+        started = time.perf_counter()
+        places = ENGINES[engine](ctx)
+        record.shadow_ms = round((time.perf_counter() - started) * 1000, 3)
+        ordered, _route = _order_route(places, ctx)
+    except Exception as exc:
+        # Any failure of a candidate engine is a result to record, never a task failure.
+        record.error = f"{type(exc).__name__}: {exc}"[:2000]
+    else:
+        record.shadow_place_ids = [str(place.id) for place in ordered]
+        overlap = compare_courses(record.production_place_ids, record.shadow_place_ids)
+        record.identical = overlap["identical"]
+        record.same_first = overlap["same_first"]
+        record.jaccard = overlap["jaccard"]
+    record.save()
+    return record
@@ -0,0 +1,83 @@
+﻿from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from lifelog.feedback.models import Feedback
+from lifelog.places.models import FavoritePlace, Place, PlaceTag, Tag
+from lifelog.users.models import UserPreferredTag
+
+from .bundles import mark_districts_dirty
+from .index import mark_places_changed
+from .matrix import get_travel_matrix_store
+from .models import Trip
+
+
+def _publish_on_commit(place_ids) -> None:
+    """Publish index changes once the writing transaction commits, never uncommitted rows."""
+
+    ids = [str(place_id) for place_id in place_ids]
+    if ids:
+        transaction.on_commit(lambda: mark_places_changed(ids))
+
+
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def place_changed(sender, instance: Place, **kwargs):
+    # A moved place leaves bundles behind in its old district too.
+    districts = [instance.district, getattr(instance, "_loaded_district", None)]
+    instance._loaded_district = instance.district
+    _publish_on_commit([instance.pk])
+    transaction.on_commit(lambda: mark_districts_dirty(districts))
+
+
+@receiver(post_save, sender=Place)
+def place_moved(sender, instance: Place, **kwargs):
+    if not getattr(instance, "_geo_changed", False):
+        return
+    store = get_travel_matrix_store()
+    if not any(store.has(instance.district, mode) for mode in Trip.Mode.values):
+        return
+    from .tasks import refresh_travel_matrix_place
+
+    place_id = str(instance.pk)
+    transaction.on_commit(lambda: refresh_travel_matrix_place.delay(place_id))
+
+
+@receiver(post_save, sender=PlaceTag)
+@receiver(post_delete, sender=PlaceTag)
+def place_tag_changed(sender, instance: PlaceTag, **kwargs):
+    _publish_on_commit([instance.place_id])
+
+
+@receiver(m2m_changed, sender=Place.tags.through)
+def place_tags_changed(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    if action not in {"post_add", "post_remove", "pre_clear"}:
+        return
+    if not reverse:
+        _publish_on_commit([instance.pk])
+    elif action == "pre_clear":
+        _publish_on_commit(PlaceTag.objects.filter(tag=instance).values_list("place_id", flat=True))
+    else:
+        _publish_on_commit(pk_set or [])
+
+
+@receiver(post_save, sender=Tag)
+def tag_changed(sender, instance: Tag, created: bool, **kwargs):
+    if created:
+        return
+    _publish_on_commit(PlaceTag.objects.filter(tag=instance).values_list("place_id", flat=True))
+
+
+@receiver(post_save, sender=UserPreferredTag)
+@receiver(post_delete, sender=UserPreferredTag)
+@receiver(post_save, sender=FavoritePlace)
+@receiver(post_delete, sender=FavoritePlace)
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def preferences_changed(sender, instance, **kwargs):
+    from .tasks import refresh_preference_vector
+
+    user_id = str(instance.user_id)
+    transaction.on_commit(lambda: refresh_preference_vector.delay(user_id))
@@ -4,6 +4,7 @@ import logging
 from typing import Any
 
 from celery import shared_task
+from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 from lifelog.core.clients.openrouter import (
@@ -12,21 +13,68 @@ from lifelog.core.clients.openrouter import (
     OpenRouterError,
 )
 
+from lifelog.places.models import Place
+
 from .ai import build_messages, normalize_template_payload
-from .models import TripTemplateGenerationJob
-from .services import NoPlacesAvailableError, create_recommendation
+from .bundles import all_districts, build_bundles, pop_dirty_districts
+from .explain import RecommendationTrace, record_timings
+from .feed import DEFAULT_FEED_CHUNK_SIZE, active_user_ids, build_feed
+from .learning import DEFAULT_BATCH_SIZE, train_batch
+from .matrix import get_travel_matrix_store
+from .models import Trip, TripRecommendationJob, TripTemplateGenerationJob
+from .preferences import refresh_vector
+from .services import NoPlacesAvailableError, get_or_create_recommendation
+from .shadow import run_shadow, schedule_shadow
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task(name="trips.generate_recommendations")
-def generate_trip_recommendations(user_id: str | None, constraints: dict[str, Any] | None = None) -> dict[str, Any]:
+def generate_trip_recommendations(
+    user_id: str | None,
+    constraints: dict[str, Any] | None = None,
+    reuse: bool = False,
+    explain: bool = False,
+    shadow: bool = False,
+) -> dict[str, Any]:
     constraints = constraints or {}
+    trace = RecommendationTrace(explain=explain)
     try:
-        trip = create_recommendation(user_id, constraints)
-        return {"trip_id": str(trip.id), "status": "created"}
+        trip, created = get_or_create_recommendation(user_id, constraints, reuse=reuse, trace=trace)
+        result = {"trip_id": str(trip.id), "status": "created" if created else "reused"}
+        if shadow:
+            schedule_shadow(trip, user_id, trace)
     except NoPlacesAvailableError as exc:
-        return {"trip_id": None, "status": "error", "error": str(exc)}
+        result = {"trip_id": None, "status": "error", "error": str(exc)}
+    if explain:
+        result["explain"] = trace.as_dict()
+    return result
+
+
+@shared_task(name="trips.run_recommendation_job")
+def run_recommendation_job(job_id: str) -> dict[str, Any]:
+    try:
+        job = TripRecommendationJob.objects.get(id=job_id)
+    except TripRecommendationJob.DoesNotExist:
+        logger.warning("Recommendation job not found: %s", job_id)
+        return {"status": "error", "error": "job_not_found"}
+
+    if job.is_finished:
+        return {"status": job.status, "job_id": str(job.id)}
+
+    job.mark_running()
+    try:
+        trip, created = get_or_create_recommendation(str(job.requested_by_id), job.constraints, reuse=job.reuse)
+    except NoPlacesAvailableError as exc:
+        job.mark_failed(str(exc))
+        return {"status": "error", "job_id": str(job.id), "error": str(exc)}
+    except Exception as exc:  # pragma: no cover - defensive guard
+        logger.exception("Unexpected error while processing recommendation job %s", job.id)
+        job.mark_failed("processing_error", str(exc))
+        return {"status": "error", "job_id": str(job.id), "error": "processing_error"}
+
+    job.mark_completed(trip, reused=not created)
+    return {"status": "completed", "job_id": str(job.id), "trip_id": str(trip.id)}
 
 
 @shared_task(name="trips.sync_freshness")
@@ -85,3 +133,98 @@ def request_ai_template(job_id: str) -> dict[str, Any]:
 
     logger.info("AI template job %s completed", job.id)
     return {"status": "completed", "job_id": str(job.id), "template": normalized}
+
+
+@shared_task(name="trips.build_travel_matrices")
+def build_travel_matrices(modes: list[str] | None = None) -> dict[str, Any]:
+    districts = sorted(set(Place.objects.filter(is_active=True).values_list("district", flat=True)))
+    for district in districts:
+        build_travel_matrix.delay(district, modes)
+    return {"status": "queued", "districts": len(districts)}
+
+
+@shared_task(name="trips.build_travel_matrix")
+def build_travel_matrix(district: str, modes: list[str] | None = None) -> dict[str, Any]:
+    store = get_travel_matrix_store()
+    sizes = {mode: store.build(district, mode) for mode in modes or Trip.Mode.values}
+    logger.info("Travel matrices rebuilt for %r: %s", district, sizes)
+    return {"status": "built", "district": district, "places": sizes}
+
+
+@shared_task(name="trips.refresh_travel_matrix_place")
+def refresh_travel_matrix_place(place_id: str) -> dict[str, Any]:
+    try:
+        place = Place.objects.get(id=place_id)
+    except Place.DoesNotExist:
+        return {"status": "error", "error": "not_found"}
+
+    store = get_travel_matrix_store()
+    stale = [mode for mode in Trip.Mode.values if store.has(place.district, mode) and not store.refresh_place(place, mode)]
+    if stale:
+        # New to this district's block: only a rebuild can add a row.
+        build_travel_matrix.delay(place.district, stale)
+    return {"status": "refreshed", "place_id": place_id, "rebuild": stale}
+
+
+@shared_task(name="trips.rebuild_course_bundles")
+def rebuild_course_bundles(full: bool = False) -> dict[str, Any]:
+    """Rebuild the bundles of districts whose places changed, or of every district when ``full``."""
+
+    districts = all_districts() if full else pop_dirty_districts()
+    sizes = {district: build_bundles(district) for district in sorted(districts)}
+    return {"status": "built", "full": full, "districts": sizes}
+
+
+@shared_task(name="trips.build_recommendation_feeds")
+def build_recommendation_feeds(chunk_size: int = DEFAULT_FEED_CHUNK_SIZE) -> dict[str, Any]:
+    user_ids = [str(user_id) for user_id in active_user_ids()]
+    for start in range(0, len(user_ids), chunk_size):
+        build_recommendation_feed_chunk.delay(user_ids[start : start + chunk_size])
+    return {"status": "queued", "users": len(user_ids), "chunks": -(-len(user_ids) // chunk_size)}
+
+
+@shared_task(name="trips.build_recommendation_feed_chunk")
+def build_recommendation_feed_chunk(user_ids: list[str]) -> dict[str, Any]:
+    built = 0
+    for user in get_user_model().objects.filter(id__in=user_ids, is_active=True):
+        try:
+            build_feed(user)
+            built += 1
+        except NoPlacesAvailableError:
+            continue
+    return {"status": "built", "users": built}
+
+
+@shared_task(name="trips.train_ranking_weights")
+def train_ranking_weights(batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int = 20) -> dict[str, Any]:
+    learned = 0
+    for _batch in range(max_batches):
+        count = train_batch(batch_size)
+        learned += count
+        if count < batch_size:
+            break
+    return {"status": "trained", "feedback": learned}
+
+
+@shared_task(name="trips.refresh_preference_vector")
+def refresh_preference_vector(user_id: str) -> dict[str, Any]:
+    if not get_user_model().objects.filter(id=user_id).exists():
+        return {"status": "error", "error": "not_found"}
+    vector = refresh_vector(user_id)
+    return {"status": "refreshed", "user_id": user_id, "dims": len(vector)}
+
+
+@shared_task(name="trips.record_recommendation_timings")
+def record_recommendation_timings(day: str, timings: dict[str, float]) -> dict[str, Any]:
+    record_timings(day, timings)
+    return {"status": "recorded", "stages": len(timings)}
+
+
+@shared_task(name="trips.run_shadow_recommendation")
+def run_shadow_recommendation(
+    trip_id: str, user_id: str | None, constraints: dict[str, Any], production_ms: float, engine: str
+) -> dict[str, Any]:
+    record = run_shadow(trip_id, user_id, constraints, production_ms, engine)
+    if record is None:
+        return {"status": "error", "error": "trip_not_found"}
+    return {"status": "failed" if record.error else "recorded", "shadow_id": str(record.id)}
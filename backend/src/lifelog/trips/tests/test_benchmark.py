@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from lifelog.places.models import Place
+
+
+class RecommendationBenchmarkCommandTests(TestCase):
+    def test_reports_each_size_path_and_mix_and_rolls_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "bench.json"
+            call_command(
+                "benchmark_recommendations",
+                sizes="40,80",
+                runs=2,
+                mixes="default,origin,start_at",
+                paths="index,db",
+                db_path_max_size=40,
+                output=str(output),
+                use_current_db=True,
+                stdout=StringIO(),
+            )
+            report = json.loads(output.read_text(encoding="utf-8"))
+
+        self.assertEqual(report["meta"]["vendor"], "sqlite")
+        self.assertEqual([entry["rows"] for entry in report["index"]], [40, 80])
+        keys = {(row["rows"], row["path"], row["mix"], row["target"]) for row in report["results"]}
+        self.assertIn((40, "db", "origin", "create"), keys)
+        self.assertIn((80, "index", "start_at", "select"), keys)
+        self.assertNotIn((80, "db", "default", "select"), keys)
+        for row in report["results"]:
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+            self.assertGreater(row["queries"], 0)
+        self.assertFalse(Place.objects.filter(name__startswith="bench-").exists())
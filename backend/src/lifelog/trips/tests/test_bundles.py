@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from lifelog.places.models import Place
+from lifelog.trips.bundles import (
+    DIRTY_CACHE_KEY,
+    DIRTY_LOCK_CACHE_KEY,
+    build_bundles,
+    mark_districts_dirty,
+    pop_dirty_districts,
+)
+from lifelog.trips.explain import RecommendationTrace
+from lifelog.trips.models import CourseBundle, Trip
+from lifelog.trips.services import create_recommendation
+from lifelog.trips.tasks import rebuild_course_bundles
+
+DISTRICT = "번들테스트구"
+
+
+def _engine(**overrides):
+    return override_settings(RECOMMENDATION_ENGINE={**settings.RECOMMENDATION_ENGINE, **overrides})
+
+
+class CourseBundleTests(TestCase):
+    def setUp(self):
+        self.near = [
+            Place.objects.create(
+                name=f"Bundle {position}",
+                category="cafe",
+                district=DISTRICT,
+                rating=4.8 - position / 10,
+                stay_min=30,
+                location={"type": "Point", "coordinates": [127.0 + position * 0.002, 37.5]},
+            )
+            for position in range(4)
+        ]
+        self.far = Place.objects.create(
+            name="Bundle far",
+            category="cafe",
+            district=DISTRICT,
+            rating=5,
+            stay_min=30,
+            location={"type": "Point", "coordinates": [127.2, 37.5]},
+        )
+
+    def _recommend(self, **extra):
+        trace = RecommendationTrace()
+        constraints = {"district": DISTRICT, "mode": "walk", "limit": 3, "time_budget_min": 120, **extra}
+        trip = create_recommendation(None, constraints, trace=trace)
+        return trip, trace
+
+    def test_builder_prunes_long_legs_and_durations(self):
+        with _engine(bundle_max_duration_min=70):
+            build_bundles(DISTRICT, [Trip.Mode.WALK])
+        bundles = list(CourseBundle.objects.filter(district=DISTRICT))
+
+        self.assertTrue(bundles)
+        self.assertEqual({bundle.stops for bundle in bundles}, {2})
+        self.assertTrue(all(bundle.duration_min <= 70 for bundle in bundles))
+        self.assertTrue(all(str(self.far.id) not in bundle.place_ids for bundle in bundles))
+
+        build_bundles(DISTRICT, [Trip.Mode.WALK])
+        self.assertEqual(set(CourseBundle.objects.filter(district=DISTRICT).values_list("stops", flat=True)), {2, 3, 4})
+        self.assertTrue(all(leg is None or leg <= 20 for bundle in CourseBundle.objects.all() for leg in bundle.legs_min))
+
+    def test_recommendation_uses_matching_bundle(self):
+        build_bundles(DISTRICT, [Trip.Mode.WALK])
+        trip, trace = self._recommend()
+
+        self.assertEqual(trace.path, "bundle")
+        self.assertIn("bundle", trace.stages)
+        self.assertEqual(set(trip.summary["place_ids"]), {str(place.id) for place in self.near[:3]})
+        self.assertEqual(trip.nodes.count(), 3)
+
+    def test_unmatched_requests_fall_back_to_live_assembly(self):
+        build_bundles(DISTRICT, [Trip.Mode.WALK])
+        Place.objects.filter(id__in=[self.near[1].id, self.near[2].id]).update(is_active=False)
+
+        _trip, inactive = self._recommend()
+        _trip, categories = self._recommend(categories=["cafe"])
+        _trip, short = self._recommend(time_budget_min=30, limit=2)
+
+        self.assertNotEqual(inactive.path, "bundle")
+        self.assertNotIn("bundle", categories.stages)
+        self.assertNotEqual(short.path, "bundle")
+        with _engine(bundles_enabled=False):
+            _trip, disabled = self._recommend()
+        self.assertNotIn("bundle", disabled.stages)
+
+    def test_changed_places_rebuild_their_district_incrementally(self):
+        pop_dirty_districts()
+        self.near[0].rating = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            self.near[0].save()
+
+        self.assertIn(DISTRICT, cache.get(DIRTY_CACHE_KEY))
+        result = rebuild_course_bundles()
+
+        self.assertIn(DISTRICT, result["districts"])
+        self.assertTrue(CourseBundle.objects.filter(district=DISTRICT, mode=Trip.Mode.TRANSIT).exists())
+        self.assertEqual(rebuild_course_bundles()["districts"], {})
+
+    def test_modes_may_be_a_one_shot_iterable(self):
+        build_bundles(DISTRICT, [Trip.Mode.WALK])
+        build_bundles(DISTRICT, (mode for mode in [Trip.Mode.WALK]))
+
+        modes = set(CourseBundle.objects.filter(district=DISTRICT).values_list("mode", flat=True))
+        stored = CourseBundle.objects.filter(district=DISTRICT).count()
+        self.assertEqual(modes, {Trip.Mode.WALK})
+        self.assertEqual(build_bundles(DISTRICT, [Trip.Mode.WALK]), stored)
+
+    def test_concurrent_marks_are_all_queued(self):
+        pop_dirty_districts()
+        names = [f"구-{position}" for position in range(16)]
+        threads = [threading.Thread(target=mark_districts_dirty, args=([name],)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(pop_dirty_districts(), set(names))
+        self.assertEqual(pop_dirty_districts(), set())
+
+    def test_busy_queue_lock_falls_back_to_every_district(self):
+        pop_dirty_districts()
+        cache.add(DIRTY_LOCK_CACHE_KEY, 1)
+        with mock.patch("lifelog.core.cache.time.sleep"):
+            mark_districts_dirty(["다른구"])
+            self.assertEqual(pop_dirty_districts(), set())
+        cache.delete(DIRTY_LOCK_CACHE_KEY)
+
+        self.assertEqual(pop_dirty_districts(), {DISTRICT.lower()})
+
+    def test_moving_a_place_marks_both_districts(self):
+        build_bundles(DISTRICT, [Trip.Mode.WALK])
+        pop_dirty_districts()
+        moved = Place.objects.get(id=self.near[0].id)
+        moved.district = "이사간구"
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+
+        self.assertEqual(pop_dirty_districts(), {DISTRICT.lower(), "이사간구"})
+        trip, _trace = self._recommend()
+        self.assertNotIn(str(self.near[0].id), trip.summary["place_ids"])
+
+    def test_full_rebuild_clears_districts_left_without_places(self):
+        build_bundles(DISTRICT, [Trip.Mode.WALK])
+        Place.objects.filter(district=DISTRICT).update(is_active=False)
+
+        result = rebuild_course_bundles(full=True)
+
+        self.assertEqual(result["districts"][DISTRICT.lower()], 0)
+        self.assertFalse(CourseBundle.objects.filter(district=DISTRICT).exists())
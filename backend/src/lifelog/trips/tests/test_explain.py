@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from lifelog.analytics.models import DailyProductMetric
+from lifelog.places.models import Place
+from lifelog.trips.explain import RecommendationTrace, record_timings
+from lifelog.trips.services import create_recommendation
+from lifelog.trips.tasks import record_recommendation_timings
+
+
+class ExplainAPITests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(email="staff@example.com", password="StaffPass123!", is_staff=True)
+        self.member = User.objects.create_user(email="member@example.com", password="MemberPass123!")
+        Place.objects.create(name="Cafe One", category="cafe", rating=4.5, mood_scores={"calm": 0.8})
+        Place.objects.create(name="Cafe Two", category="cafe", rating=4.1)
+
+    def _post(self, user, payload):
+        self.client.force_authenticate(user)
+        return self.client.post("/api/v1/trips/recommendations/?explain=1", {**payload, "explain": True}, format="json")
+
+    def test_staff_gets_stage_timings_counts_fallbacks_and_score_breakdown(self):
+        response = self._post(self.staff, {"categories": ["museum"], "mood": ["calm"], "limit": 1, "reuse": False})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        explain = response.data["explain"]
+        self.assertEqual(explain["path"], "index")
+        self.assertLessEqual({"context", "candidates", "filters", "scoring", "selection", "route", "insert"}, set(explain["stages_ms"]))
+        steps = {entry["step"]: entry["count"] for entry in explain["candidates"]}
+        self.assertEqual(steps["matched"], 0)
+        self.assertGreaterEqual(steps["all_active"], 2)
+        self.assertIn("no_match_use_all_active", explain["fallbacks"])
+        chosen = explain["chosen"][0]
+        self.assertEqual(chosen["name"], "Cafe One")
+        self.assertAlmostEqual(sum(chosen["terms"].values()), chosen["score"], places=3)
+        self.assertEqual(chosen["terms"]["mood"], 0.8)
+
+    def test_explain_is_staff_only(self):
+        response = self._post(self.member, {"limit": 1})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_plain_requests_do_not_include_explain(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post("/api/v1/trips/recommendations/", {"limit": 1}, format="json")
+
+        self.assertNotIn("explain", response.data)
+
+
+class TimingMetricTests(TestCase):
+    def test_samples_fold_into_daily_metrics(self):
+        day = date(2026, 10, 18)
+        record_timings(day, {"total": 12.0, "scoring": 0.4})
+        record_timings(day.isoformat(), {"total": 30.0, "scoring": 0.6})
+
+        total = DailyProductMetric.objects.get(date=day, metric="recommendation.total_ms")
+        self.assertEqual(float(total.value), 21.0)
+        self.assertEqual(total.metadata["samples"], 2)
+        self.assertEqual(total.metadata["max_ms"], 30.0)
+        self.assertEqual(total.metadata["buckets"], {"20": 1, "50": 1})
+        self.assertEqual(total.metadata["p95_ms"], 50.0)
+        self.assertEqual(float(DailyProductMetric.objects.get(date=day, metric="recommendation.scoring_ms").value), 0.5)
+
+    @override_settings(RECOMMENDATION_ENGINE={"timing_sample_rate": 1.0})
+    def test_sampled_requests_are_recorded_after_commit(self):
+        Place.objects.create(name="Cafe One", category="cafe", rating=4.5)
+        with mock.patch.object(record_recommendation_timings, "delay", side_effect=record_recommendation_timings) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                create_recommendation(None, {"limit": 1})
+
+        delay.assert_called_once()
+        self.assertTrue(DailyProductMetric.objects.filter(metric="recommendation.insert_ms").exists())
+
+    @override_settings(RECOMMENDATION_ENGINE={"timing_sample_rate": 0})
+    def test_trace_is_logged_as_structured_record(self):
+        Place.objects.create(name="Cafe One", category="cafe", rating=4.5)
+        trace = RecommendationTrace()
+        with self.assertLogs("lifelog.trips.explain", level="INFO") as logs:
+            create_recommendation(None, {"limit": 1}, trace=trace)
+
+        record = logs.records[-1].recommendation
+        self.assertEqual(record["path"], "index")
+        self.assertEqual(record["candidates"][0]["step"], "matched")
+        self.assertNotIn("no_match_use_all_active", record["fallbacks"])
+        self.assertFalse(DailyProductMetric.objects.exists())
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from lifelog.places.models import Place, Tag
+from lifelog.trips.feed import build_feed, default_constraints, trip_from_feed
+from lifelog.trips.models import RecommendationFeed, Trip
+from lifelog.trips.tasks import build_recommendation_feed_chunk, build_recommendation_feeds
+from lifelog.users.models import UserPreferredTag
+
+
+class RecommendationFeedTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(email="feed@example.com", password="FeedPass123!")
+        self.user.time_budget_min = 180
+        self.user.mobility_mode = "bike"
+        self.user.save()
+        token = self.client.post(
+            "/api/auth/token/",
+            {"email": "feed@example.com", "password": "FeedPass123!"},
+            format="json",
+        ).data["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        calm = Tag.objects.create(name="calm", type=Tag.Type.MOOD)
+        UserPreferredTag.objects.create(user=self.user, tag=calm, priority=3)
+        for index in range(8):
+            place = Place.objects.create(name=f"Feed {index}", category="cafe", stay_min=40, rating=4.8 - index * 0.1)
+            place.tags.add(calm)
+
+    def test_feed_endpoint_serves_precomputed_courses_without_scoring(self):
+        build_feed(self.user)
+
+        with mock.patch("lifelog.trips.feed._select_courses") as select:
+            response = self.client.get("/api/v1/trips/feed/")
+
+        select.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["source"], "precomputed")
+        self.assertEqual(response.data["constraints"]["mode"], "bike")
+        self.assertEqual(response.data["constraints"]["tags"], ["calm"])
+        courses = response.data["courses"]
+        self.assertGreater(len(courses), 1)
+        self.assertEqual(courses[0]["places"][0]["name"], "Feed 0")
+
+    def test_stale_feed_falls_back_to_live(self):
+        feed = build_feed(self.user)
+        RecommendationFeed.objects.filter(pk=feed.pk).update(computed_at=timezone.now() - timedelta(days=3))
+
+        response = self.client.get("/api/v1/trips/feed/")
+
+        self.assertEqual(response.data["source"], "live")
+        feed.refresh_from_db()
+        self.assertGreater(feed.computed_at, timezone.now() - timedelta(minutes=1))
+
+    def test_default_request_is_materialized_from_feed(self):
+        feed = build_feed(self.user)
+
+        with mock.patch("lifelog.trips.services._select_courses") as select:
+            response = self.client.post("/api/v1/trips/recommendations/", feed.constraints, format="json")
+
+        select.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        trip = Trip.objects.get(id=response.data["id"])
+        self.assertEqual(trip.summary["source"], "feed")
+        self.assertEqual(trip.summary["place_ids"], feed.courses[0]["place_ids"])
+        self.assertEqual(trip.context_hash, feed.context_hash)
+
+    def test_seen_courses_are_skipped_until_the_feed_runs_out(self):
+        feed = build_feed(self.user)
+        self.assertGreater(len(feed.courses), 1)
+
+        served = []
+        for _course in feed.courses:
+            with self.captureOnCommitCallbacks(execute=True):
+                trip = trip_from_feed(str(self.user.id), feed.constraints)
+            served.append(trip.summary["place_ids"])
+
+        self.assertEqual(served, [course["place_ids"] for course in feed.courses])
+        self.assertIsNone(trip_from_feed(str(self.user.id), feed.constraints))
+
+    def test_batch_builds_feeds_for_recently_active_users_in_chunks(self):
+        idle = get_user_model().objects.create_user(email="idle@example.com", password="IdlePass123!")
+        Trip.objects.create(owner=self.user, context_hash="recent")
+
+        with mock.patch("lifelog.trips.tasks.build_recommendation_feed_chunk.delay") as delay:
+            result = build_recommendation_feeds(chunk_size=1)
+
+        self.assertEqual(result["users"], 1)
+        delay.assert_called_once_with([str(self.user.id)])
+
+        build_recommendation_feed_chunk([str(self.user.id), str(idle.id)])
+        self.assertEqual(RecommendationFeed.objects.get(user=self.user).constraints, default_constraints(self.user))
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from lifelog.feedback.models import Feedback
+from lifelog.places.models import Place
+from lifelog.trips.learning import _examples, get_ranking_weights, train_batch
+from lifelog.trips.models import RankingWatermark, RankingWeights, Trip, TripNode, UserPreferenceVector
+from lifelog.trips.scoring import DEFAULT_WEIGHTS, FEATURES
+from lifelog.trips.tasks import train_ranking_weights
+
+RATING, MOOD, CONGESTION = FEATURES.index("rating"), FEATURES.index("mood"), FEATURES.index("congestion")
+PREFERENCE = FEATURES.index("preference")
+# Monday 10:00 local time; the test place is packed only in that hour.
+BUSY_START = timezone.make_aware(datetime(2026, 10, 19, 10, 0))
+
+
+class RankingWeightLearningTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        User = get_user_model()
+        self.user = User.objects.create_user(email="learner@example.com", password="LearnPass123!")
+        self.other = User.objects.create_user(email="other@example.com", password="OtherPass123!")
+        self.place = Place.objects.create(name="Moody Bar", category="bar", rating=4.5, mood_scores={"calm": 0.9})
+
+    def _feedback(self, user, rating, count=1):
+        for _ in range(count):
+            trip = Trip.objects.create(owner=user, context_hash="learn", inputs={"mood": ["calm"]})
+            node = TripNode.objects.create(trip=trip, place=self.place, sequence=1)
+            Feedback.objects.create(trip=trip, trip_node=node, user=user, rating=rating)
+
+    def test_defaults_until_trained(self):
+        self.assertEqual(get_ranking_weights(), DEFAULT_WEIGHTS)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_ranking_weights(), DEFAULT_WEIGHTS)
+
+    def test_bad_feedback_lowers_weights_of_the_terms_that_ranked_the_place(self):
+        self._feedback(self.user, Feedback.Rating.BAD, count=30)
+
+        result = train_ranking_weights(batch_size=8)
+
+        self.assertEqual(result["feedback"], 30)
+        personal = get_ranking_weights(self.user.id)
+        self.assertLess(personal[RATING], 1.0)
+        self.assertLess(personal[MOOD], 1.0)
+        self.assertLess(personal[RATING], get_ranking_weights()[RATING])
+        self.assertEqual(RankingWeights.objects.get(user=self.user).samples, 30)
+        self.assertEqual(RankingWeights.objects.get(user__isnull=True).samples, 30)
+
+    def test_batches_resume_after_watermark(self):
+        self._feedback(self.user, Feedback.Rating.GOOD, count=3)
+        self.assertEqual(train_batch(2), 2)
+        self.assertEqual(train_batch(2), 1)
+        self.assertEqual(train_batch(2), 0)
+        self.assertEqual(RankingWeights.objects.get(user__isnull=True).samples, 3)
+
+        self._feedback(self.other, Feedback.Rating.GOOD)
+        self.assertEqual(train_batch(2), 1)
+        last = Feedback.objects.get(user=self.other)
+        self.assertEqual(RankingWatermark.objects.get().last_feedback_id, last.id)
+        self.assertEqual(RankingWeights.objects.get(user=self.other).samples, 1)
+
+    def test_published_weights_are_served_from_cache(self):
+        self._feedback(self.user, Feedback.Rating.GOOD, count=2)
+        train_batch()
+
+        with self.assertNumQueries(0):
+            weights = get_ranking_weights(self.user.id)
+        self.assertNotEqual(weights, DEFAULT_WEIGHTS)
+
+    def test_examples_look_up_congestion_at_the_planned_start(self):
+        profile = bytearray(168)
+        profile[10] = 255
+        self.place.congestion_profile = bytes(profile)
+        self.place.save()
+        planned = Trip.objects.create(owner=self.user, context_hash="learn", inputs={"start_at": BUSY_START.isoformat()})
+        Feedback.objects.create(trip=planned, user=self.user, rating=Feedback.Rating.GOOD)
+        TripNode.objects.create(trip=planned, place=self.place, sequence=1)
+        arrived = Trip.objects.create(owner=self.user, context_hash="learn", inputs={})
+        node = TripNode.objects.create(trip=arrived, place=self.place, sequence=1, eta=BUSY_START)
+        Feedback.objects.create(trip=arrived, trip_node=node, user=self.user, rating=Feedback.Rating.GOOD)
+
+        for feedback in Feedback.objects.select_related("trip", "trip_node__place"):
+            (terms, _target), = _examples(feedback)
+            # 90 minutes from 10:00 touch the busy hour and the empty one after it.
+            self.assertAlmostEqual(terms[CONGESTION], -0.25)
+
+    def test_preference_term_is_trained_with_the_users_vector(self):
+        UserPreferenceVector.objects.create(user=self.user, vector={"mood:calm": 1.0})
+        self._feedback(self.user, Feedback.Rating.GOOD, count=5)
+        self._feedback(self.other, Feedback.Rating.GOOD, count=5)
+
+        train_batch()
+
+        personal = RankingWeights.objects.get(user=self.user).weights
+        self.assertGreater(personal[PREFERENCE], 0)
+        self.assertEqual(RankingWeights.objects.get(user=self.other).weights[PREFERENCE], 0)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import itertools
+import time
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from lifelog.places.models import Place
+from lifelog.trips.packing import knapsack
+from lifelog.trips.services import create_recommendation
+
+
+class KnapsackTests(SimpleTestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        for _case in range(20):
+            scores = rng.uniform(0, 2, 9)
+            costs = rng.choice([15, 30, 45, 60, 90], 9).astype(float)
+            best = max(
+                (scores[list(combo)].sum(), combo)
+                for stops in range(1, 4)
+                for combo in itertools.combinations(range(9), stops)
+                if costs[list(combo)].sum() <= 120
+            )[0]
+
+            picked = knapsack(scores, costs, 120, 3)
+
+            self.assertLessEqual(len(picked), 3)
+            self.assertLessEqual(costs[picked].sum(), 120)
+            self.assertAlmostEqual(scores[picked].sum(), best)
+
+    def test_gives_up_after_deadline(self):
+        self.assertIsNone(knapsack(np.ones(50), np.full(50, 30.0), 240, 5, deadline=time.perf_counter() - 1))
+
+    def test_nothing_fits(self):
+        self.assertIsNone(knapsack(np.ones(3), np.full(3, 200.0), 120, 3))
+
+    def test_table_is_sized_by_the_candidates_not_the_budget(self):
+        scores = np.linspace(2, 1, 200)
+        costs = np.full(200, 60.0)
+
+        tracemalloc.start()
+        try:
+            picked = knapsack(scores, costs, 600_000, 5)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(picked, [0, 1, 2, 3, 4])
+        self.assertLess(peak, 2_000_000)
+
+
+class PackingRecommendationTests(TestCase):
+    def setUp(self):
+        # The best place alone eats the whole budget; two slightly weaker short stops score more together.
+        Place.objects.create(name="Long", category="cafe", stay_min=110, rating=5.0)
+        Place.objects.create(name="Short A", category="cafe", stay_min=50, rating=4.6)
+        Place.objects.create(name="Short B", category="cafe", stay_min=50, rating=4.5)
+
+    def _names(self):
+        trip = create_recommendation(None, {"categories": ["cafe"], "time_budget_min": 120, "limit": 3})
+        return [node.place.name for node in trip.nodes.order_by("sequence")]
+
+    def test_knapsack_packs_more_score_into_budget(self):
+        self.assertEqual(sorted(self._names()), ["Short A", "Short B"])
+
+    @override_settings(RECOMMENDATION_ENGINE={"packing": "greedy"})
+    def test_greedy_fallback_takes_best_first(self):
+        self.assertEqual(self._names(), ["Long"])
+
+    @override_settings(RECOMMENDATION_ENGINE={"packing_budget_ms": 0})
+    def test_deadline_falls_back_to_greedy(self):
+        self.assertEqual(self._names(), ["Long"])
+
+    def test_benchmark_command_reports_each_size(self):
+        out = StringIO()
+        call_command("benchmark_packing", sizes="20,50", runs=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]], ["20", "50"])
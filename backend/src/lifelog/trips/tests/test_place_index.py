@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import numpy as np
+from django.test import TestCase
+
+from lifelog.places.models import Place, Tag
+from lifelog.trips.index import _current_version, get_place_index, rebuild_place_index
+from lifelog.trips.services import _prepare_context, _select_places, _select_places_from_db
+
+
+class PlaceIndexTests(TestCase):
+    def setUp(self):
+        self.calm = Tag.objects.create(name="calm", type=Tag.Type.MOOD)
+        self.study = Tag.objects.create(name="study", type=Tag.Type.MOOD)
+        self.places = []
+        for index, (category, district, cost_band, stay) in enumerate(
+            [
+                ("cafe", "수원 팔달구", "8000-12000", 45),
+                ("cafe", "수원 팔달구", "25000", 75),
+                ("culture", "수원 장안구", "무료", 40),
+                ("cafe", "수원 장안구", "cheap", 30),
+                ("library", "수원 팔달구", "", 120),
+                ("culture", "수원 영통구", "premium", 90),
+            ]
+        ):
+            place = Place.objects.create(
+                name=f"Place {index}",
+                category=category,
+                district=district,
+                cost_band=cost_band,
+                stay_min=stay,
+                mood_scores={"calm": round(0.15 * index, 2), "focus": round(0.9 - 0.1 * index, 2)},
+                rating=3.5 + index * 0.17,
+            )
+            place.tags.add(self.calm if index % 2 else self.study)
+            self.places.append(place)
+
+    def assertSameSelection(self, constraints):
+        ctx = _prepare_context(constraints)
+        self.assertEqual(_select_places(ctx), _select_places_from_db(ctx))
+
+    def test_matches_database_path(self):
+        for constraints in [
+            {},
+            {"categories": ["cafe"], "mood": ["calm"], "limit": 3, "time_budget_min": 180},
+            {"tags": ["study"], "budget_max": 15000, "limit": 4},
+            {"district": "수원 팔달구", "budget_min": 20000, "budget_max": 40000, "mood": ["focus"]},
+            {"categories": ["museum"], "time_budget_min": 60},
+            {"skip_place_ids": [str(self.places[5].id)], "budget_max": 30000, "limit": 5},
+        ]:
+            with self.subTest(constraints=constraints):
+                self.assertSameSelection(constraints)
+
+    def test_index_follows_place_and_tag_changes(self):
+        ctx = _prepare_context({"tags": ["calm"], "limit": 10, "time_budget_min": 600})
+        self.assertNotIn(self.places[0], _select_places(ctx))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.places[0].tags.add(self.calm)
+        self.assertIn(self.places[0], _select_places(ctx))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.places[0].delete()
+        self.assertNotIn(self.places[0], _select_places(ctx))
+        self.assertNotIn(str(self.places[0].id), get_place_index().row_of)
+
+        self.places[1].rating = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.places[1].save()
+        index = get_place_index()
+        self.assertEqual(index.rating[index.row_of[str(self.places[1].id)]], 1.0)
+
+    def test_changes_are_published_only_on_commit(self):
+        version = _current_version()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.places[0].rating = 1
+            self.places[0].save()
+        self.assertEqual(_current_version(), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(_current_version(), version)
+
+    def test_drops_rows_missing_from_database(self):
+        index = get_place_index()
+        Place.objects.filter(id=self.places[3].id).update(is_active=False)
+        self.assertIn(str(self.places[3].id), index.row_of)
+
+        selected = _select_places(_prepare_context({"categories": ["cafe"], "limit": 10, "time_budget_min": 600}))
+
+        self.assertNotIn(self.places[3], selected)
+        self.assertNotIn(str(self.places[3].id), get_place_index().row_of)
+        # The snapshot a reader already holds is never changed underneath it.
+        self.assertIn(str(self.places[3].id), index.row_of)
+
+    def test_refresh_swaps_snapshots_without_touching_held_ones(self):
+        held = get_place_index()
+        columns = {name: value.copy() for name, value in vars(held).items() if isinstance(value, np.ndarray)}
+        ids = list(held.ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.places[1].rating = 1
+            self.places[1].save()
+            Place.objects.create(name="Late", category="cafe", rating=4)
+        fresh = get_place_index()
+        rebuilt = rebuild_place_index()
+
+        self.assertIsNot(fresh, held)
+        self.assertIsNot(rebuilt, fresh)
+        self.assertEqual(held.ids, ids)
+        for name, value in columns.items():
+            self.assertTrue(np.array_equal(getattr(held, name), value, equal_nan=True), name)
+        self.assertEqual(fresh.rating[fresh.row_of[str(self.places[1].id)]], 1.0)
+        self.assertEqual(fresh.size, held.size + 2)
+
+    def test_origin_limits_candidates_to_reachable_places(self):
+        origin = (37.2663, 127.0001)
+        self.places[0].location = {"type": "Point", "coordinates": [origin[1] + 0.002, origin[0]]}
+        self.places[0].save()
+        self.places[2].location = {"type": "Point", "coordinates": [origin[1], origin[0] + 0.03]}
+        self.places[2].save()
+
+        constraints = {"origin_lat": origin[0], "origin_lng": origin[1], "limit": 5, "time_budget_min": 600}
+        ctx = _prepare_context(constraints)
+        self.assertEqual(_select_places(ctx), [self.places[0]])
+        self.assertSameSelection(constraints)
+
+        driving = _prepare_context({**constraints, "mode": "drive"})
+        self.assertEqual(set(_select_places(driving)), {self.places[0], self.places[2]})
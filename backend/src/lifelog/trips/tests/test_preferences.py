@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from lifelog.feedback.models import Feedback
+from lifelog.places.models import FavoritePlace, Place, Tag
+from lifelog.trips.models import Trip, TripNode, UserPreferenceVector
+from lifelog.trips.preferences import build_vector, get_preference_vector, refresh_vector
+from lifelog.trips.services import create_recommendation
+from lifelog.trips.tasks import refresh_preference_vector
+from lifelog.users.models import UserPreferredTag
+
+
+class PreferenceVectorTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="taste@example.com", password="TastePass123!")
+        self.quiet = Tag.objects.create(name="quiet")
+        self.loud = Tag.objects.create(name="loud")
+        self.library = Place.objects.create(name="Library", category="culture", rating=4.0, mood_scores={"calm": 0.9})
+        self.library.tags.add(self.quiet)
+        self.club = Place.objects.create(name="Club", category="bar", rating=4.3, mood_scores={"lively": 0.9})
+        self.club.tags.add(self.loud)
+
+    def test_vector_combines_preferred_tags_favorites_and_feedback(self):
+        UserPreferredTag.objects.create(user=self.user, tag=self.quiet, priority=2)
+        FavoritePlace.objects.create(user=self.user, place=self.library)
+        trip = Trip.objects.create(owner=self.user, context_hash="taste")
+        node = TripNode.objects.create(trip=trip, place=self.club, sequence=1)
+        Feedback.objects.create(trip=trip, trip_node=node, user=self.user, rating=Feedback.Rating.BAD)
+
+        vector = build_vector(self.user.id)
+
+        self.assertEqual(list(vector), sorted(vector))
+        self.assertAlmostEqual(sum(value * value for value in vector.values()), 1.0)
+        self.assertGreater(vector["tag:quiet"], vector["mood:calm"])
+        self.assertGreater(vector["mood:calm"], 0)
+        self.assertLess(vector["tag:loud"], 0)
+        self.assertLess(vector["mood:lively"], 0)
+
+    def test_changes_refresh_the_cached_vector(self):
+        self.assertIsNone(get_preference_vector(self.user.id))
+        with mock.patch.object(refresh_preference_vector, "delay", side_effect=refresh_preference_vector):
+            with self.captureOnCommitCallbacks(execute=True):
+                preferred = UserPreferredTag.objects.create(user=self.user, tag=self.quiet)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_preference_vector(self.user.id), {"tag:quiet": 1.0})
+        self.assertEqual(UserPreferenceVector.objects.get(user=self.user).vector, {"tag:quiet": 1.0})
+
+        with mock.patch.object(refresh_preference_vector, "delay", side_effect=refresh_preference_vector):
+            with self.captureOnCommitCallbacks(execute=True):
+                preferred.delete()
+        self.assertIsNone(get_preference_vector(self.user.id))
+
+    def test_preferences_steer_recommendations(self):
+        constraints = {"limit": 1, "time_budget_min": 60}
+        self.assertEqual(create_recommendation(self.user.id, constraints).nodes.get().place, self.club)
+
+        UserPreferredTag.objects.create(user=self.user, tag=self.quiet)
+        refresh_vector(self.user.id)
+
+        self.assertEqual(create_recommendation(self.user.id, constraints).nodes.get().place, self.library)
+
+    @override_settings(RECOMMENDATION_ENGINE={"preference_top_n": 1, "place_index_enabled": False})
+    def test_database_path_retrieves_most_similar_places(self):
+        FavoritePlace.objects.create(user=self.user, place=self.library)
+        refresh_vector(self.user.id)
+        Place.objects.create(name="Archive", category="culture", rating=5.0, mood_scores={"calm": 0.2})
+
+        trip = create_recommendation(self.user.id, {"limit": 2, "time_budget_min": 60})
+
+        self.assertEqual([node.place for node in trip.nodes.all()], [self.library])
+
+    def test_retrieval_ties_go_to_better_rated_places(self):
+        FavoritePlace.objects.create(user=self.user, place=self.library)
+        refresh_vector(self.user.id)
+        # Neither shares anything with the vector; only rating should decide between them.
+        Place.objects.create(name="Aquarium", category="culture", rating=2.0)
+        Place.objects.create(name="Zoo", category="culture", rating=5.0)
+
+        for index_enabled in (True, False):
+            with self.subTest(index_enabled=index_enabled):
+                with override_settings(RECOMMENDATION_ENGINE={"preference_top_n": 2, "place_index_enabled": index_enabled}):
+                    trip = create_recommendation(self.user.id, {"limit": 2, "time_budget_min": 120, "reuse": False})
+                self.assertEqual({node.place.name for node in trip.nodes.all()}, {"Library", "Zoo"})
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from lifelog.core.clients.openrouter import OpenRouterConfigurationError, OpenRouterError
+from lifelog.places.models import Place
+from lifelog.trips.models import TripRecommendationJob
+from lifelog.trips.query import QueryCache, get_query_cache, normalize_query, parse_query, parse_rules
+from lifelog.trips.tasks import run_recommendation_job
+
+
+class QueryParserTests(SimpleTestCase):
+    def setUp(self):
+        get_query_cache().clear()
+        self.addCleanup(get_query_cache().clear)
+
+    def test_rules_parse_spec_example(self):
+        constraints, understood = parse_rules("조용+햇빛 좋은 자리에서 2시간 공부하고, 1만원대로 디저트")
+
+        self.assertTrue(understood)
+        self.assertEqual(constraints["time_budget_min"], 120)
+        self.assertEqual((constraints["budget_min"], constraints["budget_max"]), (10000, 19999))
+        self.assertEqual(constraints["mood"], ["calm", "sunny", "focus"])
+        self.assertIn("cafe", constraints["categories"])
+
+    def test_rules_parse_durations_budgets_and_modes(self):
+        self.assertEqual(parse_rules("도서관 1시간 반, 3만원 이하")[0], {"time_budget_min": 90, "budget_max": 30000, "categories": ["library"]})
+        self.assertEqual(parse_rules("자전거로 반나절")[0], {"time_budget_min": 240, "mode": "bike"})
+        self.assertEqual(parse_rules("5천원 이상 Quiet cafe 45분")[0]["budget_min"], 5000)
+
+    def test_near_identical_queries_share_a_cache_entry(self):
+        self.assertEqual(normalize_query("조용한  카페, 2시간!"), normalize_query("조용한 카페 2시간"))
+        self.assertEqual(normalize_query("ＣＡＦＥ 2시간"), normalize_query("cafe, 2시간"))
+        self.assertNotEqual(normalize_query("카페 말고 공원"), normalize_query("공원 말고 카페"))
+
+    @mock.patch("lifelog.trips.query.OpenRouterClient")
+    def test_llm_only_for_unparsed_text_and_answers_are_cached(self, client_cls):
+        client_cls.return_value.complete_json.return_value = {"mood": ["calm", "spooky"], "time_budget_min": 5, "mode": "drive"}
+
+        self.assertEqual(parse_query("카페 2시간")["categories"], ["cafe"])
+        client_cls.assert_not_called()
+
+        first = parse_query("비 오는 날 갈만한 곳")
+        second = parse_query("비 오는 날, 갈만한 곳!")
+
+        self.assertEqual(first, {"mood": ["calm"], "time_budget_min": 15, "mode": "drive"})
+        self.assertEqual(second, first)
+        self.assertEqual(client_cls.return_value.complete_json.call_count, 1)
+
+    @mock.patch("lifelog.trips.query.OpenRouterClient", side_effect=OpenRouterConfigurationError("missing"))
+    def test_unconfigured_llm_keeps_rule_result(self, _client_cls):
+        self.assertEqual(parse_query("비 오는 날 카페"), {"categories": ["cafe"]})
+
+    @mock.patch("lifelog.trips.query.OpenRouterClient")
+    def test_failed_llm_answer_is_not_cached(self, client_cls):
+        client_cls.return_value.complete_json.side_effect = [OpenRouterError("timeout"), {"mood": ["calm"]}]
+
+        with self.assertLogs("lifelog.trips.query", "WARNING"):
+            self.assertEqual(parse_query("비 오는 날 카페"), {"categories": ["cafe"]})
+        self.assertEqual(parse_query("비 오는 날 카페"), {"mood": ["calm"], "categories": ["cafe"]})
+        self.assertEqual(parse_query("비 오는 날 카페"), {"mood": ["calm"], "categories": ["cafe"]})
+        self.assertEqual(client_cls.return_value.complete_json.call_count, 2)
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = QueryCache(2)
+        cache.put("a", {"limit": 1})
+        cache.put("b", {"limit": 2})
+        cache.get("a")
+        cache.put("c", {"limit": 3})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"limit": 1})
+        self.assertEqual(len(cache), 2)
+
+
+class QueryRecommendationAPITests(APITestCase):
+    def setUp(self):
+        get_query_cache().clear()
+        self.addCleanup(get_query_cache().clear)
+        user = get_user_model().objects.create_user(email="query@example.com", password="QueryPass123!")
+        self.client.force_authenticate(user)
+        Place.objects.create(name="Busy Cafe", category="cafe", rating=4.9, mood_scores={"vibrant": 0.9})
+        self.quiet = Place.objects.create(name="Quiet Cafe", category="cafe", rating=4.2, mood_scores={"calm": 0.9})
+        Place.objects.create(name="Quiet Park", category="park", rating=4.8, mood_scores={"calm": 1.0})
+
+    def test_free_text_query_becomes_constraints(self):
+        response = self.client.post("/api/v1/trips/recommendations/", {"q": "조용한 카페 1시간", "limit": 1}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["nodes"][0]["place"], self.quiet.id)
+        self.assertEqual(response.data["inputs"]["categories"], ["cafe"])
+        self.assertEqual(response.data["inputs"]["mood"], ["calm"])
+        self.assertEqual(response.data["duration_min"], 60)
+
+    def test_explicit_fields_override_the_query(self):
+        payload = {"q": "조용한 카페 1시간", "categories": ["park"], "limit": 1}
+        response = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["nodes"][0]["place_name"], "Quiet Park")
+
+    def test_async_request_parses_the_query_in_the_job(self):
+        payload = {"q": "조용한 카페 1시간", "async": True}
+        delay_patch = mock.patch("lifelog.trips.views.run_recommendation_job.delay")
+        parse_patch = mock.patch("lifelog.trips.query.parse_query", wraps=parse_query)
+        with delay_patch as delay, parse_patch as parse:
+            response = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+            parse.assert_not_called()
+
+            job = TripRecommendationJob.objects.get(id=response.data["id"])
+            self.assertEqual(job.constraints["q"], "조용한 카페 1시간")
+            self.assertNotIn("categories", job.constraints)
+            run_recommendation_job(str(job.id))
+
+        delay.assert_called_once()
+        parse.assert_called_once()
+        job.refresh_from_db()
+        self.assertEqual(job.trip.inputs["categories"], ["cafe"])
@@ -1,10 +1,12 @@
 ﻿from __future__ import annotations
 
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from lifelog.places.models import Place, Tag
+from lifelog.trips.models import Trip
 
 
 class TripRecommendationAPITests(APITestCase):
@@ -49,3 +51,46 @@ class TripRecommendationAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["error"], "no_places_available")
 
+    def test_time_budget_is_capped_at_a_day(self):
+        response = self.client.post("/api/v1/trips/recommendations/", {"time_budget_min": 600_000}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("time_budget_min", str(response.data))
+
+
+    def test_identical_request_reuses_recent_trip(self):
+        payload = {"categories": ["cafe"], "limit": 2, "time_budget_min": 150}
+        first = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+        second = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first["X-Recommendation-Cache"], "miss")
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second["X-Recommendation-Cache"], "hit")
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(Trip.objects.filter(owner=self.user).count(), 1)
+
+        fresh = self.client.post("/api/v1/trips/recommendations/", {**payload, "reuse": False}, format="json")
+        self.assertEqual(fresh["X-Recommendation-Cache"], "miss")
+        self.assertNotEqual(fresh.data["id"], first.data["id"])
+
+    def test_reuse_skips_trips_with_inactive_places(self):
+        payload = {"categories": ["cafe"], "limit": 2, "skip_place_ids": [str(self.place2.id)]}
+        first = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Place.objects.create(name="Cafe Three", category="cafe", rating=4.0)
+            self.place1.is_active = False
+            self.place1.save()
+        second = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+
+        self.assertEqual(second["X-Recommendation-Cache"], "miss")
+        self.assertNotEqual(second.data["id"], first.data["id"])
+
+    @override_settings(RECOMMENDATION_ENGINE={"reuse_window_sec": 0})
+    def test_reuse_window_zero_disables_reuse(self):
+        payload = {"categories": ["cafe"], "limit": 2}
+        self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+        second = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
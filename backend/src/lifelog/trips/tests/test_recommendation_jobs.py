@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from lifelog.places.models import Place
+from lifelog.trips.models import TripRecommendationJob
+from lifelog.trips.tasks import run_recommendation_job
+
+
+class TripRecommendationJobAPITests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(email="async@example.com", password="AsyncPass123!")
+        token_response = self.client.post(
+            "/api/auth/token/",
+            {"email": "async@example.com", "password": "AsyncPass123!"},
+            format="json",
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token_response.data['access']}")
+        self.delay_patcher = mock.patch("lifelog.trips.views.run_recommendation_job.delay")
+        self.mock_delay = self.delay_patcher.start()
+        self.addCleanup(self.delay_patcher.stop)
+
+        self.place = Place.objects.create(name="Async Cafe", category="cafe", rating=4.5)
+
+    def test_async_request_returns_job_and_result_after_task(self):
+        payload = {"categories": ["cafe"], "skip_place_ids": [], "async": True}
+        response = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data["id"]
+        self.assertEqual(response.data["status"], TripRecommendationJob.Status.QUEUED)
+        self.assertEqual(response["Location"], f"/api/v1/trip-recommendation-jobs/{job_id}/")
+        self.assertEqual(response["Retry-After"], "2")
+        self.mock_delay.assert_called_once_with(job_id)
+        self.assertNotIn("async", TripRecommendationJob.objects.get(id=job_id).constraints)
+
+        result = run_recommendation_job(job_id)
+        self.assertEqual(result["status"], "completed")
+
+        detail = self.client.get(f"/api/v1/trip-recommendation-jobs/{job_id}/")
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Retry-After", detail)
+        self.assertEqual(detail.data["status"], TripRecommendationJob.Status.COMPLETED)
+        self.assertEqual(detail.data["trip"]["nodes"][0]["place"], self.place.id)
+
+    def test_pending_job_is_answered_at_once_with_retry_after(self):
+        job = TripRecommendationJob.objects.create(requested_by=self.user, constraints={})
+
+        with mock.patch("time.sleep") as sleep, self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/trip-recommendation-jobs/{job.id}/", {"wait": 25})
+
+        sleep.assert_not_called()
+        self.assertEqual(response.data["status"], TripRecommendationJob.Status.QUEUED)
+        self.assertEqual(response["Retry-After"], "2")
+
+    def test_failed_job_reports_error(self):
+        job = TripRecommendationJob.objects.create(requested_by=self.user, constraints={"categories": ["museum"]})
+        self.place.delete()
+
+        run_recommendation_job(str(job.id))
+
+        response = self.client.get(f"/api/v1/trip-recommendation-jobs/{job.id}/")
+        self.assertEqual(response.data["status"], TripRecommendationJob.Status.FAILED)
+        self.assertEqual(response.data["error_code"], "no_places_available")
+
+    def test_jobs_are_private_to_requester(self):
+        other = get_user_model().objects.create_user(email="someone@example.com", password="OtherPass123!")
+        job = TripRecommendationJob.objects.create(requested_by=other, constraints={})
+
+        response = self.client.get(f"/api/v1/trip-recommendation-jobs/{job.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from lifelog.places.models import Place
+from lifelog.trips.management.commands.replay_recommendations import export_cases
+from lifelog.trips.models import Trip
+from lifelog.trips.services import create_recommendation
+from lifelog.trips.shadow import compare_courses
+
+
+class ReplayRecommendationsCommandTests(TestCase):
+    def setUp(self):
+        self.places = [
+            Place.objects.create(name=f"Replay {position}", category="cafe", rating=4.9 - position / 10, stay_min=30)
+            for position in range(6)
+        ]
+        self.first = create_recommendation(None, {"categories": ["cafe"], "limit": 2})
+        self.second = create_recommendation(None, {"categories": ["cafe"], "limit": 2, "alternatives": 2})
+
+    def test_export_skips_alternative_siblings(self):
+        cases = export_cases(limit=10, days=1, seed=1)
+
+        self.assertEqual(Trip.objects.count(), 3)
+        self.assertEqual({case["trip_id"] for case in cases}, {str(self.first.id), str(self.second.id)})
+        self.assertEqual(cases[0]["inputs"]["limit"], 2)
+
+    def test_replays_an_exported_sample_and_reports_drift(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sample = Path(directory) / "sample.jsonl"
+            output = Path(directory) / "replay.json"
+            call_command("replay_recommendations", days=1, export=str(sample), stdout=StringIO())
+            Place.objects.filter(id=self.places[0].id).update(is_active=False)
+
+            call_command("replay_recommendations", input=str(sample), runs=2, output=str(output), details=True, stdout=StringIO())
+            report = json.loads(output.read_text(encoding="utf-8"))
+
+        self.assertEqual(report["meta"]["cases"], 2)
+        self.assertEqual(report["diff"]["compared"], 2)
+        self.assertEqual(report["diff"]["identical"], 0)
+        self.assertEqual(report["diff"]["mean_jaccard"], round(1 / 3, 4))
+        self.assertEqual(set(report["latency"]), {"select", "create"})
+        self.assertGreater(report["latency"]["create"]["queries"], report["latency"]["select"]["queries"])
+        self.assertTrue(all(str(self.places[0].id) not in case["place_ids"] for case in report["cases"]))
+        self.assertEqual(Trip.objects.count(), 3)
+
+    def test_compare(self):
+        self.assertEqual(
+            compare_courses(["a", "b"], ["b", "a"]),
+            {"identical": False, "same_places": True, "same_first": False, "jaccard": 1.0},
+        )
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import itertools
+import random
+
+from django.test import SimpleTestCase, TestCase
+
+from lifelog.places.geo import haversine_m
+from lifelog.places.models import Place
+from lifelog.trips.route import plan_route
+from lifelog.trips.services import create_recommendation
+from lifelog.trips.travel import travel_minutes
+
+
+def _route_minutes(points, order, mode, origin=None):
+    stops = ([origin] if origin else []) + [points[i] for i in order]
+    return sum(travel_minutes(haversine_m(*a, *b), mode) for a, b in zip(stops, stops[1:]))
+
+
+class PlanRouteTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = [(37.26 + rng.random() * 0.03, 127.0 + rng.random() * 0.03) for _ in range(10)]
+
+    def test_exact_solver_matches_brute_force(self):
+        points = self.points[:6]
+        origin = (37.25, 127.0)
+        plan = plan_route(points, "walk", origin=origin)
+        best = min(
+            _route_minutes(points, order, "walk", origin) for order in itertools.permutations(range(len(points)))
+        )
+        self.assertEqual(plan.solver, "exact")
+        self.assertAlmostEqual(plan.total_travel_min, best, places=6)
+        self.assertAlmostEqual(_route_minutes(points, plan.order, "walk", origin), best, places=6)
+
+    def test_heuristic_for_many_stops_beats_input_order(self):
+        plan = plan_route(self.points, "walk", budget_ms=20)
+        self.assertEqual(plan.solver, "heuristic")
+        self.assertEqual(sorted(plan.order), list(range(len(self.points))))
+        self.assertIsNone(plan.legs_min[0])
+        self.assertLessEqual(plan.total_travel_min, _route_minutes(self.points, range(len(self.points)), "walk"))
+
+    def test_stops_without_coordinates_are_kept(self):
+        plan = plan_route([None, (37.26, 127.0), None], "walk")
+        self.assertEqual(sorted(plan.order), [0, 1, 2])
+        self.assertEqual(plan.total_travel_min, 0)
+
+
+class RouteOrderingServiceTests(TestCase):
+    def test_recommendation_orders_stops_and_fills_eta(self):
+        # Ratings put the far place between the two near ones.
+        for name, lat, rating in [("A", 37.260, 4.9), ("Far", 37.290, 4.8), ("B", 37.261, 4.7)]:
+            Place.objects.create(
+                name=name,
+                category="cafe",
+                stay_min=30,
+                rating=rating,
+                location={"type": "Point", "coordinates": [127.0, lat]},
+            )
+
+        trip = create_recommendation(None, {"limit": 3, "time_budget_min": 600, "mode": "drive"})
+        nodes = list(trip.nodes.select_related("place"))
+
+        self.assertEqual([node.place.name for node in nodes][1], "B")
+        self.assertEqual(trip.summary["route"]["solver"], "exact")
+        self.assertNotIn("travel_min", nodes[0].notes)
+        self.assertGreater(nodes[1].notes["travel_min"], 0)
+        etas = [node.eta for node in nodes]
+        self.assertTrue(all(etas))
+        self.assertEqual(etas, sorted(etas))
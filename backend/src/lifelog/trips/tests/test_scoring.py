@@ -0,0 +1,166 @@
+﻿from __future__ import annotations
+
+import random
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from lifelog.places.models import Place, Tag
+from lifelog.trips.index import get_place_index
+from lifelog.trips.parallel import score_top_rows
+from lifelog.trips.scoring import CandidateArrays, rank, score_arrays, score_places, score_rows, score_terms
+from lifelog.trips.services import _prepare_context, _score_place, _select_courses
+
+COST_BANDS = ["8000-12000", "25000", "무료", "cheap", "premium", "", "5000~9000", "moderate"]
+DISTRICTS = ["수원 팔달구", "수원 장안구", "Downtown", ""]
+CONSTRAINTS = [
+    {},
+    {"mood": ["calm"], "limit": 2},
+    {"mood": ["calm", "focus", "unknown"], "district": "수원 팔달구", "time_budget_min": 150},
+    {"budget_max": 15000, "district": "downtown", "limit": 4},
+    {"budget_min": 20000, "mood": ["focus"], "time_budget_min": 45, "limit": 1},
+    {"budget_min": 5000, "budget_max": 30000, "time_budget_min": 240, "limit": 6},
+    {"mood": ["calm"], "time_budget_min": 180, "start_at": "2026-10-24T22:30:00+09:00"},
+]
+
+
+def _random_places(rng: random.Random, count: int) -> list[Place]:
+    places = [
+        Place(
+            name=f"Place {position}",
+            category=rng.choice(["cafe", "culture", "library"]),
+            district=rng.choice(DISTRICTS),
+            cost_band=rng.choice(COST_BANDS),
+            stay_min=rng.choice([0, 20, 45, 60, 90, 150]),
+            mood_scores={key: round(rng.random(), 2) for key in rng.sample(["calm", "focus", "sunny"], rng.randint(0, 3))},
+            rating=round(rng.uniform(0, 5), 2),
+        )
+        for position in range(count)
+    ]
+    for place in places:
+        place.sync_budget_fields()
+        if rng.random() < 0.5:
+            place.congestion_profile = bytes(rng.randrange(256) for _ in range(168))
+    return places
+
+
+class ScoringKernelParityTests(SimpleTestCase):
+    def test_batch_scores_match_per_place_scorer(self):
+        places = _random_places(random.Random(7), 300)
+        for constraints in CONSTRAINTS:
+            ctx = _prepare_context(constraints)
+            with self.subTest(constraints=constraints):
+                expected = [_score_place(place, ctx) for place in places]
+                scores = score_places(places, ctx)
+                self.assertEqual(scores.tolist(), expected)
+                ranked = [places[position] for position in rank(scores)]
+                self.assertEqual(ranked, sorted(places, key=lambda place: _score_place(place, ctx), reverse=True))
+
+    def test_scores_fifty_thousand_candidates_in_one_batch(self):
+        # Latency is measured by the benchmark_scoring command, not asserted here.
+        rng = np.random.default_rng(3)
+        size = 50_000
+        arrays = CandidateArrays(
+            rating=rng.uniform(0, 5, size),
+            mood=rng.uniform(0, 1, (size, 2)),
+            district_match=rng.random(size) < 0.2,
+            cost_low=rng.integers(-1, 20000, size),
+            cost_high=rng.integers(20000, 40000, size),
+            stay_min=rng.integers(0, 180, size),
+            congestion=rng.uniform(0, 1, size),
+            preference=rng.uniform(-1, 1, size),
+        )
+        ctx = _prepare_context({"mood": ["calm", "focus"], "district": "a", "budget_max": 15000, "time_budget_min": 120})
+        with mock.patch("lifelog.trips.scoring.score_terms", wraps=score_terms) as terms:
+            scores = score_arrays(arrays, ctx)
+
+        terms.assert_called_once()
+        self.assertEqual(scores.shape, (size,))
+        halves = [
+            CandidateArrays(**{name: column[part] for name, column in vars(arrays).items()})
+            for part in (slice(None, size // 2), slice(size // 2, None))
+        ]
+        np.testing.assert_array_equal(scores, np.concatenate([score_arrays(half, ctx) for half in halves]))
+
+
+class IndexScoringParityTests(TestCase):
+    def test_index_rows_match_per_place_scorer(self):
+        places = _random_places(random.Random(11), 60)
+        for place in places:
+            place.save()
+        index = get_place_index()
+        rows = np.array([index.row_of[str(place.id)] for place in places])
+        for constraints in CONSTRAINTS:
+            ctx = _prepare_context(constraints)
+            with self.subTest(constraints=constraints):
+                self.assertEqual(score_rows(index, rows, ctx).tolist(), [_score_place(place, ctx) for place in places])
+
+    def test_preference_similarity_matches_per_place_scorer(self):
+        rng = random.Random(5)
+        places = _random_places(rng, 60)
+        tags = [Tag.objects.create(name=name) for name in ("quiet", "view", "books", "late")]
+        for place in places:
+            place.save()
+            place.tags.set(rng.sample(tags, rng.randint(0, 3)))
+        index = get_place_index()
+        rows = np.array([index.row_of[str(place.id)] for place in places])
+        preference = {"mood:calm": 0.5, "mood:sunny": -0.3, "tag:books": 0.7, "tag:missing": 0.2, "tag:quiet": 0.37}
+        for constraints in CONSTRAINTS:
+            ctx = _prepare_context(constraints)
+            ctx.preference = preference
+            with self.subTest(constraints=constraints):
+                self.assertEqual(score_rows(index, rows, ctx).tolist(), [_score_place(place, ctx) for place in places])
+
+    def test_sharded_top_rows_match_single_pass_ranking(self):
+        places = _random_places(random.Random(13), 80)
+        for place in places:
+            place.save()
+        index = get_place_index()
+        rows = np.array([index.row_of[str(place.id)] for place in places])
+        engine = {**settings.RECOMMENDATION_ENGINE, "scoring_workers": 3, "scoring_parallel_threshold": 1}
+        shards: list[int] = []
+        for constraints in CONSTRAINTS:
+            ctx = _prepare_context(constraints)
+            with self.subTest(constraints=constraints), override_settings(RECOMMENDATION_ENGINE=engine):
+                scores = score_rows(index, rows, ctx)
+                order = rank(scores, index.name_rank[rows])[:25]
+                top, top_scores = score_top_rows(index, rows, ctx, 25)
+                self.assertEqual(top.tolist(), rows[order].tolist())
+                self.assertEqual(top_scores.tolist(), scores[order].tolist())
+
+                # Same courses as the in-process path, through the knapsack and the greedy filler.
+                for packing in ("knapsack", "greedy"):
+                    small = {**engine, "packing": packing, "packing_top_k": 10}
+                    with override_settings(RECOMMENDATION_ENGINE={**small, "scoring_workers": 1}):
+                        serial = _select_courses(_prepare_context({**constraints, "alternatives": 2}), 2)
+                    with override_settings(RECOMMENDATION_ENGINE=small):
+                        sharded_ctx = _prepare_context({**constraints, "alternatives": 2})
+                        sharded = _select_courses(sharded_ctx, 2)
+                    self.assertEqual(sharded, serial, packing)
+                    shards.extend(value for label, value in sharded_ctx.trace.counts if label == "scoring_shards")
+        self.assertTrue(shards)
+        self.assertEqual(set(shards), {3})
+
+    def test_greedy_packing_walks_the_whole_ranking(self):
+        # Greedy filling skips the long stays and reaches past the knapsack cut-off for "Short late".
+        Place.objects.create(name="Short first", category="cafe", stay_min=20, rating=5.0)
+        for position in range(6):
+            Place.objects.create(name=f"Long {position}", category="cafe", stay_min=55, rating=4.5)
+        Place.objects.create(name="Short late", category="cafe", stay_min=20, rating=1.0)
+        engine = {**settings.RECOMMENDATION_ENGINE, "packing": "greedy", "packing_top_k": 1, "scoring_workers": 3}
+        constraints = {"categories": ["cafe"], "limit": 2, "time_budget_min": 60}
+
+        with override_settings(RECOMMENDATION_ENGINE={**engine, "scoring_parallel_threshold": 10**9}):
+            serial = _select_courses(_prepare_context(constraints))
+        with override_settings(RECOMMENDATION_ENGINE={**engine, "scoring_parallel_threshold": 1}):
+            sharded_ctx = _prepare_context(constraints)
+            sharded = _select_courses(sharded_ctx)
+        with override_settings(RECOMMENDATION_ENGINE={**engine, "place_index_enabled": False}):
+            database = _select_courses(_prepare_context(constraints))
+
+        self.assertEqual([place.name for place in serial[0]], ["Short first", "Short late"])
+        self.assertEqual(sharded, serial)
+        self.assertEqual(database, serial)
+        self.assertNotIn("scoring_shards", [label for label, _value in sharded_ctx.trace.counts])
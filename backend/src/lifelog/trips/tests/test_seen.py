@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from lifelog.places.models import Place
+from lifelog.trips.explain import RecommendationTrace
+from lifelog.trips.models import Trip, TripNode
+from lifelog.trips.seen import (
+    LOCK_CACHE_KEY,
+    SEEN_CACHE_KEY,
+    SeenFilter,
+    build_seen_filter,
+    get_seen_filter,
+    place_keys,
+    remember_places,
+)
+from lifelog.trips.services import create_recommendation
+
+
+class SeenFilterTests(SimpleTestCase):
+    def test_membership_false_positives_and_rotation(self):
+        seen_ids = [str(uuid.uuid4()) for _ in range(5000)]
+        other_ids = [str(uuid.uuid4()) for _ in range(20000)]
+        seen = SeenFilter(started=0)
+        seen.add(place_keys(seen_ids))
+
+        self.assertTrue(seen.contains(place_keys(seen_ids)).all())
+        self.assertLess(seen.contains(place_keys(other_ids)).mean(), 0.01)
+
+        window = 100
+        self.assertTrue(seen.rotate(window, now=150))
+        self.assertTrue(seen.contains(place_keys(seen_ids[:10])).all())
+        self.assertTrue(seen.rotate(window, now=260))
+        self.assertFalse(seen.contains(place_keys(seen_ids[:10])).any())
+
+    def test_allow_list_and_cache_round_trip(self):
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        seen = SeenFilter()
+        seen.add(place_keys(ids))
+        restored = SeenFilter.load(seen.dump())
+        restored.allow = frozenset(ids[:1])
+
+        self.assertEqual(restored.contains(place_keys(ids), ids).tolist(), [False, True, True])
+
+
+class SeenPlacesRecommendationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="seen@example.com", password="SeenPass123!")
+        self.places = [
+            Place.objects.create(name=f"Seen {position}", category="seen-cafe", rating=4.9 - position / 10, stay_min=30)
+            for position in range(4)
+        ]
+
+    def _recommend(self, **extra):
+        trace = RecommendationTrace()
+        with self.captureOnCommitCallbacks(execute=True):
+            trip = create_recommendation(str(self.user.id), {"categories": ["seen-cafe"], "limit": 2, **extra}, trace=trace)
+        return trip.summary["place_ids"], trace
+
+    def test_recent_places_are_not_recommended_again(self):
+        first, _trace = self._recommend()
+        second, trace = self._recommend()
+        third, relaxed = self._recommend()
+
+        self.assertEqual(set(first), {str(place.id) for place in self.places[:2]})
+        self.assertEqual(set(second), {str(place.id) for place in self.places[2:]})
+        self.assertIn(("unseen", 2), trace.counts)
+        self.assertIn("seen_filter_relaxed", relaxed.fallbacks)
+        self.assertEqual(set(third), set(first))
+
+    def test_alternatives_need_unseen_places_for_every_course(self):
+        self._recommend()
+        _ids, trace = self._recommend(alternatives=2)
+
+        self.assertIn("seen_filter_relaxed", trace.fallbacks)
+
+    def test_concurrent_updates_are_not_lost(self):
+        get_seen_filter(self.user.id)
+        batches = [[str(uuid.uuid4()) for _ in range(3)] for _ in range(8)]
+        threads = [threading.Thread(target=remember_places, args=(self.user.id, batch)) for batch in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ids = [place_id for batch in batches for place_id in batch]
+        self.assertTrue(get_seen_filter(self.user.id).contains(place_keys(ids)).all())
+
+    def test_busy_lock_drops_the_cached_filter_instead_of_overwriting_it(self):
+        get_seen_filter(self.user.id)
+        cache.add(LOCK_CACHE_KEY.format(user_id=self.user.id), 1)
+        self.addCleanup(cache.delete, LOCK_CACHE_KEY.format(user_id=self.user.id))
+
+        with mock.patch("lifelog.trips.seen.LOCK_ATTEMPTS", 1):
+            remember_places(self.user.id, [str(self.places[0].id)])
+
+        self.assertIsNone(cache.get(SEEN_CACHE_KEY.format(user_id=self.user.id)))
+
+    @override_settings(RECOMMENDATION_ENGINE={"place_index_enabled": False})
+    def test_db_path_uses_the_same_filter(self):
+        first, _trace = self._recommend()
+        second, _trace = self._recommend()
+
+        self.assertFalse(set(first) & set(second))
+
+    def test_filter_is_built_from_long_history_in_one_query(self):
+        trips = Trip.objects.bulk_create(Trip(owner=self.user, context_hash="history") for _ in range(2000))
+        TripNode.objects.bulk_create(
+            TripNode(trip=trip, place=self.places[position % 3], sequence=1) for position, trip in enumerate(trips)
+        )
+
+        with self.assertNumQueries(1):
+            seen = build_seen_filter(self.user.id)
+
+        ids = [str(place.id) for place in self.places]
+        self.assertEqual(seen.contains(place_keys(ids)).tolist(), [True, True, True, False])
+        self.assertIsNone(get_seen_filter(None))
@@ -1,9 +1,15 @@
 ﻿from __future__ import annotations
 
-from django.test import TestCase
+from datetime import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from lifelog.places.models import Place, Tag
-from lifelog.trips.models import Trip
+from lifelog.trips.index import get_place_index
+from lifelog.trips.learning import get_ranking_weights
+from lifelog.trips.materialize import materialize
+from lifelog.trips.models import Trip, TripNode
 from lifelog.trips.services import NoPlacesAvailableError, create_recommendation
 
 
@@ -91,3 +97,77 @@ class TripRecommendationServiceTests(TestCase):
 
 
 
+
+    def test_query_count_does_not_grow_with_stops(self):
+        for index in range(7):
+            place = Place.objects.create(name=f"Extra {index}", category="cafe", stay_min=20, rating=4.0)
+            place.tags.add(self.calm_tag, self.focus_tag)
+        get_ranking_weights()  # cached after the first lookup
+        get_place_index()  # built before queries are counted
+
+        with self.assertNumQueries(6):
+            trip = create_recommendation(None, {"limit": 1, "time_budget_min": 600})
+        self.assertEqual(trip.nodes.count(), 1)
+
+        with self.assertNumQueries(6):
+            trip = create_recommendation(None, {"limit": 8, "time_budget_min": 600})
+        self.assertEqual(trip.nodes.count(), 8)
+        self.assertEqual(trip.summary["tags"], ["calm", "focus"])
+
+    def test_materialize_reports_query_count(self):
+        trip = Trip(title="bulk", context_hash="x")
+        nodes = [TripNode(place=place, sequence=i) for i, place in enumerate([self.calm_cafe, self.gallery], start=1)]
+
+        result = materialize(trip, nodes)
+
+        self.assertEqual(result.queries, 2)
+        self.assertEqual(list(trip.nodes.values_list("sequence", flat=True)), [1, 2])
+
+    def test_alternatives_are_disjoint_and_cost_the_same_queries(self):
+        for index in range(6):
+            place = Place.objects.create(
+                name=f"Alt {index}",
+                category="cafe",
+                cost_band="10000",
+                stay_min=30,
+                rating=4.0 - index * 0.1,
+                mood_scores={"calm": 0.5},
+            )
+            place.tags.add(self.calm_tag)
+        get_ranking_weights()
+        get_place_index()
+
+        constraints = {"limit": 3, "time_budget_min": 600, "mood": ["calm"], "alternatives": 3}
+        with self.assertNumQueries(6):
+            trip = create_recommendation(None, constraints)
+
+        cards = trip.summary["alternatives"]
+        self.assertEqual(len(cards), 3)
+        self.assertEqual(cards[0]["trip_id"], str(trip.id))
+        trips = [Trip.objects.get(id=card["trip_id"]) for card in cards]
+        place_sets = [set(t.summary["place_ids"]) for t in trips]
+        self.assertEqual(sum(len(ids) for ids in place_sets), len(set().union(*place_sets)))
+        self.assertEqual([t.summary["alternative_rank"] for t in trips], [0, 1, 2])
+        self.assertEqual(len({t.context_hash for t in trips}), 3)
+        for card in cards:
+            self.assertEqual(card["stops"], 3)
+            self.assertIn("calm", card["mood"])
+            self.assertGreaterEqual(card["duration_min"], 90)
+
+    def test_start_time_drops_places_closed_during_the_visit(self):
+        self.calm_cafe.hours = {"daily": "12:00-22:00"}
+        self.calm_cafe.save()
+        self.gallery.hours = {"daily": "09:00-18:00"}
+        self.gallery.save()
+        start = timezone.make_aware(datetime(2026, 10, 19, 9, 0))
+        constraints = {"categories": ["cafe", "culture"], "time_budget_min": 120, "limit": 3, "start_at": start}
+
+        for index_enabled in (True, False):
+            with self.subTest(index_enabled=index_enabled), override_settings(
+                RECOMMENDATION_ENGINE={"place_index_enabled": index_enabled}
+            ):
+                trip = create_recommendation(None, constraints)
+                names = [node.place.name for node in trip.nodes.order_by("sequence")]
+                self.assertNotIn("Calm Cafe", names)
+                self.assertIn("Gallery Walk", names)
+                self.assertEqual(trip.nodes.order_by("sequence").first().eta, start)
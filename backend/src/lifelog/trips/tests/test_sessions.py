@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from lifelog.places.models import Place
+from lifelog.trips.models import Trip
+
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+class TripSessionAPITests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email="session@example.com", password="SessionPass123!")
+        self.client.force_authenticate(self.user)
+        for position in range(12):
+            Place.objects.create(name=f"Session {position:02d}", category="cafe", rating=4.9 - position / 20, stay_min=30)
+
+    def _open(self, payload=None):
+        return self.client.post("/api/v1/trip-sessions/", payload or {"categories": ["cafe"], "limit": 1}, format="json")
+
+    def test_session_is_computed_once_and_writes_only_the_accepted_trip(self):
+        with CaptureQueriesContext(connection) as queries:
+            opened = self._open()
+            session_id = opened.data["id"]
+            with self.assertNumQueries(0):
+                second = self.client.post(f"/api/v1/trip-sessions/{session_id}/next/")
+            accepted = self.client.post(f"/api/v1/trip-sessions/{session_id}/accept/")
+
+        self.assertEqual(opened.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((opened.data["position"], opened.data["total"], opened.data["remaining"]), (1, 9, 8))
+        self.assertEqual(second.data["position"], 2)
+        self.assertNotEqual(second.data["proposal"]["place_ids"], opened.data["proposal"]["place_ids"])
+        self.assertEqual(accepted.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([str(node["place"]) for node in accepted.data["nodes"]], second.data["proposal"]["place_ids"])
+        self.assertEqual(Trip.objects.get().summary["source"], "session")
+        writes = [query["sql"] for query in queries.captured_queries if query["sql"].startswith(WRITES)]
+        self.assertEqual([sql.split(" (")[0] for sql in writes], ['INSERT INTO "trips_trip"', 'INSERT INTO "trips_tripnode"'])
+
+    def test_reopening_returns_the_active_session(self):
+        first = self._open()
+        again = self._open({"categories": ["park"]})
+
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data["id"], first.data["id"])
+
+    def test_cooldown_after_the_last_proposal(self):
+        session_id = self._open().data["id"]
+        for _position in range(8):
+            self.assertEqual(self.client.post(f"/api/v1/trip-sessions/{session_id}/next/").status_code, status.HTTP_200_OK)
+
+        done = self.client.post(f"/api/v1/trip-sessions/{session_id}/next/")
+        blocked = self._open()
+
+        self.assertEqual(done.status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.client.get(f"/api/v1/trip-sessions/{session_id}/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(blocked.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(blocked["Retry-After"]), 9 * 60)
+
+    def test_sessions_are_private(self):
+        session_id = self._open().data["id"]
+        other = get_user_model().objects.create_user(email="other@example.com", password="OtherPass123!")
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(f"/api/v1/trip-sessions/{session_id}/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_session_ends_only_when_the_trip_commits(self):
+        session_id = self._open().data["id"]
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            accepted = self.client.post(f"/api/v1/trip-sessions/{session_id}/accept/")
+            self.assertEqual(self.client.get(f"/api/v1/trip-sessions/{session_id}/").status_code, status.HTTP_200_OK)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(accepted.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.get(f"/api/v1/trip-sessions/{session_id}/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self._open().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from waffle.testutils import override_flag
+
+from lifelog.places.models import Place
+from lifelog.trips.models import ShadowRecommendation
+from lifelog.trips.services import create_recommendation
+from lifelog.trips.shadow import ENGINES, SHADOW_FLAG, register_engine, run_shadow
+from lifelog.trips.tasks import run_shadow_recommendation
+
+SHADOW_ENGINE = {"shadow_sample_rate": 1.0, "shadow_engine": "db"}
+
+
+class ShadowRecommendationAPITests(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email="shadow@example.com", password="ShadowPass123!")
+        self.client.force_authenticate(user)
+        for position in range(4):
+            Place.objects.create(name=f"Shadow {position}", category="cafe", rating=4.8 - position / 10, stay_min=30)
+
+    def _post(self, payload):
+        with mock.patch.object(run_shadow_recommendation, "delay", side_effect=run_shadow_recommendation) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post("/api/v1/trips/recommendations/", payload, format="json")
+        return response, delay
+
+    @override_settings(RECOMMENDATION_ENGINE=SHADOW_ENGINE)
+    @override_flag(SHADOW_FLAG, active=True)
+    def test_sampled_request_is_answered_again_by_the_shadow_engine(self):
+        response, delay = self._post({"categories": ["cafe"], "limit": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        delay.assert_called_once()
+        record = ShadowRecommendation.objects.get()
+        self.assertEqual(str(record.trip_id), str(response.data["id"]))
+        self.assertEqual(record.engine, "db")
+        self.assertEqual(record.production_place_ids, [str(node["place"]) for node in response.data["nodes"]])
+        self.assertEqual(record.jaccard, 1.0)
+        self.assertTrue(record.identical)
+        self.assertGreater(record.production_ms, 0)
+        self.assertIsNotNone(record.shadow_ms)
+        self.assertEqual(record.error, "")
+
+    @override_settings(RECOMMENDATION_ENGINE=SHADOW_ENGINE)
+    @override_flag(SHADOW_FLAG, active=True)
+    def test_reused_trips_are_not_shadowed(self):
+        self._post({"limit": 2})
+        response, delay = self._post({"limit": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(delay.call_count, 0)
+        self.assertEqual(ShadowRecommendation.objects.count(), 1)
+
+    @override_settings(RECOMMENDATION_ENGINE=SHADOW_ENGINE)
+    @override_flag(SHADOW_FLAG, active=False)
+    def test_flag_off_skips_shadow(self):
+        response, delay = self._post({"limit": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        delay.assert_not_called()
+        self.assertFalse(ShadowRecommendation.objects.exists())
+
+
+class ShadowRunTests(TestCase):
+    def setUp(self):
+        Place.objects.create(name="Shadow Cafe", category="cafe", rating=4.5)
+        self.trip = create_recommendation(None, {"limit": 1})
+
+    def test_engine_errors_are_recorded(self):
+        @register_engine("broken")
+        def broken(ctx):
+            raise ValueError("boom")
+
+        self.addCleanup(ENGINES.pop, "broken")
+        record = run_shadow(str(self.trip.id), None, self.trip.inputs, 1.5, engine="broken")
+
+        self.assertEqual(record.error, "ValueError: boom")
+        self.assertEqual(record.shadow_place_ids, [])
+        self.assertIsNone(record.jaccard)
+
+    def test_custom_engine_overlap(self):
+        register_engine("empty")(lambda ctx: [])
+        self.addCleanup(ENGINES.pop, "empty")
+        record = run_shadow(str(self.trip.id), None, self.trip.inputs, 1.5, engine="empty")
+
+        self.assertEqual(record.jaccard, 0.0)
+        self.assertFalse(record.same_first)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+
+from lifelog.places.geo import haversine_m
+from lifelog.places.models import Place
+from lifelog.trips.matrix import RoutingServiceEstimator, TravelMatrixStore
+from lifelog.trips.tasks import refresh_travel_matrix_place
+from lifelog.trips.travel import travel_minutes
+
+
+class TravelMatrixStoreTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = TravelMatrixStore(tmp.name)
+        self.places = [
+            Place.objects.create(
+                name=f"Place {i}",
+                district="수원 팔달구",
+                location={"type": "Point", "coordinates": [127.0 + i * 0.004, 37.26 + i * 0.003]},
+            )
+            for i in range(12)
+        ]
+        Place.objects.create(name="Elsewhere", district="수원 장안구", location={"type": "Point", "coordinates": [127.0, 37.3]})
+
+    def test_build_and_lookup_match_haversine_model(self):
+        self.assertEqual(self.store.build("수원 팔달구", "walk"), 12)
+
+        a, b = self.places[0], self.places[5]
+        minutes = self.store.lookup([a, b], "walk")
+        expected = travel_minutes(haversine_m(a.latitude, a.longitude, b.latitude, b.longitude), "walk")
+        self.assertAlmostEqual(minutes[0, 1], expected, delta=0.05)
+        self.assertEqual(minutes[0, 0], 0)
+
+        other = Place.objects.get(name="Elsewhere")
+        self.assertTrue(np.isnan(self.store.lookup([a, other], "walk")[0, 1]))
+
+    def test_ten_stop_lookup_is_fast(self):
+        self.store.build("수원 팔달구", "walk")
+        course = self.places[:10]
+        self.store.lookup(course, "walk")
+
+        started = time.perf_counter()
+        for _ in range(200):
+            minutes = self.store.lookup(course, "walk")
+        per_lookup_us = (time.perf_counter() - started) / 200 * 1_000_000
+
+        self.assertFalse(np.isnan(minutes).any())
+        self.assertLess(per_lookup_us, 500)
+
+    def test_moved_place_only_rewrites_its_row_and_column(self):
+        self.store.build("수원 팔달구", "walk")
+        before = np.array(self.store.get("수원 팔달구", "walk").minutes)
+        moved = self.places[3]
+        moved.location = {"type": "Point", "coordinates": [127.05, 37.29]}
+        moved.save()
+
+        with mock.patch("lifelog.trips.matrix._store", self.store):
+            result = refresh_travel_matrix_place(str(moved.id))
+
+        self.assertEqual(result["rebuild"], [])
+        matrix = self.store.get("수원 팔달구", "walk")
+        after = np.array(matrix.minutes)
+        row = matrix.row_of[str(moved.id)]
+        untouched = np.ones(after.shape, dtype=bool)
+        untouched[row, :] = untouched[:, row] = False
+        np.testing.assert_array_equal(after[untouched], before[untouched])
+        self.assertFalse(np.array_equal(after[row], before[row]))
+
+    @mock.patch("lifelog.trips.matrix.httpx.Client")
+    def test_routing_service_estimator_reads_durations(self, mock_client_cls):
+        response = mock.MagicMock()
+        response.json.return_value = {"durations": [[0, 600], [630, None]]}
+        mock_client_cls.return_value.__enter__.return_value.get.return_value = response
+
+        points = np.array([[37.0, 127.0], [37.1, 127.1]])
+        minutes = RoutingServiceEstimator("http://router").estimate(points, points, "bike")
+
+        self.assertEqual(minutes[0, 1], 10)
+        self.assertTrue(np.isnan(minutes[1, 1]))
+        url = mock_client_cls.return_value.__enter__.return_value.get.call_args.args[0]
+        self.assertTrue(url.startswith("http://router/table/v1/bike/"))
+
+    @mock.patch("lifelog.trips.matrix.httpx.Client")
+    def test_routing_service_estimator_requests_blocks(self, mock_client_cls):
+        def table(url, params):
+            sources = [int(i) for i in params["sources"].split(";")]
+            targets = [int(i) for i in params["destinations"].split(";")]
+            coordinates = url.rsplit("/", 1)[1].split(";")
+            lats = [float(pair.split(",")[1]) for pair in coordinates]
+            response = mock.MagicMock()
+            # Seconds encode the original row and column, recovered from the latitudes.
+            response.json.return_value = {
+                "durations": [[round(lats[s] * 1000) * 60 + round(lats[t] * 1000) * 6 for t in targets] for s in sources]
+            }
+            return response
+
+        get = mock_client_cls.return_value.__enter__.return_value.get
+        get.side_effect = table
+        points = np.array([[position / 1000, 127.0] for position in range(5)])
+
+        minutes = RoutingServiceEstimator("http://router", block=2).estimate(points, points, "walk")
+
+        self.assertEqual(get.call_count, 9)
+        self.assertTrue(all(len(call.args[0].rsplit("/", 1)[1].split(";")) <= 4 for call in get.call_args_list))
+        expected = np.arange(5)[:, None] + np.arange(5)[None, :] / 10
+        np.testing.assert_allclose(minutes, expected)
@@ -0,0 +1,30 @@
+﻿from __future__ import annotations
+
+from .models import Trip
+
+# Average door-to-door speeds (km/h). Transit includes typical waiting time.
+MODE_SPEED_KMH = {
+    Trip.Mode.WALK: 4.5,
+    Trip.Mode.BIKE: 14.0,
+    Trip.Mode.TRANSIT: 18.0,
+    Trip.Mode.DRIVE: 25.0,
+}
+# Street networks are longer than the straight line between two points.
+DETOUR_FACTOR = 1.3
+DEFAULT_MAX_TRAVEL_MIN = 15
+
+
+def mode_speed_m_per_min(mode: str) -> float:
+    return MODE_SPEED_KMH.get(mode, MODE_SPEED_KMH[Trip.Mode.WALK]) * 1000 / 60
+
+
+def reachable_radius_m(mode: str, minutes: int) -> float:
+    """Straight-line radius reachable within ``minutes`` for ``mode``."""
+
+    return mode_speed_m_per_min(mode) * minutes / DETOUR_FACTOR
+
+
+def travel_minutes(distance_m: float, mode: str) -> float:
+    """Estimated travel time for a straight-line ``distance_m``."""
+
+    return distance_m * DETOUR_FACTOR / mode_speed_m_per_min(mode)
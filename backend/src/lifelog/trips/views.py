@@ -2,14 +2,17 @@
 
 import logging
 
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .models import Trip, TripTemplate, TripTemplateGenerationJob
+from .models import Trip, TripRecommendationJob, TripTemplate, TripTemplateGenerationJob
 from .serializers import (
     TripFromTemplateRequestSerializer,
+    TripRecommendationJobSerializer,
     TripRecommendationRequestSerializer,
     TripSerializer,
     TripTemplateSerializer,
@@ -18,11 +21,29 @@ from .serializers import (
     TripTemplateGenerationJobCreateSerializer,
     TripTemplateGenerationJobSerializer,
 )
-from .tasks import generate_trip_recommendations, request_ai_template
-from .services import create_trip_from_template
+from .tasks import generate_trip_recommendations, request_ai_template, run_recommendation_job
+from .feed import get_feed
+from .services import NoPlacesAvailableError, create_trip_from_template
+from .sessions import (
+    SessionCooldownError,
+    accept_proposal,
+    cooldown_remaining,
+    end_session,
+    get_session,
+    next_proposal,
+    open_session,
+    session_payload,
+)
+from .shadow import shadow_requested
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_JOB_RETRY_AFTER_SEC = 2
+
+
+def _job_retry_after_sec() -> int:
+    return getattr(settings, "RECOMMENDATION_ENGINE", {}).get("job_retry_after_sec", DEFAULT_JOB_RETRY_AFTER_SEC)
+
 
 class IsStaffOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -73,14 +94,71 @@ class TripViewSet(viewsets.ModelViewSet):
     def recommendations(self, request):
         request_serializer = TripRecommendationRequestSerializer(data=request.data)
         request_serializer.is_valid(raise_exception=True)
-        result = generate_trip_recommendations.apply(args=(str(request.user.id), request_serializer.validated_data))
+        constraints = dict(request_serializer.validated_data)
+        reuse = constraints.pop("reuse")
+        explain = constraints.pop("explain")
+        if explain and not request.user.is_staff:
+            return Response({"detail": "explain 은 스태프만 사용할 수 있습니다."}, status=status.HTTP_403_FORBIDDEN)
+        if constraints.pop("async"):
+            return self._enqueue_recommendation(request, constraints, reuse)
+        result = generate_trip_recommendations.apply(
+            args=(str(request.user.id), constraints),
+            kwargs={"reuse": reuse, "explain": explain, "shadow": shadow_requested(request)},
+        )
         payload = result.get() if hasattr(result, "get") else result
         if payload.get("status") == "error":
             return Response(payload, status=status.HTTP_400_BAD_REQUEST)
         trip_id = payload.get("trip_id")
         trip = Trip.objects.prefetch_related("nodes__place").get(id=trip_id)
-        serializer = TripSerializer(trip, context=self.get_serializer_context())
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        data = TripSerializer(trip, context=self.get_serializer_context()).data
+        if explain:
+            data["explain"] = payload["explain"]
+        reused = payload.get("status") == "reused"
+        return Response(
+            data,
+            status=status.HTTP_200_OK if reused else status.HTTP_201_CREATED,
+            headers={"X-Recommendation-Cache": "hit" if reused else "miss"},
+        )
+
+    def _enqueue_recommendation(self, request, constraints, reuse):
+        job = TripRecommendationJob.objects.create(
+            requested_by=request.user,
+            constraints=constraints,
+            reuse=reuse,
+        )
+        try:
+            run_recommendation_job.delay(str(job.id))
+        except Exception as exc:  # pragma: no cover - guard against celery misconfig
+            logger.exception("Failed to enqueue recommendation job %s", job.id)
+            job.mark_failed("dispatch_error", str(exc))
+            return Response(
+                {
+                    "detail": "추천 작업을 대기열에 추가하지 못했습니다.",
+                    "job_id": str(job.id),
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        output = TripRecommendationJobSerializer(job, context=self.get_serializer_context())
+        return Response(
+            output.data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={
+                "Location": f"/api/v1/trip-recommendation-jobs/{job.id}/",
+                "Retry-After": str(_job_retry_after_sec()),
+            },
+        )
+
+    @action(methods=["get"], detail=False, url_path="feed")
+    def feed(self, request):
+        feed, precomputed = get_feed(request.user)
+        return Response(
+            {
+                "source": "precomputed" if precomputed else "live",
+                "computed_at": feed.computed_at,
+                "constraints": feed.constraints,
+                "courses": feed.courses,
+            }
+        )
 
     @action(methods=["post"], detail=False, url_path="from-template")
     def from_template(self, request):
@@ -153,3 +231,90 @@ class TripTemplateGenerationJobViewSet(
         headers = self.get_success_headers(output.data)
         return Response(output.data, status=status.HTTP_201_CREATED, headers=headers)
 
+
+class TripRecommendationJobViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Result of ``async`` recommendations, answered at once; unfinished jobs carry ``Retry-After``."""
+
+    queryset = TripRecommendationJob.objects.prefetch_related("trip__nodes__place").order_by("-created_at")
+    serializer_class = TripRecommendationJobSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    lookup_field = "id"
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        user = self.request.user
+        if user.is_staff:
+            return qs
+        return qs.filter(requested_by=user)
+
+    def retrieve(self, request, *args, **kwargs):
+        # No server-side waiting: a sleeping sync view would hold a worker for as long as
+        # the async mode is meant to free it. Clients poll again after ``Retry-After``.
+        job = self.get_object()
+        headers = None if job.is_finished else {"Retry-After": str(_job_retry_after_sec())}
+        return Response(self.get_serializer(job).data, headers=headers)
+
+
+class TripSessionViewSet(viewsets.ViewSet):
+    """Recommendation session: 7~9 proposals computed once, served one by one from the cache.
+
+    Ending a session (used up, accepted or closed) starts a cooldown before the next one.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+    lookup_value_regex = "[0-9a-f]{32}"
+
+    def _session(self, request, pk):
+        session = get_session(pk, str(request.user.id))
+        if session is None:
+            raise Http404
+        return session
+
+    def create(self, request):
+        request_serializer = TripRecommendationRequestSerializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        constraints = dict(request_serializer.validated_data)
+        for key in ("reuse", "explain", "async", "alternatives"):
+            constraints.pop(key, None)
+        try:
+            session, created = open_session(str(request.user.id), constraints)
+        except SessionCooldownError as exc:
+            return Response(
+                {"detail": "다음 추천까지 잠시 쉬어 가세요.", "retry_after": exc.retry_after},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+        except NoPlacesAvailableError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(session_payload(session), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def retrieve(self, request, pk=None):
+        return Response(session_payload(self._session(request, pk)))
+
+    def destroy(self, request, pk=None):
+        end_session(self._session(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(methods=["post"], detail=True, url_path="next")
+    def advance(self, request, pk=None):
+        session = self._session(request, pk)
+        if next_proposal(session) is None:
+            return Response(
+                {"detail": "이번 세션의 제안을 모두 확인했습니다.", "retry_after": cooldown_remaining(str(request.user.id))},
+                status=status.HTTP_410_GONE,
+            )
+        return Response(session_payload(session))
+
+    @action(methods=["post"], detail=True, url_path="accept")
+    def accept(self, request, pk=None):
+        session = self._session(request, pk)
+        try:
+            trip = accept_proposal(session)
+        except NoPlacesAvailableError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        trip = Trip.objects.prefetch_related("nodes__place").get(id=trip.id)
+        return Response(TripSerializer(trip, context={"request": request}).data, status=status.HTTP_201_CREATED)